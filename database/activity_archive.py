@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Retención y archivo de activity_log
+Las filas de activity_log anteriores al horizonte de retención
+(app_settings.activity_retention_days, 90 días por defecto) se resumen en
+activity_daily (eventos y XP por usuario/día/tipo) y se mueven a una base de
+datos de archivo adjunta con ATTACH, de modo que la tabla caliente solo
+contiene el historial reciente.
+
+El traslado se hace por ventanas de ids en transacciones cortas (con pausa
+opcional entre lotes) para no bloquear a los escritores. Con WAL una
+transacción que escribe en dos bases adjuntas no es atómica entre ellas, así
+que cada ventana usa dos: la copia al archivo se confirma primero y solo
+después el resumen en activity_daily y el borrado se confirman juntos en la
+base principal. Nunca se borra una fila que no esté ya en el archivo. Las
+filas conservan su id en el archivo y se insertan con INSERT OR IGNORE: si el
+proceso se interrumpe entre los dos commits, quedan en ambas bases y volver
+a ejecutarlo no duplica nada.
+
+Lectura unificada: attach_archive() crea la vista temporal activity_log_all
+y get_activity() / activity_summary() combinan ambas bases.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+from db_connection import connect
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, 'task_gamification.db')
+
+RETENTION_KEY = 'activity_retention_days'
+DEFAULT_RETENTION_DAYS = 90
+BATCH_SIZE = 5000
+
+ARCHIVE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS archive.activity_log (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        activity_type TEXT NOT NULL,
+        entity_type TEXT,
+        entity_id INTEGER,
+        description TEXT NOT NULL,
+        xp_change INTEGER DEFAULT 0,
+        metadata_json TEXT,
+        created_at TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS archive.idx_archive_user_date "
+    "ON activity_log(user_id, created_at DESC)",
+)
+
+COLUMNS = ("id, user_id, activity_type, entity_type, entity_id, description, "
+           "xp_change, metadata_json, created_at")
+
+
+def archive_path_for(db_path):
+    """Ruta del archivo junto a la base principal (ej. task_gamification_archive.db)"""
+    return os.path.splitext(db_path)[0] + '_archive.db'
+
+
+def get_retention_days(conn):
+    row = conn.execute("SELECT setting_value FROM app_settings WHERE setting_key = ?",
+                       (RETENTION_KEY,)).fetchone()
+    return int(row[0]) if row and row[0] else DEFAULT_RETENTION_DAYS
+
+
+def attach_archive(conn, archive_path):
+    """
+    Adjunta la base de archivo como `archive` (la crea si no existe) y define
+    la vista temporal activity_log_all (caliente + archivo).
+    """
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    if 'archive' not in attached:
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+        conn.execute("PRAGMA archive.journal_mode = WAL")
+    for statement in ARCHIVE_SCHEMA:
+        conn.execute(statement)
+    conn.execute(f"""
+        CREATE TEMP VIEW IF NOT EXISTS activity_log_all AS
+        SELECT {COLUMNS} FROM main.activity_log
+        UNION ALL
+        SELECT {COLUMNS} FROM archive.activity_log
+    """)
+    conn.commit()
+
+
+def _archive_window(conn, low, high, cutoff):
+    """
+    Copia al archivo las filas antiguas con id en [low, high) y confirma;
+    después resume y borra esas filas de la base principal en una segunda
+    transacción, que confirma quien llama.
+
+    Returns:
+        Filas borradas de la base principal
+    """
+    conn.execute("DELETE FROM temp.archive_batch")
+    conn.execute(f"""
+        INSERT INTO temp.archive_batch
+        SELECT {COLUMNS} FROM main.activity_log
+        WHERE id >= ? AND id < ? AND created_at < ?
+    """, (low, high, cutoff))
+    moved = conn.execute("SELECT COUNT(*) FROM temp.archive_batch").fetchone()[0]
+    if not moved:
+        return 0
+
+    conn.execute(f"""
+        INSERT OR IGNORE INTO archive.activity_log ({COLUMNS})
+        SELECT {COLUMNS} FROM temp.archive_batch
+    """)
+    conn.commit()
+
+    # Se resume lo que sigue en la base principal (otra conexión pudo borrar
+    # filas entre ambas transacciones): el resumen cuenta justo lo borrado
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute("""
+        INSERT INTO activity_daily (user_id, activity_date, activity_type, events, xp_change)
+        SELECT user_id, DATE(created_at), activity_type, COUNT(*), COALESCE(SUM(xp_change), 0)
+        FROM main.activity_log
+        WHERE id IN (SELECT id FROM temp.archive_batch)
+        GROUP BY user_id, DATE(created_at), activity_type
+        ON CONFLICT(user_id, activity_date, activity_type) DO UPDATE SET
+            events = events + excluded.events,
+            xp_change = xp_change + excluded.xp_change
+    """)
+    return conn.execute("""
+        DELETE FROM main.activity_log
+        WHERE id IN (SELECT id FROM temp.archive_batch)
+    """).rowcount
+
+
+def archive_activity(conn, archive_path, retention_days=None, batch_size=BATCH_SIZE,
+                     pause=0.0, verbose=False):
+    """
+    Mueve al archivo las actividades anteriores a `hoy - retention_days`
+    (días completos), en lotes de `batch_size` ids con commit por lote.
+
+    Returns:
+        (filas archivadas, fecha de corte)
+    """
+    if retention_days is None:
+        retention_days = get_retention_days(conn)
+    cutoff = (date.today() - timedelta(days=retention_days)).isoformat()
+    attach_archive(conn, archive_path)
+
+    # Límites de ids de las filas a archivar: el recorrido se hace después
+    # por rangos de rowid, sin suponer que los ids crecen con created_at
+    low, high = conn.execute(
+        "SELECT MIN(id), MAX(id) FROM main.activity_log WHERE created_at < ?",
+        (cutoff,)).fetchone()
+    if low is None:
+        return 0, cutoff
+
+    conn.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS archive_batch AS
+        SELECT {COLUMNS} FROM main.activity_log WHERE 0
+    """)
+    total = 0
+    try:
+        while low <= high:
+            moved = _archive_window(conn, low, low + batch_size, cutoff)
+            conn.commit()
+            total += moved
+            low += batch_size
+            if verbose and moved:
+                print(f"   📦 {total:,} filas archivadas (id < {low:,})")
+            if pause:
+                time.sleep(pause)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("DROP TABLE IF EXISTS temp.archive_batch")
+    return total, cutoff
+
+
+def get_activity(conn, user_id, since=None, until=None, limit=50):
+    """
+    Actividades de un usuario, más recientes primero, de la tabla caliente y
+    del archivo (si está adjunto). Las filas archivadas siempre son más
+    antiguas que las calientes, así que el archivo solo se consulta si faltan
+    filas para completar `limit`.
+    """
+    conditions = ["user_id = ?"]
+    params = [user_id]
+    if since is not None:
+        conditions.append("created_at >= ?")
+        params.append(since)
+    if until is not None:
+        conditions.append("created_at < ?")
+        params.append(until)
+    where = " AND ".join(conditions)
+
+    rows = conn.execute(f"""
+        SELECT {COLUMNS} FROM main.activity_log
+        WHERE {where}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    """, params + [limit]).fetchall()
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    if len(rows) < limit and 'archive' in attached:
+        rows += conn.execute(f"""
+            SELECT {COLUMNS} FROM archive.activity_log
+            WHERE {where}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        """, params + [limit - len(rows)]).fetchall()
+    return rows
+
+
+def activity_summary(conn, user_id, since=None):
+    """
+    Eventos y XP por tipo de actividad de un usuario, combinando el resumen
+    diario del historial archivado con las filas calientes.
+
+    Returns:
+        dict {activity_type: (eventos, xp)}
+    """
+    since_date = since[:10] if since else '0000-00-00'
+    summary = {}
+    rows = conn.execute("""
+        SELECT activity_type, SUM(events), SUM(xp_change)
+        FROM activity_daily
+        WHERE user_id = ? AND activity_date >= ?
+        GROUP BY activity_type
+        UNION ALL
+        SELECT activity_type, COUNT(*), COALESCE(SUM(xp_change), 0)
+        FROM activity_log
+        WHERE user_id = ? AND created_at >= ?
+        GROUP BY activity_type
+    """, (user_id, since_date, user_id, since or '')).fetchall()
+    for activity_type, events, xp in rows:
+        prev_events, prev_xp = summary.get(activity_type, (0, 0))
+        summary[activity_type] = (prev_events + events, prev_xp + xp)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archiva el historial antiguo de activity_log")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Ruta de la base de datos")
+    parser.add_argument('--archivo', help="Base de datos de archivo "
+                                          "(por defecto <db>_archive.db)")
+    parser.add_argument('--dias', type=int,
+                        help=f"Días de retención (por defecto {RETENTION_KEY})")
+    parser.add_argument('--lote', type=int, default=BATCH_SIZE, help="Ids por transacción")
+    parser.add_argument('--pausa', type=float, default=0.0,
+                        help="Segundos de pausa entre lotes")
+    parser.add_argument('--usuario', type=int,
+                        help="Mostrar la actividad de un usuario en vez de archivar")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ Error: No existe {args.db}")
+        return 1
+    archive_path = args.archivo or archive_path_for(args.db)
+
+    conn = connect(args.db, 'tuned')
+    try:
+        if args.usuario is not None:
+            attach_archive(conn, archive_path)
+            print(f"📜 Actividad del usuario {args.usuario}:")
+            for row in get_activity(conn, args.usuario, limit=20):
+                print(f"   {row[8]}  {row[2]:18} {row[6] or 0:>+5} XP  {row[5]}")
+            print("\n📊 Resumen por tipo:")
+            for activity_type, (events, xp) in sorted(
+                    activity_summary(conn, args.usuario).items()):
+                print(f"   {activity_type:18} {events:>8,} eventos {xp:>10,} XP")
+            return 0
+
+        print("=" * 80)
+        print("🗄️  ARCHIVO DE ACTIVITY_LOG")
+        print("=" * 80)
+        start = time.perf_counter()
+        total, cutoff = archive_activity(conn, archive_path, args.dias, args.lote,
+                                         args.pausa, verbose=True)
+        elapsed = time.perf_counter() - start
+        hot = conn.execute("SELECT COUNT(*) FROM main.activity_log").fetchone()[0]
+        print(f"\n✅ {total:,} filas anteriores a {cutoff} archivadas en {elapsed:.2f}s")
+        print(f"   activity_log: {hot:,} filas | archivo: {archive_path}")
+    except sqlite3.Error as e:
+        print(f"\n❌ Error de SQLite: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
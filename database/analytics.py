@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Analítica por rangos de fechas con NumPy
+Carga daily_stats y las tareas completadas una sola vez en arrays columnares
+ordenados por día y calcula agregados vectorizados (np.bincount) para
+cualquier rango:
+  - por día, semana (lunes) o mes
+  - por usuario, por cohorte (mes de alta del usuario) o, para las tareas,
+    por categoría
+  - informe mes a mes con la variación respecto al mes anterior
+
+Los resultados se cachean por (rango, frecuencia, agrupación). refresh()
+vuelve a leer solo desde el último día cargado (que puede estar incompleto)
+e invalida únicamente los resultados cuyo rango llega a ese día.
+
+Requiere: pip install numpy
+"""
+
+import argparse
+import itertools
+import os
+import sqlite3
+import sys
+import time
+from datetime import date
+
+import numpy as np
+
+from db_connection import connect
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, 'task_gamification.db')
+
+CATEGORIES = ('STUDY', 'MATHEMATICS', 'HISTORY', 'SCIENCE',
+              'EXERCISE', 'SOCIAL', 'WORK', 'PERSONAL')
+FREQUENCIES = ('day', 'week', 'month')
+
+# Tamaño máximo (bytes) del bitmap de pares (clave, usuario) para contar
+# usuarios distintos; por encima se usa np.unique
+BITMAP_LIMIT = 64 * 1024 * 1024
+
+# Días desde 1970-01-01 (el formato de datetime64[D])
+EPOCH_DAY_SQL = "CAST(julianday({}) - 2440587.5 AS INTEGER)"
+
+
+def _epoch_day(value):
+    """date, 'YYYY-MM-DD' o None → días desde 1970-01-01"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return int(np.datetime64(value, 'D').astype(np.int64))
+
+
+def period_keys(days, freq):
+    """Clave de periodo de cada día: el propio día, su lunes o el mes"""
+    if freq == 'day':
+        return days
+    if freq == 'week':
+        # 1970-01-01 fue jueves: el lunes anterior es el día -3
+        return (days + 3) // 7 * 7 - 3
+    if freq == 'month':
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    raise ValueError(f"Frecuencia desconocida: {freq}")
+
+
+def period_label(key, freq):
+    unit = 'M' if freq == 'month' else 'D'
+    return str(np.datetime64(int(key), unit))
+
+
+def _fetch_columns(cursor, columns):
+    """Cursor → tupla de arrays int64 (uno por columna) sin listas intermedias"""
+    flat = np.fromiter(itertools.chain.from_iterable(cursor), dtype=np.int64)
+    table = flat.reshape(-1, columns)
+    return tuple(table[:, i].copy() for i in range(columns))
+
+
+def _sorted_by_day(names, columns):
+    """Columnas con nombre ordenadas por día (más rápido que ORDER BY con el índice)"""
+    order = np.argsort(columns[0], kind='stable')
+    return {name: column[order] for name, column in zip(names, columns)}
+
+
+def _grouped_sums(periods, groups, users, weights, active):
+    """
+    Suma cada columna de `weights` por (periodo, grupo) y cuenta los usuarios
+    distintos con actividad.
+
+    Returns:
+        (claves de periodo, claves de grupo, {nombre: array}, usuarios activos)
+    """
+    p_keys, p_idx = np.unique(periods, return_inverse=True)
+    g_keys, g_idx = np.unique(groups, return_inverse=True)
+    combined = p_idx.astype(np.int64) * max(len(g_keys), 1) + g_idx
+    keys, inverse = np.unique(combined, return_inverse=True)
+    sums = {name: np.bincount(inverse, weights=column, minlength=keys.size).astype(np.int64)
+            for name, column in weights.items()}
+
+    # Usuarios distintos por clave: pares (clave, usuario) únicos, con un
+    # bitmap si cabe (evita ordenar los pares)
+    stride = int(users.max()) + 1 if users.size else 1
+    if stride > BITMAP_LIMIT:
+        # ids dispersos (shards): numeración compacta para que los pares no desborden
+        users = np.unique(users, return_inverse=True)[1]
+        stride = int(users.max()) + 1
+    pairs = inverse[active].astype(np.int64) * stride + users[active]
+    if keys.size * stride <= BITMAP_LIMIT:
+        seen = np.zeros(keys.size * stride, dtype=bool)
+        seen[pairs] = True
+        active_users = seen.reshape(keys.size, stride).sum(axis=1)
+    else:
+        active_users = np.bincount(np.unique(pairs) // stride, minlength=keys.size)
+
+    n_groups = max(len(g_keys), 1)
+    return p_keys[keys // n_groups], g_keys[keys % n_groups], sums, active_users
+
+
+class Analytics:
+    """
+    Arrays columnares de daily_stats y tareas completadas con agregados
+    cacheados por rango.
+
+    Uso:
+        analytics = Analytics(conn)
+        analytics.daily_rollup('2026-07-01', '2026-09-30', freq='month', by='cohort')
+        analytics.task_rollup(freq='week', by='category')
+        analytics.refresh()     # al llegar días nuevos
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._cache = {}
+        self.daily = None
+        self.tasks = None
+        self.cohorts = None
+        self.last_day = None
+        self.reload()
+
+    def _load_daily(self, from_day):
+        cursor = self.conn.execute(f"""
+            SELECT {EPOCH_DAY_SQL.format('stat_date')}, user_id,
+                   tasks_completed, xp_earned, study_minutes
+            FROM daily_stats
+            WHERE stat_date >= ?
+        """, (period_label(from_day, 'day') if from_day is not None else '',))
+        return _sorted_by_day(('day', 'user', 'tasks', 'xp', 'minutes'),
+                              _fetch_columns(cursor, 5))
+
+    def _load_tasks(self, from_day):
+        case = " ".join(f"WHEN '{c}' THEN {i}" for i, c in enumerate(CATEGORIES))
+        cursor = self.conn.execute(f"""
+            SELECT {EPOCH_DAY_SQL.format('completed_at')}, user_id,
+                   CASE category {case} END, xp_reward
+            FROM tasks
+            WHERE status = 'COMPLETED' AND completed_at >= ?
+        """, (period_label(from_day, 'day') if from_day is not None else '',))
+        return _sorted_by_day(('day', 'user', 'category', 'xp'), _fetch_columns(cursor, 4))
+
+    def _load_cohorts(self):
+        """
+        (user_id ordenados, mes de alta en meses desde 1970-01). Se busca con
+        searchsorted en vez de indexar por id: los ids pueden ser dispersos
+        (shards de sharding.py)
+        """
+        ids, days = _fetch_columns(self.conn.execute(
+            f"SELECT id, {EPOCH_DAY_SQL.format('created_at')} FROM users ORDER BY id"), 2)
+        return ids, period_keys(days, 'month')
+
+    def reload(self):
+        """Carga completa y vacía la caché"""
+        self.daily = self._load_daily(None)
+        self.tasks = self._load_tasks(None)
+        self.cohorts = self._load_cohorts()
+        self._cache.clear()
+        self.last_day = self._max_day()
+
+    def _max_day(self):
+        days = [d['day'][-1] for d in (self.daily, self.tasks) if d['day'].size]
+        return int(max(days)) if days else None
+
+    def refresh(self):
+        """
+        Relee cada fuente desde su último día cargado (incluido, puede estar
+        incompleto) y añade los días nuevos. Invalida solo los resultados
+        cacheados cuyo rango llega al primer día releído.
+
+        Returns:
+            (filas releídas de daily_stats, tareas completadas releídas)
+        """
+        reread = []
+        from_days = []
+        for columns, loader in ((self.daily, self._load_daily), (self.tasks, self._load_tasks)):
+            from_day = int(columns['day'][-1]) if columns['day'].size else None
+            new = loader(from_day)
+            keep = 0 if from_day is None else np.searchsorted(columns['day'], from_day)
+            for name in columns:
+                columns[name] = np.concatenate((columns[name][:keep], new[name]))
+            reread.append(new['day'].size)
+            from_days.append(from_day if from_day is not None else -np.inf)
+        self.cohorts = self._load_cohorts()
+        first = min(from_days)
+        self._cache = {key: value for key, value in self._cache.items()
+                       if key[2] is not None and key[2] < first}
+        self.last_day = self._max_day()
+        return tuple(reread)
+
+    def _range(self, columns, start, end):
+        """Slice de las filas con start <= día <= end (arrays ordenados por día)"""
+        days = columns['day']
+        lo = 0 if start is None else np.searchsorted(days, start, side='left')
+        hi = days.size if end is None else np.searchsorted(days, end, side='right')
+        return slice(lo, hi)
+
+    def _groups(self, columns, rows, by):
+        if by is None:
+            return np.zeros(rows.stop - rows.start, dtype=np.int64)
+        if by == 'user':
+            return columns['user'][rows]
+        if by == 'cohort':
+            ids, months = self.cohorts
+            if not ids.size:
+                return np.zeros(rows.stop - rows.start, dtype=np.int64)
+            positions = np.searchsorted(ids, columns['user'][rows])
+            return months[np.minimum(positions, ids.size - 1)]
+        if by == 'category' and 'category' in columns:
+            return columns['category'][rows]
+        raise ValueError(f"Agrupación no disponible: {by}")
+
+    def _group_label(self, key, by):
+        if by == 'cohort':
+            return period_label(key, 'month')
+        if by == 'category':
+            return CATEGORIES[int(key)]
+        return None if by is None else int(key)
+
+    def _rollup(self, kind, start, end, freq, by):
+        if freq not in FREQUENCIES:
+            raise ValueError(f"Frecuencia desconocida: {freq}")
+        start, end = _epoch_day(start), _epoch_day(end)
+        key = (kind, start, end, freq, by)
+        if key in self._cache:
+            return self._cache[key]
+
+        columns = self.daily if kind == 'daily' else self.tasks
+        rows = self._range(columns, start, end)
+        if kind == 'daily':
+            weights = {name: columns[name][rows] for name in ('tasks', 'xp', 'minutes')}
+            active = weights['tasks'] > 0
+        else:
+            # Una fila por tarea completada: el conteo es la suma de unos
+            weights = {'tasks': np.ones(rows.stop - rows.start, dtype=np.int64),
+                       'xp': columns['xp'][rows]}
+            active = np.ones(rows.stop - rows.start, dtype=bool)
+        periods, groups, sums, active_users = _grouped_sums(
+            period_keys(columns['day'][rows], freq), self._groups(columns, rows, by),
+            columns['user'][rows], weights, active)
+
+        result = {
+            'period': [period_label(p, freq) for p in periods],
+            'group': [self._group_label(g, by) for g in groups],
+            'active_users': active_users,
+            **sums,
+        }
+        self._cache[key] = result
+        return result
+
+    def daily_rollup(self, start=None, end=None, freq='month', by=None):
+        """
+        Totales de daily_stats por periodo (y grupo) entre start y end
+        (incluidos).
+
+        Returns:
+            dict de columnas alineadas: 'period', 'group', 'tasks', 'xp',
+            'minutes', 'active_users'
+        """
+        return self._rollup('daily', start, end, freq, by)
+
+    def task_rollup(self, start=None, end=None, freq='month', by='category'):
+        """
+        Tareas completadas y XP por periodo (y grupo) según completed_at.
+
+        Returns:
+            dict de columnas alineadas: 'period', 'group', 'tasks', 'xp',
+            'active_users'
+        """
+        return self._rollup('tasks', start, end, freq, by)
+
+    def month_over_month(self, start=None, end=None, by=None):
+        """
+        Totales mensuales de daily_stats con la variación (%) respecto al mes
+        anterior del mismo grupo.
+
+        Returns:
+            Lista de dicts {'month', 'group', 'tasks', 'xp', 'minutes',
+            'active_users', 'xp_change_pct', 'active_change_pct'}
+        """
+        rollup = self.daily_rollup(start, end, 'month', by)
+        report = []
+        previous = {}
+        for i, (month, group) in enumerate(zip(rollup['period'], rollup['group'])):
+            row = {'month': month, 'group': group}
+            for name in ('tasks', 'xp', 'minutes', 'active_users'):
+                row[name] = int(rollup[name][i])
+            prev = previous.get(group)
+            for name in ('xp', 'active_users'):
+                label = 'active_change_pct' if name == 'active_users' else 'xp_change_pct'
+                row[label] = (round((row[name] - prev[name]) / prev[name] * 100, 1)
+                              if prev and prev[name] else None)
+            previous[group] = row
+            report.append(row)
+        return report
+
+
+def _format_pct(value):
+    return "—" if value is None else f"{value:+.1f}%"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Informes de analítica con NumPy")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Ruta de la base de datos")
+    parser.add_argument('--desde', help="Fecha inicial YYYY-MM-DD")
+    parser.add_argument('--hasta', help="Fecha final YYYY-MM-DD (incluida)")
+    parser.add_argument('--por', choices=('cohort', 'category'),
+                        help="Agrupar por cohorte (mes de alta) o por categoría")
+    parser.add_argument('--frecuencia', choices=FREQUENCIES, default='month',
+                        help="Periodo para el informe por categoría")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ Error: No existe {args.db}")
+        return 1
+
+    conn = connect(args.db, 'readonly', readonly=True)
+    try:
+        start = time.perf_counter()
+        analytics = Analytics(conn)
+        loaded = time.perf_counter() - start
+        print(f"📥 {analytics.daily['day'].size:,} filas de daily_stats y "
+              f"{analytics.tasks['day'].size:,} tareas completadas en {loaded:.2f}s")
+
+        start = time.perf_counter()
+        if args.por == 'category':
+            rollup = analytics.task_rollup(args.desde, args.hasta, args.frecuencia, 'category')
+            elapsed = time.perf_counter() - start
+            print(f"\n📊 Tareas completadas por categoría ({elapsed * 1000:.1f} ms)")
+            print(f"   {'Periodo':12} {'Categoría':12} {'Tareas':>10} {'XP':>12} {'Usuarios':>10}")
+            for i, period in enumerate(rollup['period']):
+                print(f"   {period:12} {rollup['group'][i]:12} {rollup['tasks'][i]:>10,} "
+                      f"{rollup['xp'][i]:>12,} {rollup['active_users'][i]:>10,}")
+            return 0
+
+        report = analytics.month_over_month(args.desde, args.hasta, args.por)
+        elapsed = time.perf_counter() - start
+        print(f"\n📈 Informe mes a mes ({elapsed * 1000:.1f} ms)")
+        print(f"   {'Mes':8} {'Cohorte':8} {'Tareas':>10} {'XP':>12} {'Δ XP':>8} "
+              f"{'Activos':>9} {'Δ activos':>10}")
+        for row in report:
+            print(f"   {row['month']:8} {row['group'] or '':8} {row['tasks']:>10,} "
+                  f"{row['xp']:>12,} {_format_pct(row['xp_change_pct']):>8} "
+                  f"{row['active_users']:>9,} {_format_pct(row['active_change_pct']):>10}")
+    except sqlite3.Error as e:
+        print(f"\n❌ Error de SQLite: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
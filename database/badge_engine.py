@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Motor de evaluación de badges
+Calcula user_badges.progress e is_unlocked para todos los tipos de requisito
+del catálogo (TASK_COUNT, STREAK, XP_MILESTONE, CATEGORY_MASTER y SPECIAL)
+con unas pocas consultas agregadas por conjuntos, sin bucles por usuario.
+
+Al desbloquear un badge se abona su xp_bonus al usuario (check_level_up se
+encarga del nivel) y se registra BADGE_UNLOCKED en activity_log.
+
+El modo incremental solo reevalúa los usuarios con actividad posterior a la
+marca de agua guardada en app_settings (último activity_log.id procesado).
+La evaluación toma el lock de escritura (BEGIN IMMEDIATE) antes de leer
+nada, así que ninguna actividad de otras conexiones queda entre los usuarios
+leídos y la marca de agua guardada.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+from db_connection import connect
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, 'task_gamification.db')
+
+WATERMARK_KEY = 'badge_eval_watermark'
+
+CATEGORIES = ('STUDY', 'MATHEMATICS', 'HISTORY', 'SCIENCE',
+              'EXERCISE', 'SOCIAL', 'WORK', 'PERSONAL')
+
+# badge_key -> categoría para los badges CATEGORY_MASTER
+CATEGORY_BADGES = {
+    'MATH_MASTER': 'MATHEMATICS',
+    'SCIENCE_MASTER': 'SCIENCE',
+    'HISTORY_MASTER': 'HISTORY',
+}
+
+# badge_key -> columna de métricas para los badges SPECIAL
+SPECIAL_BADGES = {
+    'EARLY_BIRD': 'early_bird',   # Completadas antes de las 8 AM
+    'NIGHT_OWL': 'night_owl',     # Completadas a partir de las 10 PM
+}
+
+TEMP_TABLES = ('badge_scope', 'badge_metrics', 'badge_eval', 'badge_unlocks')
+
+
+def _progress_expression():
+    """Expresión SQL del progreso de un badge `b` para las métricas `m`"""
+    category = " ".join(f"WHEN '{key}' THEN m.cat_{cat.lower()}"
+                        for key, cat in CATEGORY_BADGES.items())
+    special = " ".join(f"WHEN '{key}' THEN m.{column}"
+                       for key, column in SPECIAL_BADGES.items())
+    return f"""
+        CASE b.requirement_type
+            WHEN 'TASK_COUNT' THEN m.tasks_completed
+            WHEN 'STREAK' THEN m.streak
+            WHEN 'XP_MILESTONE' THEN m.total_xp
+            WHEN 'CATEGORY_MASTER' THEN CASE b.badge_key {category} ELSE 0 END
+            WHEN 'SPECIAL' THEN CASE b.badge_key {special} ELSE 0 END
+            ELSE 0
+        END
+    """
+
+
+def _load_metrics(conn, scoped, with_tasks=True):
+    """
+    Métricas de los usuarios de temp.badge_scope: contadores de users más dos
+    pasadas agregadas sobre índices de cobertura de tasks (idx_tasks_search
+    para categorías e idx_tasks_completed para la hora de completado).
+    Con with_tasks=False solo se leen los contadores de users.
+    """
+    categories = sorted(set(CATEGORY_BADGES.values()))
+    category_sums = ", ".join(f"SUM(category = '{cat}') AS cat_{cat.lower()}"
+                              for cat in categories)
+    category_cols = ", ".join(f"COALESCE(c.cat_{cat.lower()}, 0) AS cat_{cat.lower()}"
+                              for cat in categories)
+    category_list = ", ".join(f"'{cat}'" for cat in categories)
+    scope_filter = "AND user_id IN (SELECT user_id FROM temp.badge_scope)" if scoped else ""
+    if not with_tasks:
+        scope_filter += " AND 0"
+
+    conn.execute("DROP TABLE IF EXISTS temp.badge_metrics")
+    conn.execute(f"""
+        CREATE TEMP TABLE badge_metrics AS
+        SELECT u.id AS user_id,
+               u.tasks_completed,
+               MAX(u.current_streak, u.longest_streak) AS streak,
+               u.total_xp_earned AS total_xp,
+               {category_cols},
+               COALESCE(h.early_bird, 0) AS early_bird,
+               COALESCE(h.night_owl, 0) AS night_owl
+        FROM temp.badge_scope s
+        JOIN users u ON u.id = s.user_id
+        LEFT JOIN (
+            SELECT user_id, {category_sums}
+            FROM tasks INDEXED BY idx_tasks_search
+            WHERE status = 'COMPLETED' AND category IN ({category_list}) {scope_filter}
+            GROUP BY user_id
+        ) c ON c.user_id = u.id
+        LEFT JOIN (
+            SELECT user_id,
+                   SUM(substr(completed_at, 12, 2) < '08') AS early_bird,
+                   SUM(substr(completed_at, 12, 2) >= '22') AS night_owl
+            FROM tasks INDEXED BY idx_tasks_completed
+            WHERE status = 'COMPLETED' {scope_filter}
+            GROUP BY user_id
+        ) h ON h.user_id = u.id
+    """)
+
+
+def _evaluate_scope(conn, scoped, requirement_types=None, with_tasks=True):
+    """
+    Evalúa los badges activos (opcionalmente solo de `requirement_types`)
+    para los usuarios de temp.badge_scope, escribe en user_badges solo las
+    filas que cambian y abona los desbloqueos nuevos.
+
+    Returns:
+        (badges desbloqueados, XP abonado)
+    """
+    _load_metrics(conn, scoped, with_tasks)
+    type_filter = ""
+    if requirement_types:
+        type_filter = "AND b.requirement_type IN (%s)" % ", ".join(
+            f"'{t}'" for t in requirement_types)
+
+    conn.execute("DROP TABLE IF EXISTS temp.badge_eval")
+    conn.execute(f"""
+        CREATE TEMP TABLE badge_eval AS
+        SELECT e.user_id, e.badge_id, e.name, e.xp_bonus,
+               MIN(e.value, e.requirement_value) AS progress,
+               e.value >= e.requirement_value AS unlocked,
+               ub.id AS user_badge_id,
+               COALESCE(ub.is_unlocked, 0) AS was_unlocked
+        FROM (
+            SELECT m.user_id, b.id AS badge_id, b.name, b.xp_bonus,
+                   b.requirement_value, {_progress_expression()} AS value
+            FROM temp.badge_metrics m
+            CROSS JOIN badges b
+            WHERE b.is_active = 1 {type_filter}
+        ) e
+        LEFT JOIN user_badges ub ON ub.user_id = e.user_id AND ub.badge_id = e.badge_id
+        WHERE ub.id IS NULL
+           OR ub.progress != MIN(e.value, e.requirement_value)
+           OR (ub.is_unlocked = 0 AND e.value >= e.requirement_value)
+    """)
+
+    # Filas existentes por rowid y filas nuevas con un INSERT aparte
+    conn.execute("""
+        UPDATE user_badges
+        SET progress = e.progress,
+            is_unlocked = MAX(user_badges.is_unlocked, e.unlocked),
+            unlocked_at = CASE WHEN user_badges.is_unlocked = 0 AND e.unlocked = 1
+                               THEN CURRENT_TIMESTAMP ELSE user_badges.unlocked_at END
+        FROM temp.badge_eval e
+        WHERE user_badges.id = e.user_badge_id
+    """)
+    conn.execute("""
+        INSERT INTO user_badges (user_id, badge_id, progress, is_unlocked)
+        SELECT user_id, badge_id, progress, unlocked
+        FROM temp.badge_eval
+        WHERE user_badge_id IS NULL
+    """)
+
+    conn.execute("DROP TABLE IF EXISTS temp.badge_unlocks")
+    conn.execute("""
+        CREATE TEMP TABLE badge_unlocks AS
+        SELECT user_id, badge_id, name, xp_bonus
+        FROM temp.badge_eval
+        WHERE unlocked = 1 AND was_unlocked = 0
+    """)
+    unlocked, xp = conn.execute("""
+        SELECT COUNT(*), COALESCE(SUM(xp_bonus), 0) FROM temp.badge_unlocks
+    """).fetchone()
+    if unlocked:
+        conn.execute("""
+            INSERT INTO activity_log (user_id, activity_type, entity_type, entity_id,
+                                      description, xp_change)
+            SELECT user_id, 'BADGE_UNLOCKED', 'badge', badge_id,
+                   '¡Desbloqueaste: ' || name || '!', xp_bonus
+            FROM temp.badge_unlocks
+            ORDER BY user_id, badge_id
+        """)
+        conn.execute("""
+            UPDATE users
+            SET current_xp = current_xp + d.bonus,
+                total_xp_earned = total_xp_earned + d.bonus
+            FROM (
+                SELECT user_id, SUM(xp_bonus) AS bonus
+                FROM temp.badge_unlocks
+                GROUP BY user_id
+            ) d
+            WHERE users.id = d.user_id AND d.bonus > 0
+        """)
+    return unlocked, xp
+
+
+def evaluate_badges(conn, user_ids=None):
+    """
+    Evalúa los badges de todos los usuarios (o de `user_ids`) en una
+    transacción. El XP de los badges desbloqueados puede desbloquear nuevos
+    XP_MILESTONE, así que se repite sobre los usuarios afectados hasta que
+    no hay desbloqueos nuevos.
+
+    Returns:
+        dict con usuarios evaluados, badges desbloqueados y XP abonado
+    """
+    try:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DROP TABLE IF EXISTS temp.badge_scope")
+        conn.execute("CREATE TEMP TABLE badge_scope (user_id INTEGER PRIMARY KEY)")
+        if user_ids is None:
+            conn.execute("INSERT INTO temp.badge_scope SELECT id FROM users")
+        else:
+            conn.executemany("INSERT OR IGNORE INTO temp.badge_scope VALUES (?)",
+                             ((user_id,) for user_id in user_ids))
+        users = conn.execute("SELECT COUNT(*) FROM temp.badge_scope").fetchone()[0]
+
+        total_unlocked, total_xp = _evaluate_scope(conn, scoped=user_ids is not None)
+        xp = total_xp
+        max_rounds = conn.execute("SELECT COUNT(*) FROM badges").fetchone()[0]
+        for _ in range(max_rounds):
+            if not xp:
+                break
+            # Solo el XP abonado puede cambiar algo: XP_MILESTONE de esos usuarios
+            conn.execute("DELETE FROM temp.badge_scope")
+            conn.execute("INSERT INTO temp.badge_scope "
+                         "SELECT DISTINCT user_id FROM temp.badge_unlocks WHERE xp_bonus > 0")
+            unlocked, xp = _evaluate_scope(conn, scoped=True,
+                                           requirement_types=('XP_MILESTONE',),
+                                           with_tasks=False)
+            total_unlocked += unlocked
+            total_xp += xp
+        _save_watermark(conn)
+        conn.commit()
+        return {'users': users, 'unlocked': total_unlocked, 'xp_credited': total_xp}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        for table in TEMP_TABLES:
+            conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+
+
+def get_watermark(conn):
+    row = conn.execute("SELECT setting_value FROM app_settings WHERE setting_key = ?",
+                       (WATERMARK_KEY,)).fetchone()
+    return int(row[0]) if row and row[0] else 0
+
+
+def _save_watermark(conn):
+    """
+    Guarda como marca de agua el último activity_log.id. La transacción tiene
+    el lock de escritura desde antes de leer los usuarios, así que las filas
+    posteriores a esa lectura son solo los BADGE_UNLOCKED propios.
+    """
+    conn.execute("""
+        INSERT INTO app_settings (setting_key, setting_value, setting_type, description)
+        VALUES (?, (SELECT COALESCE(MAX(id), 0) FROM activity_log), 'INTEGER',
+                'Último activity_log.id evaluado por badge_engine.py')
+        ON CONFLICT(setting_key) DO UPDATE SET
+            setting_value = excluded.setting_value,
+            updated_at = CURRENT_TIMESTAMP
+    """, (WATERMARK_KEY,))
+
+
+def evaluate_incremental(conn):
+    """Evalúa solo los usuarios con actividad posterior a la marca de agua"""
+    # Misma transacción que la evaluación y el guardado de la marca de agua
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        watermark = get_watermark(conn)
+        user_ids = [row[0] for row in conn.execute(
+            "SELECT DISTINCT user_id FROM activity_log WHERE id > ?", (watermark,))]
+    except Exception:
+        conn.rollback()
+        raise
+    result = evaluate_badges(conn, user_ids)
+    result['watermark'] = watermark
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evalúa el progreso de badges")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Ruta de la base de datos")
+    parser.add_argument('--completo', action='store_true',
+                        help="Reevaluar todos los usuarios (por defecto: incremental)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ Error: No existe {args.db}")
+        return 1
+
+    print("=" * 80)
+    print("🏆 EVALUACIÓN DE BADGES")
+    print("=" * 80)
+    conn = connect(args.db, 'tuned')
+    try:
+        start = time.perf_counter()
+        result = evaluate_badges(conn) if args.completo else evaluate_incremental(conn)
+        elapsed = time.perf_counter() - start
+    except sqlite3.Error as e:
+        print(f"\n❌ Error de SQLite: {e}")
+        return 1
+    finally:
+        conn.close()
+
+    print(f"👤 Usuarios evaluados: {result['users']}")
+    print(f"🏆 Badges desbloqueados: {result['unlocked']}")
+    print(f"⭐ XP abonado: {result['xp_credited']}")
+    print(f"⏱️  Tiempo: {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la cadena de triggers y de las vistas de schema.sql
+Genera bases de datos de tamaño creciente con seed_database.py y mide
+latencias (p50/p95/p99) y throughput de:
+  - completar una tarea (task_completed_stats + triggers anidados de users)
+  - crear una tarea
+  - v_user_summary (y v_user_summary_fast), v_tasks_enriched, v_badge_progress
+    y v_weekly_stats
+
+Los resultados se pueden guardar en JSON para comparar entre cambios de schema.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+from db_connection import DEFAULT_PROFILE, PROFILES, connect
+from seed_database import SCHEMA_FILE, seed_database
+
+# (usuarios, tareas por usuario)
+DEFAULT_SIZES = ((100, 50), (1000, 50), (5000, 100))
+
+VIEW_QUERIES = {
+    'v_user_summary': "SELECT * FROM v_user_summary WHERE id = ?",
+    'v_user_summary_fast': "SELECT * FROM v_user_summary_fast WHERE id = ?",
+    'v_tasks_enriched': "SELECT * FROM v_tasks_enriched WHERE user_id = ?",
+    'v_badge_progress': "SELECT * FROM v_badge_progress WHERE user_id = ?",
+    'v_weekly_stats': "SELECT * FROM v_weekly_stats WHERE user_id = ?",
+}
+
+
+def percentile(samples, pct):
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not samples:
+        return 0.0
+    index = max(0, min(len(samples) - 1, int(round(pct / 100 * len(samples))) - 1))
+    return samples[index]
+
+
+def summarize(operation, samples):
+    """Resume una lista de latencias (segundos) en milisegundos"""
+    samples = sorted(samples)
+    total = sum(samples)
+    return {
+        'operation': operation,
+        'iterations': len(samples),
+        'p50_ms': round(percentile(samples, 50) * 1000, 4),
+        'p95_ms': round(percentile(samples, 95) * 1000, 4),
+        'p99_ms': round(percentile(samples, 99) * 1000, 4),
+        'max_ms': round(samples[-1] * 1000, 4) if samples else 0.0,
+        'ops_per_sec': round(len(samples) / total, 1) if total else 0.0,
+    }
+
+
+def bench_complete_task(conn, rng, iterations):
+    """Completa tareas pendientes una a una, con commit por operación"""
+    pending = [row[0] for row in conn.execute(
+        "SELECT id FROM tasks WHERE status != 'COMPLETED'")]
+    task_ids = rng.sample(pending, min(iterations, len(pending)))
+    samples = []
+    for task_id in task_ids:
+        start = time.perf_counter()
+        conn.execute("""
+            UPDATE tasks
+            SET status = 'COMPLETED',
+                completed_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (task_id,))
+        conn.commit()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_create_task(conn, rng, user_ids, iterations):
+    """Crea tareas nuevas para usuarios aleatorios"""
+    samples = []
+    today = date.today().isoformat()
+    for i in range(iterations):
+        user_id = rng.choice(user_ids)
+        start = time.perf_counter()
+        conn.execute("""
+            INSERT INTO tasks (uuid, user_id, title, description, category, priority,
+                               status, due_date, xp_reward)
+            VALUES (?, ?, ?, ?, 'STUDY', 'MEDIUM', 'PENDING', ?, 15)
+        """, (f"bench-{time.time_ns()}-{i}", user_id, f"Tarea benchmark {i}",
+              "Creada por benchmark_triggers.py", today))
+        conn.commit()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_query(conn, rng, sql, user_ids, iterations):
+    """Ejecuta una consulta por usuario aleatorio y consume todas las filas"""
+    samples = []
+    for _ in range(iterations):
+        user_id = rng.choice(user_ids)
+        start = time.perf_counter()
+        conn.execute(sql, (user_id,)).fetchall()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run_size(db_path, users, tasks_per_user, iterations, seed, profile=DEFAULT_PROFILE):
+    """Siembra una base de datos y ejecuta todos los benchmarks sobre ella"""
+    seed_info = seed_database(db_path, users=users, tasks_per_user=tasks_per_user,
+                              seed=seed, fresh=True, verbose=False)
+    rng = random.Random(seed)
+    conn = connect(db_path, profile)
+    try:
+        user_ids = [row[0] for row in conn.execute("SELECT id FROM users")]
+        results = []
+        for name, sql in VIEW_QUERIES.items():
+            results.append(summarize(name, bench_query(conn, rng, sql, user_ids, iterations)))
+        results.append(summarize('create_task', bench_create_task(conn, rng, user_ids,
+                                                                  iterations)))
+        results.append(summarize('complete_task', bench_complete_task(conn, rng, iterations)))
+        for result in results:
+            result.update(users=users, tasks=users * tasks_per_user)
+        return {
+            'users': users,
+            'tasks_per_user': tasks_per_user,
+            'seed_seconds': round(seed_info['seconds'], 3),
+            'db_size_bytes': os.path.getsize(db_path),
+            'results': results,
+        }
+    finally:
+        conn.close()
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, iterations=200, seed=42, workdir=None,
+                   verbose=True, profile=DEFAULT_PROFILE):
+    """
+    Ejecuta el benchmark para cada tamaño y devuelve un dict serializable.
+    Incluye un hash de schema.sql y el perfil de conexión para poder comparar
+    resultados entre versiones.
+    """
+    with open(SCHEMA_FILE, 'rb') as f:
+        schema_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'sqlite_version': sqlite3.sqlite_version,
+        'profile': profile,
+        'schema_sha256': schema_hash,
+        'iterations': iterations,
+        'seed': seed,
+        'sizes': [],
+    }
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for users, tasks_per_user in sizes:
+            if verbose:
+                print(f"\n⏱️  {users} usuarios × {tasks_per_user} tareas...")
+            db_path = os.path.join(tmp, f"bench_{users}x{tasks_per_user}.db")
+            size_report = run_size(db_path, users, tasks_per_user, iterations, seed, profile)
+            report['sizes'].append(size_report)
+            if verbose:
+                print_results(size_report['results'])
+    return report
+
+
+def print_results(results):
+    print(f"   {'Operación':20} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'ops/s':>10}")
+    for r in results:
+        print(f"   {r['operation']:20} {r['p50_ms']:10.3f} {r['p95_ms']:10.3f} "
+              f"{r['p99_ms']:10.3f} {r['ops_per_sec']:10.1f}")
+
+
+def compare_reports(baseline, current):
+    """Imprime la variación de p50/p95 respecto a un informe anterior"""
+    def index(report):
+        return {(size['users'], size['tasks_per_user'], r['operation']): r
+                for size in report['sizes'] for r in size['results']}
+
+    before = index(baseline)
+    print(f"\n📈 Comparación con schema {baseline['schema_sha256']} "
+          f"({baseline.get('profile', 'default')}) → {current['schema_sha256']} "
+          f"({current['profile']})")
+    for key, r in index(current).items():
+        old = before.get(key)
+        if not old or not old['p50_ms']:
+            continue
+        delta50 = (r['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100
+        delta95 = (r['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0
+        print(f"   {key[0]}x{key[1]:<6} {key[2]:18} p50 {delta50:+7.1f}%   p95 {delta95:+7.1f}%")
+
+
+def parse_sizes(text):
+    """Convierte '100x50,1000x50' en ((100, 50), (1000, 50))"""
+    sizes = []
+    for item in text.split(','):
+        users, tasks = item.lower().split('x')
+        sizes.append((int(users), int(tasks)))
+    return tuple(sizes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark de triggers y vistas de task_gamification.db")
+    parser.add_argument('--tamanos', type=parse_sizes, default=DEFAULT_SIZES,
+                        help="Lista USUARIOSxTAREAS separada por comas (ej. 100x50,1000x50)")
+    parser.add_argument('--iteraciones', type=int, default=200,
+                        help="Iteraciones por operación")
+    parser.add_argument('--semilla', type=int, default=42, help="Semilla aleatoria")
+    parser.add_argument('--json', dest='json_path', help="Guardar resultados en este archivo")
+    parser.add_argument('--dir', default=None, help="Directorio para las BDs temporales")
+    parser.add_argument('--comparar', help="JSON de una ejecución anterior para comparar")
+    parser.add_argument('--perfil', choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="Perfil de PRAGMAs de db_connection.py")
+    args = parser.parse_args(argv)
+
+    print("=" * 80)
+    print("🏁 BENCHMARK DE TRIGGERS Y VISTAS")
+    print("=" * 80)
+
+    report = run_benchmarks(args.tamanos, args.iteraciones, args.semilla, args.dir,
+                            profile=args.perfil)
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            compare_reports(json.load(f), report)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Resultados guardados en: {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
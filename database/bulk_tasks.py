@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Completado masivo de tareas en una sola transacción
+Equivale a ejecutar `UPDATE tasks SET status = 'COMPLETED'` tarea por tarea
+(task_completed_stats + check_level_up + update_*_timestamp), pero aplicando
+los cambios por conjuntos:
+  - users: un UPDATE con los deltas agregados por usuario
+  - daily_stats: un upsert por (usuario, día)
+  - activity_log: TASK_COMPLETED y LEVEL_UP insertados en lote, en el mismo
+    orden en que los habrían escrito los triggers
+  - tasks: un único UPDATE con task_completed_stats, update_tasks_timestamp y
+    summary_task_update desactivados por su WHEN (triggers_bypassed(): una
+    fila de app_settings que solo existe dentro de la transacción, sin DDL ni
+    cambio de esquema)
+  - user_summary: un UPDATE con las tareas pendientes/vencidas que dejan de
+    serlo por usuario (lo que restaría summary_task_update fila a fila)
+
+El estado final es idéntico al del camino con triggers completando las tareas
+en el orden recibido (salvo los valores de CURRENT_TIMESTAMP).
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from db_connection import connect, copy_database, triggers_bypassed
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, 'task_gamification.db')
+
+
+def _stage_tasks(conn, task_ids):
+    """Copia a tablas temporales las tareas a completar, en el orden recibido"""
+    conn.execute("DROP TABLE IF EXISTS temp.bulk_ids")
+    conn.execute("DROP TABLE IF EXISTS temp.bulk_tasks")
+    conn.execute("CREATE TEMP TABLE bulk_ids (seq INTEGER PRIMARY KEY, task_id INTEGER UNIQUE)")
+    conn.executemany("INSERT OR IGNORE INTO temp.bulk_ids (task_id) VALUES (?)",
+                     ((task_id,) for task_id in task_ids))
+    # Solo tareas existentes que aún no estaban completadas (misma condición
+    # WHEN que task_completed_stats)
+    conn.execute("""
+        CREATE TEMP TABLE bulk_tasks AS
+        SELECT b.seq, t.*
+        FROM temp.bulk_ids b
+        JOIN tasks t ON t.id = b.task_id
+        WHERE t.status != 'COMPLETED'
+        ORDER BY b.seq
+    """)
+    return conn.execute("SELECT COUNT(*) FROM temp.bulk_tasks").fetchone()[0]
+
+
+def _stage_user_deltas(conn):
+    """
+    Calcula por tarea el XP acumulado y el nivel antes/después tal como lo
+    vería check_level_up, y por usuario los deltas agregados.
+    """
+    conn.execute("DROP TABLE IF EXISTS temp.bulk_progress")
+    conn.execute("DROP TABLE IF EXISTS temp.bulk_user_deltas")
+    conn.execute("""
+        CREATE TEMP TABLE bulk_progress AS
+        WITH running AS (
+            SELECT b.seq, b.id AS task_id, b.user_id, b.title, b.xp_reward,
+                   u.level AS base_level,
+                   u.current_xp + SUM(b.xp_reward) OVER w AS xp_after
+            FROM temp.bulk_tasks b
+            JOIN users u ON u.id = b.user_id
+            WINDOW w AS (PARTITION BY b.user_id ORDER BY b.seq)
+        ),
+        fired AS (
+            -- check_level_up solo se dispara si current_xp cambia
+            SELECT *,
+                   CASE WHEN xp_reward > 0 THEN xp_after / 100 + 1 END AS level_candidate
+            FROM running
+        )
+        SELECT seq, task_id, user_id, title, xp_reward, xp_after, level_candidate,
+               MAX(base_level, COALESCE(MAX(level_candidate) OVER (
+                   PARTITION BY user_id ORDER BY seq
+                   ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+               ), base_level)) AS level_before
+        FROM fired
+    """)
+    conn.execute("""
+        CREATE TEMP TABLE bulk_user_deltas (
+            user_id INTEGER PRIMARY KEY, tasks INTEGER, xp INTEGER, new_level INTEGER
+        )
+    """)
+    conn.execute("""
+        INSERT INTO temp.bulk_user_deltas
+        SELECT p.user_id,
+               COUNT(*) AS tasks,
+               SUM(p.xp_reward) AS xp,
+               MAX(u.level, COALESCE(MAX(p.level_candidate), u.level)) AS new_level
+        FROM temp.bulk_progress p
+        JOIN users u ON u.id = p.user_id
+        GROUP BY p.user_id
+    """)
+
+
+def complete_tasks(conn, task_ids, completed_at=None):
+    """
+    Marca como completadas muchas tareas en una única transacción.
+
+    Args:
+        conn: Conexión sqlite3 a task_gamification.db
+        task_ids: Iterable de ids de tareas (se respetan el orden y se ignoran
+            duplicados, inexistentes y ya completadas)
+        completed_at: Timestamp para tasks.completed_at (por defecto
+            CURRENT_TIMESTAMP)
+
+    Returns:
+        dict con tareas completadas, usuarios afectados y subidas de nivel
+    """
+    try:
+        completed = _stage_tasks(conn, task_ids)
+        if not completed:
+            conn.rollback()
+            return {'tasks_completed': 0, 'users': 0, 'level_ups': 0}
+        _stage_user_deltas(conn)
+
+        # 1. activity_log: LEVEL_UP (check_level_up) antes de TASK_COMPLETED
+        conn.execute("""
+            INSERT INTO activity_log (user_id, activity_type, entity_type, entity_id,
+                                      description, xp_change)
+            SELECT user_id, activity_type, entity_type, entity_id, description, xp_change
+            FROM (
+                SELECT seq, 0 AS kind, user_id, 'LEVEL_UP' AS activity_type,
+                       'user' AS entity_type, NULL AS entity_id,
+                       '¡Subiste al nivel ' || level_candidate || '!' AS description,
+                       0 AS xp_change
+                FROM temp.bulk_progress
+                WHERE level_candidate > level_before
+                UNION ALL
+                SELECT seq, 1, user_id, 'TASK_COMPLETED', 'task', task_id,
+                       'Completaste: ' || title, xp_reward
+                FROM temp.bulk_progress
+            )
+            ORDER BY seq, kind
+        """)
+        level_ups = conn.execute("""
+            SELECT COUNT(*) FROM temp.bulk_progress WHERE level_candidate > level_before
+        """).fetchone()[0]
+
+        # 2. users: primero el nivel (sin cambiar current_xp no se dispara
+        # check_level_up), luego los contadores; como el nivel ya es el final,
+        # check_level_up no vuelve a registrar LEVEL_UP
+        conn.execute("""
+            UPDATE users
+            SET level = d.new_level
+            FROM temp.bulk_user_deltas d
+            WHERE users.id = d.user_id AND users.level != d.new_level
+        """)
+        conn.execute("""
+            UPDATE users
+            SET tasks_completed = tasks_completed + d.tasks,
+                current_xp = current_xp + d.xp,
+                total_xp_earned = total_xp_earned + d.xp
+            FROM temp.bulk_user_deltas d
+            WHERE users.id = d.user_id
+        """)
+
+        # 3. daily_stats: un upsert por usuario para el día actual
+        conn.execute("""
+            INSERT INTO daily_stats (user_id, stat_date, tasks_completed, xp_earned)
+            SELECT user_id, DATE('now'), tasks, xp
+            FROM temp.bulk_user_deltas
+            WHERE true
+            ON CONFLICT(user_id, stat_date) DO UPDATE SET
+                tasks_completed = tasks_completed + excluded.tasks_completed,
+                xp_earned = xp_earned + excluded.xp_earned
+        """)
+
+        # 4. tasks: un UPDATE sin la cascada por fila
+        with triggers_bypassed(conn):
+            conn.execute("""
+                UPDATE tasks
+                SET status = 'COMPLETED',
+                    completed_at = COALESCE(?, CURRENT_TIMESTAMP),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id IN (SELECT id FROM temp.bulk_tasks)
+            """, (completed_at,))
+
+        # 5. user_summary: lo que habría restado summary_task_update (y la fila
+        # que crea si el usuario no tenía)
+        conn.execute("""
+            UPDATE user_summary
+            SET pending_tasks = pending_tasks - d.pending,
+                overdue_tasks = overdue_tasks - d.overdue
+            FROM (
+                SELECT user_id, SUM(status = 'PENDING') AS pending,
+                       SUM(status = 'OVERDUE') AS overdue
+                FROM temp.bulk_tasks
+                GROUP BY user_id
+            ) d
+            WHERE user_summary.user_id = d.user_id AND (d.pending OR d.overdue)
+        """)
+        conn.execute("""
+            INSERT OR IGNORE INTO user_summary (user_id)
+            SELECT user_id FROM temp.bulk_user_deltas
+        """)
+
+        users = conn.execute("SELECT COUNT(*) FROM temp.bulk_user_deltas").fetchone()[0]
+        conn.commit()
+        return {'tasks_completed': completed, 'users': users, 'level_ups': level_ups}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        for table in ('bulk_ids', 'bulk_tasks', 'bulk_progress', 'bulk_user_deltas'):
+            conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+
+
+def complete_tasks_with_triggers(conn, task_ids):
+    """Camino de referencia: un UPDATE por tarea, como test_triggers()"""
+    try:
+        for task_id in task_ids:
+            conn.execute("""
+                UPDATE tasks
+                SET status = 'COMPLETED',
+                    completed_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (task_id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# Columnas comparadas entre ambos caminos (sin timestamps de CURRENT_TIMESTAMP)
+COMPARED_QUERIES = {
+    'users': "SELECT id, current_xp, level, tasks_completed, total_xp_earned "
+             "FROM users ORDER BY id",
+    'tasks': "SELECT id, user_id, status, xp_reward, completed_at IS NOT NULL "
+             "FROM tasks ORDER BY id",
+    'daily_stats': "SELECT user_id, stat_date, tasks_completed, xp_earned "
+                   "FROM daily_stats ORDER BY user_id, stat_date",
+    'activity_log': "SELECT id, user_id, activity_type, entity_type, entity_id, "
+                    "description, xp_change FROM activity_log ORDER BY id",
+    'user_summary': "SELECT user_id, pending_tasks, overdue_tasks, badges_unlocked "
+                    "FROM user_summary ORDER BY user_id",
+}
+
+
+def compare_states(path_a, path_b):
+    """Devuelve las tablas cuyo contenido difiere entre dos bases de datos"""
+    conn_a = connect(path_a, 'readonly', readonly=True)
+    conn_b = connect(path_b, 'readonly', readonly=True)
+    try:
+        return [table for table, sql in COMPARED_QUERIES.items()
+                if conn_a.execute(sql).fetchall() != conn_b.execute(sql).fetchall()]
+    finally:
+        conn_a.close()
+        conn_b.close()
+
+
+def benchmark(db_path, count, seed=42):
+    """
+    Completa `count` tareas pendientes con ambos caminos sobre copias de la
+    base de datos, mide el tiempo y verifica que el estado final coincide.
+    """
+    conn = connect(db_path, 'readonly', readonly=True)
+    pending = [row[0] for row in conn.execute(
+        "SELECT id FROM tasks WHERE status != 'COMPLETED' ORDER BY id")]
+    conn.close()
+    task_ids = random.Random(seed).sample(pending, min(count, len(pending)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        timings = {}
+        copies = {}
+        for name, func in (('triggers', complete_tasks_with_triggers),
+                           ('bulk', complete_tasks)):
+            copies[name] = os.path.join(tmp, f"{name}.db")
+            conn = connect(copy_database(db_path, copies[name]), 'tuned')
+            start = time.perf_counter()
+            func(conn, task_ids)
+            timings[name] = time.perf_counter() - start
+            conn.close()
+        mismatches = compare_states(copies['triggers'], copies['bulk'])
+
+    return {
+        'tasks': len(task_ids),
+        'triggers_seconds': timings['triggers'],
+        'bulk_seconds': timings['bulk'],
+        'speedup': timings['triggers'] / timings['bulk'] if timings['bulk'] else 0.0,
+        'mismatches': mismatches,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compara el completado masivo con el camino de triggers")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Base de datos de origen (no se modifica)")
+    parser.add_argument('--tareas', type=int, default=10000, help="Tareas a completar")
+    parser.add_argument('--semilla', type=int, default=42, help="Semilla aleatoria")
+    args = parser.parse_args(argv)
+
+    print("=" * 80)
+    print("⚡ COMPLETADO MASIVO DE TAREAS")
+    print("=" * 80)
+    result = benchmark(args.db, args.tareas, args.semilla)
+    print(f"📋 Tareas: {result['tasks']}")
+    print(f"🐢 Triggers: {result['triggers_seconds']:.3f}s")
+    print(f"🚀 Masivo:   {result['bulk_seconds']:.3f}s  (x{result['speedup']:.1f})")
+    if result['mismatches']:
+        print(f"❌ Diferencias en: {', '.join(result['mismatches'])}")
+        return 1
+    print("✅ Estado final idéntico en ambos caminos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
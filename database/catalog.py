@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Catálogo de tablas con estadísticas rápidas
+Evita un COUNT(*) (recorrido completo del b-tree) por tabla al listar:
+  - conteo aproximado desde sqlite_stat1 (ANALYZE) o, si no hay
+    estadísticas, estimado a partir de las páginas del b-tree (producto del
+    fan-out de las páginas internas por las filas de la primera hoja)
+  - conteo exacto bajo demanda
+  - tamaño por tabla e índice con la tabla virtual dbstat
+
+Catalog cachea los resultados mientras PRAGMA data_version no cambie y
+calcula los conteos exactos y tamaños en un hilo en segundo plano.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from db_connection import DEFAULT_DB, connect
+
+
+def table_names(conn):
+    return [row[0] for row in conn.execute("""
+        SELECT name FROM sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+        ORDER BY name
+    """)]
+
+
+def stat1_counts(conn):
+    """Filas por tabla según sqlite_stat1 (vacío si nunca se ejecutó ANALYZE)"""
+    try:
+        rows = conn.execute("SELECT tbl, stat FROM sqlite_stat1").fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    counts = {}
+    for table, stat in rows:
+        if stat:
+            counts[table] = max(counts.get(table, 0), int(stat.split()[0]))
+    return counts
+
+
+def estimate_from_pages(conn, table):
+    """
+    Estima las filas recorriendo solo la rama izquierda del b-tree en dbstat
+    (profundidad del árbol en páginas, no el árbol completo).
+
+    Returns:
+        (filas, exacto) — exacto si el árbol es una sola hoja — o None si
+        dbstat no está disponible
+    """
+    estimate = 1
+    depth = 0
+    try:
+        for pagetype, ncell in conn.execute(
+                "SELECT pagetype, ncell FROM dbstat WHERE name = ?", (table,)):
+            if pagetype == 'internal':
+                estimate *= ncell + 1
+                depth += 1
+            elif pagetype == 'leaf':
+                return estimate * ncell, depth == 0
+    except sqlite3.OperationalError:
+        return None
+    return 0, True
+
+
+def exact_count(conn, table):
+    return conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+
+
+def approximate_counts(conn):
+    """
+    Conteo aproximado de todas las tablas.
+
+    Returns:
+        dict {tabla: (filas, origen)} con origen 'stat1', 'páginas' o 'exacto'
+    """
+    stats = stat1_counts(conn)
+    counts = {}
+    for table in table_names(conn):
+        if table in stats:
+            counts[table] = (stats[table], 'stat1')
+            continue
+        estimate = estimate_from_pages(conn, table)
+        if estimate is None:
+            counts[table] = (exact_count(conn, table), 'exacto')
+        else:
+            rows, exact = estimate
+            counts[table] = (rows, 'exacto' if exact else 'páginas')
+    return counts
+
+
+def object_sizes(conn):
+    """
+    Bytes en disco por tabla e índice (dbstat, recorre todas las páginas).
+
+    Returns:
+        dict {nombre: (tabla, bytes)} o {} si dbstat no está disponible
+    """
+    try:
+        rows = conn.execute("""
+            SELECT d.name, COALESCE(m.tbl_name, d.name), SUM(d.pgsize)
+            FROM dbstat d
+            LEFT JOIN sqlite_master m ON m.name = d.name
+            GROUP BY d.name
+        """).fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    return {name: (table, size) for name, table, size in rows}
+
+
+class Catalog:
+    """
+    Estadísticas de tablas cacheadas por PRAGMA data_version.
+
+    data_version es propio de cada conexión y cambia cuando otra conexión
+    hace commit, así que el catálogo usa una conexión de solo lectura propia
+    para detectarlo; los datos calculados en segundo plano se etiquetan con
+    la versión vista al empezar y se descartan si ya no coincide.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB, background=True):
+        self.db_path = db_path
+        self.background = background
+        self._conn = connect(db_path, 'readonly', readonly=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._version = None
+        self._approx = {}
+        self._exact = {}
+        self._sizes = {}
+        self._thread = None
+        self._closed = False
+
+    def data_version(self):
+        with self._lock:
+            if self._closed:
+                return None
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _ensure_fresh(self):
+        version = self.data_version()
+        if version == self._version:
+            return
+        with self._lock:
+            approx = approximate_counts(self._conn)
+        self._version, self._approx, self._exact, self._sizes = version, approx, {}, {}
+        if self.background:
+            self.refresh_async()
+
+    def tables(self):
+        """
+        Lista de dicts {'name', 'rows', 'exact', 'source', 'size_bytes',
+        'index_bytes'}. Usa el conteo exacto y los tamaños si ya están
+        calculados para la versión actual de los datos.
+        """
+        self._ensure_fresh()
+        result = []
+        for table, (rows, source) in self._approx.items():
+            exact = self._exact.get(table)
+            size = self._sizes.get(table, (table, None))[1]
+            index_bytes = sum(bytes_ for name, (owner, bytes_) in self._sizes.items()
+                              if owner == table and name != table) if self._sizes else None
+            result.append({
+                'name': table,
+                'rows': exact if exact is not None else rows,
+                'exact': exact is not None or source == 'exacto',
+                'source': 'exacto' if exact is not None else source,
+                'size_bytes': size,
+                'index_bytes': index_bytes,
+            })
+        return result
+
+    def exact_count(self, table):
+        """Conteo exacto bajo demanda (queda cacheado para esta versión)"""
+        self._ensure_fresh()
+        if table not in self._exact:
+            with self._lock:
+                self._exact[table] = exact_count(self._conn, table)
+        return self._exact[table]
+
+    def _refresh(self):
+        conn = connect(self.db_path, 'readonly', readonly=True)
+        try:
+            while True:
+                version = self._version
+                sizes = object_sizes(conn)
+                exact = {table: exact_count(conn, table) for table in table_names(conn)}
+                if self._closed:
+                    return
+                if self.data_version() == version == self._version:
+                    self._sizes = sizes
+                    self._exact.update(exact)
+                    return
+                # Los datos cambiaron durante el cálculo: repetir si ya se
+                # pidió la versión nueva; si no, la próxima lectura lo hará
+                if self._version == version:
+                    return
+        finally:
+            conn.close()
+
+    def refresh_async(self):
+        """
+        Calcula conteos exactos y tamaños en un hilo. Si ya hay uno en curso,
+        ese hilo repite el cálculo al terminar si la versión cambió.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        self._thread = threading.Thread(target=self._refresh, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def wait(self, timeout=None):
+        """Espera a que termine el refresco en segundo plano"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def close(self):
+        """Cierra el catálogo sin esperar al hilo (descarta su resultado)"""
+        with self._lock:
+            self._closed = True
+            self._conn.close()
+
+
+def format_bytes(value):
+    if value is None:
+        return "…"
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if value < 1024 or unit == 'GB':
+            return f"{value:.0f} {unit}" if unit == 'B' else f"{value:.1f} {unit}"
+        value /= 1024
+
+
+def print_catalog(tables):
+    print(f"   {'Tabla':24} {'Filas':>14} {'Datos':>10} {'Índices':>10}")
+    for t in tables:
+        rows = f"{t['rows']:,}" if t['exact'] else f"~{t['rows']:,}"
+        print(f"   {t['name']:24} {rows:>14} {format_bytes(t['size_bytes']):>10} "
+              f"{format_bytes(t['index_bytes']):>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Catálogo de tablas con estadísticas")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Ruta de la base de datos")
+    parser.add_argument('--exacto', action='store_true',
+                        help="Esperar a los conteos exactos y tamaños")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ Error: No existe {args.db}")
+        return 1
+
+    catalog = Catalog(args.db)
+    try:
+        start = time.perf_counter()
+        tables = catalog.tables()
+        print(f"⚡ Conteo aproximado: {time.perf_counter() - start:.3f}s")
+        print_catalog(tables)
+        if args.exacto:
+            catalog.wait()
+            print(f"\n🔢 Conteo exacto y tamaños: {time.perf_counter() - start:.3f}s")
+            print_catalog(catalog.tables())
+    except sqlite3.Error as e:
+        print(f"\n❌ Error de SQLite: {e}")
+        return 1
+    finally:
+        catalog.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,20 @@
 """
 Script para crear la base de datos SQLite desde schema.sql
-Genera el archivo task_gamification.db listo para usar
+Genera el archivo task_gamification.db listo para usar, clonando la plantilla
+de migrations.py. Para actualizar una base de datos existente sin perder
+datos: python migrations.py
 """
 
 import sqlite3
 import os
 import sys
 
+from catalog import approximate_counts
+from db_connection import connect
+from migrations import SCHEMA_VERSION, TEMPLATE_DB, clone_template, template_is_current
+
 def create_database():
-    """Crea la base de datos SQLite desde el archivo schema.sql"""
+    """Crea la base de datos SQLite desde la plantilla de schema.sql"""
     
     # Rutas
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -20,31 +26,25 @@ def create_database():
         print(f"❌ Error: No se encuentra {schema_file}")
         return False
     
-    # Eliminar BD existente si existe
+    # Eliminar BD existente si existe (clone_template también borra sus
+    # archivos WAL)
     if os.path.exists(db_file):
         print(f"⚠️  Eliminando base de datos existente...")
-        os.remove(db_file)
     
     try:
-        # Leer el schema
-        print(f"📖 Leyendo schema desde: {schema_file}")
-        with open(schema_file, 'r', encoding='utf-8') as f:
-            schema_sql = f.read()
-        
-        # Crear conexión a la base de datos
+        # Clonar la plantilla (se regenera desde schema.sql si está
+        # desactualizada) en vez de ejecutar todo el schema
+        if not template_is_current():
+            print(f"📖 Generando plantilla desde: {schema_file}")
         print(f"🔨 Creando base de datos: {db_file}")
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
+        print(f"📋 Clonando plantilla {os.path.basename(TEMPLATE_DB)} (esquema {SCHEMA_VERSION})...")
+        clone_template(db_file)
         
-        # Habilitar foreign keys
-        cursor.execute("PRAGMA foreign_keys = ON;")
-        
-        # Ejecutar el schema completo
-        print(f"⚙️  Ejecutando schema SQL...")
-        cursor.executescript(schema_sql)
-        
-        # Commit y cerrar
-        conn.commit()
+        # Conexión con el perfil por defecto de db_connection.py (foreign
+        # keys, sin WAL): el archivo sigue en modo DELETE como la plantilla,
+        # autocontenido para copiarlo a la app
+        conn = connect(db_file)
+        cursor = conn.cursor()
         
         # Verificar tablas creadas
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")
@@ -53,11 +53,13 @@ def create_database():
         print(f"\n✅ Base de datos creada exitosamente!")
         print(f"📍 Ubicación: {db_file}")
         print(f"📦 Tamaño: {os.path.getsize(db_file) / 1024:.2f} KB")
+        # Conteos desde el catálogo (sin COUNT(*) por tabla)
+        counts = approximate_counts(conn)
         print(f"\n📊 Tablas creadas ({len(tables)}):")
         for table in tables:
-            cursor.execute(f"SELECT COUNT(*) FROM {table[0]}")
-            count = cursor.fetchone()[0]
-            print(f"   • {table[0]}: {count} registros")
+            count, source = counts.get(table[0], (0, 'exacto'))
+            approx = "" if source == 'exacto' else "~"
+            print(f"   • {table[0]}: {approx}{count} registros")
         
         # Verificar badges
         cursor.execute("SELECT COUNT(*) FROM badges")
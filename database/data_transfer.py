@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Exportación e importación en streaming de los datos de usuario
+Mueve users, tasks, study_sessions, user_badges, daily_stats y activity_log
+entre dispositivos, copias de seguridad y trabajos de análisis con memoria
+constante:
+  - export_data() escribe un <tabla>.ndjson.gz por tabla en orden de id, por
+    bloques de CHUNK_ROWS filas, y un manifest.json (columnas, filas, marca
+    de tiempo). Todas las tablas se leen en una única transacción de
+    lectura, así que son coherentes entre sí aunque haya escrituras. Con
+    parallel=True (solo exportaciones completas) usa un proceso por tabla
+    sobre una foto de la base (copia temporal con la API de backup en el
+    directorio de destino). El formato 'columnar' escribe una
+    línea por bloque con una lista por columna (comprime mejor y se carga
+    más rápido que una línea por fila)
+  - con `since` solo exporta lo modificado desde esa fecha (updated_at,
+    unlocked_at, stat_date o created_at según la tabla); el manifest guarda
+    la hora de inicio para usarla como `since` de la siguiente exportación
+  - las referencias se exportan como uuid (usuario, tarea, sesión) o
+    badge_key en vez de ids locales; import_data() las resuelve contra la
+    base de datos de destino, así que los ids se reasignan sin conflictos
+  - la importación es una única transacción: inserta o actualiza por uuid
+    (gana la fila más reciente, ver NEWER), retira los triggers (los contadores
+    vienen en los datos) y, en tablas vacías, crea los índices y el índice
+    de texto completo al final; después reconstruye user_summary
+
+activity_log solo incluye las filas no archivadas (activity_archive.py).
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from db_connection import connect, copy_database
+from migrations import clone_template, get_version
+from search import INDEXES
+from seed_database import _drop_schema_objects
+from user_summary import fill_user_summary
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, 'task_gamification.db')
+
+TABLES = ('users', 'tasks', 'study_sessions', 'user_badges', 'daily_stats', 'activity_log')
+CHUNK_ROWS = 10000
+FORMATS = ('ndjson', 'columnar')
+MANIFEST = 'manifest.json'
+
+# Filtro incremental de cada tabla
+SINCE_FILTERS = {
+    'users': "t.updated_at >= ?",
+    'tasks': "t.updated_at >= ?",
+    'study_sessions': "t.updated_at >= ?",
+    'user_badges': "t.unlocked_at >= ?",
+    'daily_stats': "t.stat_date >= DATE(?)",
+    'activity_log': "t.created_at >= ?",
+}
+
+# Columnas añadidas en la exportación (referencias por uuid/clave) y joins
+REFERENCES = {
+    'users': ("", ""),
+    'tasks': (", u.uuid AS user_uuid", "JOIN users u ON u.id = t.user_id"),
+    'study_sessions': (", u.uuid AS user_uuid", "JOIN users u ON u.id = t.user_id"),
+    'user_badges': (", u.uuid AS user_uuid, b.badge_key",
+                    "JOIN users u ON u.id = t.user_id JOIN badges b ON b.id = t.badge_id"),
+    'daily_stats': (", u.uuid AS user_uuid", "JOIN users u ON u.id = t.user_id"),
+    'activity_log': ("""
+        , u.uuid AS user_uuid,
+        CASE t.entity_type
+            WHEN 'task' THEN (SELECT uuid FROM tasks WHERE id = t.entity_id)
+            WHEN 'session' THEN (SELECT uuid FROM study_sessions WHERE id = t.entity_id)
+            WHEN 'badge' THEN (SELECT badge_key FROM badges WHERE id = t.entity_id)
+        END AS entity_ref
+    """, "JOIN users u ON u.id = t.user_id"),
+}
+
+# Columnas que la importación recalcula en vez de copiar
+REMAPPED = {'id', 'user_id', 'badge_id', 'entity_id'}
+
+# Clave natural de cada tabla para insertar o actualizar (None: solo insertar)
+CONFLICT_KEYS = {
+    'users': 'uuid',
+    'tasks': 'uuid',
+    'study_sessions': 'uuid',
+    'user_badges': 'user_id, badge_id',
+    'daily_stats': 'user_id, stat_date',
+    'activity_log': None,
+}
+
+# Condición para que una fila importada sustituya a la existente: la más
+# reciente, o en tablas sin updated_at la más avanzada (sus contadores solo crecen)
+NEWER = {
+    'users': "excluded.updated_at >= users.updated_at",
+    'tasks': "excluded.updated_at >= tasks.updated_at",
+    'study_sessions': "excluded.updated_at >= study_sessions.updated_at",
+    'user_badges': "(excluded.is_unlocked, excluded.progress) "
+                   ">= (user_badges.is_unlocked, user_badges.progress)",
+    'daily_stats': "(excluded.tasks_completed, excluded.xp_earned, excluded.study_minutes) "
+                   ">= (daily_stats.tasks_completed, daily_stats.xp_earned, "
+                   "daily_stats.study_minutes)",
+}
+
+
+def table_path(directory, table):
+    return os.path.join(directory, f"{table}.ndjson.gz")
+
+
+def write_table(conn, table, directory, since=None, fmt='ndjson', chunk_rows=CHUNK_ROWS):
+    """
+    Exporta una tabla en orden de id leyendo bloques de chunk_rows filas con
+    la conexión dada (dentro de la transacción de lectura que tenga abierta).
+
+    Returns:
+        dict {'table', 'rows', 'columns', 'bytes'}
+    """
+    extra, joins = REFERENCES[table]
+    where = SINCE_FILTERS[table] if since else "1"
+    rows = 0
+    cursor = conn.execute(f"""
+        SELECT t.* {extra} FROM {table} t {joins}
+        WHERE {where}
+        ORDER BY t.id
+    """, (since,) if since else ())
+    columns = [d[0] for d in cursor.description]
+    with gzip.open(table_path(directory, table), 'wt', encoding='utf-8',
+                   compresslevel=6) as f:
+        while True:
+            chunk = cursor.fetchmany(chunk_rows)
+            if not chunk:
+                break
+            if fmt == 'columnar':
+                f.write(json.dumps(dict(zip(columns, map(list, zip(*chunk)))),
+                                   ensure_ascii=False) + "\n")
+            else:
+                f.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n"
+                             for row in chunk)
+            rows += len(chunk)
+    return {'table': table, 'rows': rows, 'columns': columns,
+            'bytes': os.path.getsize(table_path(directory, table))}
+
+
+def export_table(db_path, table, directory, since=None, fmt='ndjson', chunk_rows=CHUNK_ROWS):
+    """write_table() con su propia conexión de solo lectura (un proceso por tabla)"""
+    conn = connect(db_path, 'readonly', readonly=True)
+    try:
+        return write_table(conn, table, directory, since, fmt, chunk_rows)
+    finally:
+        conn.close()
+
+
+def export_data(db_path, directory, since=None, fmt='ndjson', tables=TABLES,
+                chunk_rows=CHUNK_ROWS, parallel=False, workers=None):
+    """
+    Exporta las tablas y escribe el manifest. Por defecto lee todas las
+    tablas en una transacción de lectura de un solo proceso. Con parallel
+    (se ignora si hay `since`: las incrementales son pequeñas) copia antes
+    la base al directorio de destino y exporta un proceso por tabla desde
+    esa foto.
+
+    Returns:
+        Manifest (dict)
+    """
+    os.makedirs(directory, exist_ok=True)
+    # Antes de abrir la lectura: la siguiente incremental no pierde cambios
+    started_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    if parallel and not since:
+        # La foto va en el directorio de destino, que ya tiene que tener sitio
+        with tempfile.TemporaryDirectory(dir=directory) as tmp:
+            # Sin WAL: los procesos la abren en modo solo lectura
+            source = copy_database(db_path, os.path.join(tmp, 'snapshot.db'), 'DELETE')
+            conn = connect(source, 'readonly', readonly=True)
+            version = get_version(conn)
+            conn.close()
+            with ProcessPoolExecutor(max_workers=workers or min(len(tables),
+                                                                os.cpu_count() or 1)) as pool:
+                futures = [pool.submit(export_table, source, table, directory, since, fmt,
+                                       chunk_rows)
+                           for table in tables]
+                results = [future.result() for future in futures]
+    else:
+        conn = connect(db_path, 'readonly', readonly=True)
+        try:
+            conn.execute("BEGIN")
+            version = get_version(conn)
+            results = [write_table(conn, table, directory, since, fmt, chunk_rows)
+                       for table in tables]
+            conn.rollback()
+        finally:
+            conn.close()
+    manifest = {
+        'format': fmt,
+        'schema_version': version,
+        'since': since,
+        'started_at': started_at,
+        'tables': {r['table']: {'rows': r['rows'], 'columns': r['columns'], 'bytes': r['bytes']}
+                   for r in results},
+    }
+    with open(os.path.join(directory, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def read_chunks(path, columns, fmt='ndjson', chunk_rows=CHUNK_ROWS):
+    """Genera listas de tuplas (en el orden de `columns`) desde un .ndjson.gz"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        if fmt == 'columnar':
+            for line in f:
+                data = json.loads(line)
+                yield list(zip(*(data[c] for c in columns)))
+            return
+        chunk = []
+        for line in f:
+            data = json.loads(line)
+            chunk.append(tuple(data.get(c) for c in columns))
+            if len(chunk) == chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _import_sql(conn, table, export_columns, dedupe=True):
+    """
+    INSERT ... SELECT desde temp.import_rows resolviendo las referencias.
+    dedupe=False omite la comprobación de eventos repetidos de activity_log
+    (tabla vacía al empezar, sin el índice que la haría barata).
+    """
+    target = [row[1] for row in conn.execute(f"PRAGMA main.table_info({table})")]
+    copied = [c for c in target if c in export_columns and c not in REMAPPED]
+    names = copied[:]
+    values = [f"s.{c}" for c in copied]
+    joins = ""
+    if table != 'users':
+        names.append('user_id')
+        values.append('u.id')
+        joins = "JOIN users u ON u.uuid = s.user_uuid"
+    if table == 'user_badges':
+        names.append('badge_id')
+        values.append('b.id')
+        joins += " JOIN badges b ON b.badge_key = s.badge_key"
+    if table == 'activity_log':
+        names.append('entity_id')
+        # Solo se resuelve si el evento tenía entidad (LEVEL_UP y
+        # STREAK_MILESTONE son de tipo 'user' con entity_id NULL)
+        values.append("""
+            CASE WHEN s.entity_id IS NOT NULL THEN
+                CASE s.entity_type
+                    WHEN 'task' THEN (SELECT id FROM tasks WHERE uuid = s.entity_ref)
+                    WHEN 'session' THEN (SELECT id FROM study_sessions WHERE uuid = s.entity_ref)
+                    WHEN 'badge' THEN (SELECT id FROM badges WHERE badge_key = s.entity_ref)
+                    WHEN 'user' THEN u.id
+                END
+            END
+        """)
+
+    sql = f"""
+        INSERT INTO main.{table} ({", ".join(names)})
+        SELECT {", ".join(values)} FROM temp.import_rows s {joins}
+        WHERE true
+    """
+    key = CONFLICT_KEYS[table]
+    if key is None and not dedupe:
+        return sql
+    if key is None:
+        # Sin clave natural: se omiten los eventos que ya existen
+        return sql + """
+          AND NOT EXISTS (
+              SELECT 1 FROM activity_log a
+              WHERE a.user_id = u.id AND a.created_at = s.created_at
+                AND a.activity_type = s.activity_type AND a.description = s.description
+          )
+        """
+    key_columns = {c.strip() for c in key.split(',')}
+    updates = ", ".join(f"{c} = excluded.{c}" for c in names if c not in key_columns)
+    return sql + f"ON CONFLICT({key}) DO UPDATE SET {updates} WHERE {NEWER[table]}"
+
+
+def import_data(db_path, directory, chunk_rows=CHUNK_ROWS, verbose=False):
+    """
+    Importa una exportación en una única transacción (se crea la base de
+    datos desde la plantilla si no existe).
+
+    Returns:
+        dict {tabla: (filas leídas, filas insertadas o actualizadas)}
+    """
+    with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if not os.path.exists(db_path):
+        clone_template(db_path)
+
+    tables = [t for t in TABLES if t in manifest['tables']]
+    conn = connect(db_path, 'tuned', isolation_level=None, cache_size=-262144,
+                   synchronous='OFF')
+    start = time.perf_counter()
+    result = {}
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        empty = {t for t in tables
+                 if conn.execute(f"SELECT 1 FROM {t} LIMIT 1").fetchone() is None}
+        fts_tables = {fts: content for fts, content, _, _ in INDEXES.values()
+                      if conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?",
+                                      (fts,)).fetchone()}
+        # En tablas con datos el índice de texto completo se mantiene fila a
+        # fila; en las vacías se reconstruye al final
+        kept = [sql for fts, content in fts_tables.items() if content not in empty
+                for (sql,) in conn.execute("""
+                    SELECT sql FROM sqlite_master
+                    WHERE type = 'trigger' AND tbl_name = ? AND name LIKE ? ESCAPE '\\'
+                """, (content, fts.replace('_', '\\_') + '\\_%'))]
+        # DROP/CREATE es transaccional: ninguna otra conexión ve el schema sin ellos
+        index_sql = _drop_schema_objects(conn, 'index', sorted(empty))
+        trigger_sql = _drop_schema_objects(conn, 'trigger', tables)
+        for sql in kept:
+            conn.execute(sql)
+
+        for table in tables:
+            columns = manifest['tables'][table]['columns']
+            conn.execute("DROP TABLE IF EXISTS temp.import_rows")
+            conn.execute(f"CREATE TEMP TABLE import_rows ({', '.join(columns)})")
+            insert = _import_sql(conn, table, columns, dedupe=table not in empty)
+            placeholders = ", ".join("?" for _ in columns)
+            read = changed = 0
+            for chunk in read_chunks(table_path(directory, table), columns,
+                                     manifest['format'], chunk_rows):
+                conn.executemany(f"INSERT INTO temp.import_rows VALUES ({placeholders})", chunk)
+                changed += conn.execute(insert).rowcount
+                conn.execute("DELETE FROM temp.import_rows")
+                read += len(chunk)
+            result[table] = (read, changed)
+            if verbose:
+                print(f"   • {table}: {read:,} filas ({time.perf_counter() - start:.1f}s)")
+
+        if verbose:
+            print("🔨 Reconstruyendo índices y triggers...")
+        for sql in index_sql + [sql for sql in trigger_sql if sql not in kept]:
+            conn.execute(sql)
+        for fts, content in fts_tables.items():
+            if content in empty:
+                conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+        if conn.execute("""
+            SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_summary'
+        """).fetchone():
+            fill_user_summary(conn)
+        conn.execute("COMMIT")
+        # Estadísticas del planificador para las tablas cargadas desde cero
+        for table in sorted(empty):
+            conn.execute(f"ANALYZE {table}")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.execute("DROP TABLE IF EXISTS temp.import_rows")
+        conn.close()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exportación/importación de datos de usuario")
+    parser.add_argument('accion', choices=('exportar', 'importar'))
+    parser.add_argument('directorio', help="Directorio de la exportación")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Ruta de la base de datos")
+    parser.add_argument('--desde', help="Solo cambios desde 'YYYY-MM-DD HH:MM:SS' (UTC)")
+    parser.add_argument('--formato', choices=FORMATS, default='ndjson',
+                        help="ndjson (una fila por línea) o columnar (un bloque por línea)")
+    parser.add_argument('--lote', type=int, default=CHUNK_ROWS, help="Filas por bloque")
+    parser.add_argument('--paralelo', action='store_true',
+                        help="Exportación completa con un proceso por tabla sobre una "
+                             "copia de la base en el directorio de destino")
+    args = parser.parse_args(argv)
+
+    try:
+        start = time.perf_counter()
+        if args.accion == 'exportar':
+            if not os.path.exists(args.db):
+                print(f"❌ Error: No existe {args.db}")
+                return 1
+            manifest = export_data(args.db, args.directorio, args.desde, args.formato,
+                                   chunk_rows=args.lote, parallel=args.paralelo)
+            print(f"📦 Exportado a {args.directorio} ({time.perf_counter() - start:.1f}s)")
+            for table, info in manifest['tables'].items():
+                print(f"   • {table:15} {info['rows']:>10,} filas {info['bytes'] / 1e6:>8.1f} MB")
+            print(f"💡 Siguiente exportación incremental: --desde '{manifest['started_at']}'")
+        else:
+            if not os.path.exists(os.path.join(args.directorio, MANIFEST)):
+                print(f"❌ Error: No existe {os.path.join(args.directorio, MANIFEST)}")
+                return 1
+            print(f"📥 Importando {args.directorio} en {args.db}")
+            result = import_data(args.db, args.directorio, args.lote, verbose=True)
+            changed = sum(c for _, c in result.values())
+            print(f"✅ {changed:,} filas insertadas o actualizadas "
+                  f"({time.perf_counter() - start:.1f}s)")
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"\n❌ Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
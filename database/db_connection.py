@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Acceso compartido a task_gamification.db
+Todos los scripts abren sus conexiones con connect() o con un
+ConnectionManager, que aplican un perfil de PRAGMAs:
+  - default: valores por defecto de SQLite (synchronous FULL, caché de 2 MB);
+    no cambia el journal_mode del archivo (DELETE si es nuevo). Es el perfil
+    por defecto
+  - tuned: WAL, synchronous NORMAL, caché de 64 MB, mmap de 256 MB y
+    temporales en memoria. WAL es persistente: lo piden explícitamente el
+    servidor (read_service.py, sync_worker.py) y las herramientas por lotes
+  - readonly: como tuned, para conexiones de solo lectura
+
+ConnectionManager mantiene un pool de conexiones de lectura y una única
+conexión de escritura protegida por un lock, y puede usarse desde varios
+hilos. Cada conexión reutiliza sus sentencias preparadas (caché de
+sqlite3 con STATEMENT_CACHE entradas).
+
+triggers_bypassed() desactiva, dentro de una transacción, los triggers que
+bulk_tasks.py e integrity.py sustituyen por escrituras por conjuntos.
+
+Ejecutado como script compara los perfiles default y tuned completando
+tareas una a una (cadena completa de triggers).
+"""
+
+import argparse
+import os
+import queue
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, 'task_gamification.db')
+
+STATEMENT_CACHE = 256
+
+PROFILES = {
+    'default': {
+        'synchronous': 'FULL',
+        'cache_size': -2000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+    },
+    'tuned': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    },
+    'readonly': {
+        'cache_size': -65536,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    },
+}
+DEFAULT_PROFILE = 'default'
+
+# Espera máxima (ms) cuando otra conexión tiene el lock de escritura
+BUSY_TIMEOUT_MS = 5000
+
+# Fila de app_settings que desactiva los triggers de GATED_TRIGGERS (ver
+# triggers_bypassed())
+TRIGGER_BYPASS_KEY = 'bypass_triggers'
+GATED_TRIGGERS = ('task_completed_stats', 'check_level_up',
+                  'update_users_timestamp', 'update_tasks_timestamp', 'summary_task_update')
+
+
+def pragma_statements(profile=DEFAULT_PROFILE, **overrides):
+    """Sentencias PRAGMA de un perfil, con valores sobrescritos opcionales"""
+    settings = dict(PROFILES[profile], **overrides)
+    return tuple(f"PRAGMA {name} = {value}" for name, value in settings.items())
+
+
+def connect(db_path=DEFAULT_DB, profile=DEFAULT_PROFILE, readonly=False,
+            check_same_thread=True, isolation_level='', **overrides):
+    """
+    Abre una conexión con el perfil indicado, foreign_keys activado y caché
+    de sentencias preparadas.
+
+    Args:
+        readonly: abrir en modo solo lectura (mode=ro)
+        check_same_thread: False para conexiones que cambian de hilo (pool)
+        isolation_level: None para controlar las transacciones a mano
+        overrides: PRAGMAs que sustituyen a los del perfil (ej. synchronous='OFF')
+    """
+    if readonly:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True,
+                               cached_statements=STATEMENT_CACHE,
+                               check_same_thread=check_same_thread,
+                               isolation_level=isolation_level)
+    else:
+        conn = sqlite3.connect(db_path, cached_statements=STATEMENT_CACHE,
+                               check_same_thread=check_same_thread,
+                               isolation_level=isolation_level)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA foreign_keys = ON")
+    for statement in pragma_statements(profile, **overrides):
+        conn.execute(statement)
+    return conn
+
+
+def copy_database(source_path, target_path, journal_mode=None):
+    """
+    Copia source_path en target_path con la API de backup en un solo paso:
+    una única transacción de lectura (foto coherente aunque haya escrituras)
+    que incluye las páginas que siguen en el -wal, a diferencia de copiar el
+    archivo. La copia hereda el journal_mode del origen salvo que se indique
+    otro.
+
+    Returns:
+        target_path
+    """
+    source = connect(source_path, 'readonly', readonly=True)
+    try:
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target)
+            if journal_mode:
+                target.execute(f"PRAGMA journal_mode = {journal_mode}")
+        finally:
+            target.close()
+    finally:
+        source.close()
+    return target_path
+
+
+@contextmanager
+def triggers_bypassed(conn):
+    """
+    Desactiva mientras dura el bloque los triggers de GATED_TRIGGERS (WHEN
+    sobre TRIGGER_BYPASS_KEY), para escrituras que aplican su efecto por
+    conjuntos. Debe usarse dentro de una transacción: la fila de app_settings
+    se escribe y se borra en ella, así que otras conexiones nunca la ven y un
+    ROLLBACK no la deja puesta. Sin transacción abierta (ej. isolation_level
+    None sin BEGIN) la fila se confirmaría al instante y desactivaría los
+    triggers para todos, así que se rechaza.
+    """
+    if not conn.in_transaction:
+        raise sqlite3.ProgrammingError("triggers_bypassed() requiere una transacción abierta")
+    gated = conn.execute(f"""
+        SELECT COUNT(*) FROM sqlite_master
+        WHERE type = 'trigger' AND instr(sql, ?) > 0
+          AND name IN ({", ".join("?" for _ in GATED_TRIGGERS)})
+    """, (TRIGGER_BYPASS_KEY,) + GATED_TRIGGERS).fetchone()[0]
+    if gated != len(GATED_TRIGGERS):
+        raise sqlite3.OperationalError(
+            "Los triggers no admiten desactivación (versión de esquema < 1.4); "
+            "ejecuta migrations.py")
+    conn.execute("""
+        INSERT INTO app_settings (setting_key, setting_value, setting_type, description)
+        VALUES (?, 'true', 'BOOLEAN', 'Triggers desactivados en esta transacción')
+    """, (TRIGGER_BYPASS_KEY,))
+    try:
+        yield conn
+    finally:
+        conn.execute("DELETE FROM app_settings WHERE setting_key = ?", (TRIGGER_BYPASS_KEY,))
+
+
+class ConnectionManager:
+    """
+    Pool de lectores y un escritor único sobre una base de datos.
+
+    Uso:
+        manager = ConnectionManager(db_path)
+        with manager.reader() as conn:
+            conn.execute("SELECT ...")
+        with manager.writer() as conn:      # commit al salir, rollback si falla
+            conn.execute("UPDATE ...")
+        manager.close()
+    """
+
+    def __init__(self, db_path=DEFAULT_DB, profile=DEFAULT_PROFILE, readers=4):
+        self.db_path = db_path
+        self.profile = profile
+        self.max_readers = readers
+        self._readers = queue.LifoQueue()
+        self._opened_readers = 0
+        self._all_readers = []
+        self._pool_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._writer = None
+
+    def _open_reader(self):
+        # Con WAL los lectores no bloquean al escritor ni al revés
+        return connect(self.db_path, 'readonly', readonly=True, check_same_thread=False)
+
+    @contextmanager
+    def reader(self):
+        """Presta una conexión de lectura del pool (bloquea si están todas en uso)"""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._pool_lock:
+                if self._opened_readers < self.max_readers:
+                    self._opened_readers += 1
+                    conn = self._open_reader()
+                    self._all_readers.append(conn)
+            if conn is None:
+                conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    @contextmanager
+    def writer(self):
+        """
+        Conexión de escritura exclusiva. Hace commit al salir del bloque o
+        rollback si se produce una excepción.
+        """
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = connect(self.db_path, self.profile, check_same_thread=False)
+            try:
+                yield self._writer
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+
+    def close(self):
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._pool_lock:
+            for conn in self._all_readers:
+                conn.close()
+            self._all_readers.clear()
+            self._opened_readers = 0
+            self._readers = queue.LifoQueue()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _complete_one_by_one(conn, task_ids):
+    samples = []
+    for task_id in task_ids:
+        start = time.perf_counter()
+        conn.execute("""
+            UPDATE tasks
+            SET status = 'COMPLETED',
+                completed_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (task_id,))
+        conn.commit()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def benchmark(db_path, count=500, profiles=('default', 'tuned'), seed=42):
+    """
+    Completa las mismas `count` tareas, con commit por tarea, sobre una copia
+    de la base de datos por perfil.
+
+    Returns:
+        Lista de dicts {'profile', 'tasks', 'seconds', 'ops_per_sec', 'p50_ms', 'p95_ms'}
+    """
+    conn = connect(db_path, 'readonly', readonly=True)
+    try:
+        pending = [row[0] for row in conn.execute(
+            "SELECT id FROM tasks WHERE status != 'COMPLETED' ORDER BY id")]
+    finally:
+        conn.close()
+    task_ids = random.Random(seed).sample(pending, min(count, len(pending)))
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in profiles:
+            copy = os.path.join(tmp, f"{profile}.db")
+            # Los perfiles sin journal_mode se miden con el de SQLite (DELETE)
+            copy_database(db_path, copy, PROFILES[profile].get('journal_mode', 'DELETE'))
+            conn = connect(copy, profile)
+            try:
+                samples = sorted(_complete_one_by_one(conn, task_ids))
+            finally:
+                conn.close()
+            total = sum(samples)
+            results.append({
+                'profile': profile,
+                'tasks': len(samples),
+                'seconds': round(total, 3),
+                'ops_per_sec': round(len(samples) / total, 1) if total else 0.0,
+                'p50_ms': round(samples[len(samples) // 2] * 1000, 3) if samples else 0.0,
+                'p95_ms': round(samples[int(len(samples) * 0.95) - 1] * 1000, 3)
+                          if samples else 0.0,
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compara perfiles de PRAGMAs en la cadena de triggers")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Base de datos de origen (se copia)")
+    parser.add_argument('--tareas', type=int, default=500, help="Tareas a completar")
+    parser.add_argument('--perfiles', default='default,tuned',
+                        help="Perfiles separados por comas")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ Error: No existe {args.db}")
+        return 1
+    profiles = args.perfiles.split(',')
+    unknown = [p for p in profiles if p not in PROFILES]
+    if unknown:
+        print(f"❌ Perfil desconocido: {', '.join(unknown)}")
+        return 1
+
+    print("=" * 80)
+    print("🏁 BENCHMARK DE PERFILES DE CONEXIÓN")
+    print("=" * 80)
+    print(f"   {'Perfil':12} {'tareas':>8} {'ops/s':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    for r in benchmark(args.db, args.tareas, profiles):
+        print(f"   {r['profile']:12} {r['tasks']:>8} {r['ops_per_sec']:>10.1f} "
+              f"{r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,57 +1,258 @@
 """
 Explorador interactivo de la base de datos SQLite
 Permite ejecutar queries y ver resultados
+
+Los SELECT se leen con fetchmany en páginas de PAGE_SIZE filas y cada página
+se muestra en cuanto llega, de modo que la memoria usada no depende del
+tamaño del resultado. Las tablas se pueden recorrer con paginación por clave
+(keyset) y cualquier query se puede exportar a CSV/NDJSON en streaming.
 """
 
+import csv
+import json
 import sqlite3
 import os
 from tabulate import tabulate
 
+from catalog import Catalog, print_catalog
+from query_profiler import profile
+from search import search
+from db_connection import DEFAULT_DB, connect
+
+# Filas por página al mostrar resultados
+PAGE_SIZE = 50
+# Filas por lectura al exportar
+EXPORT_BATCH = 1000
+
 def connect_db():
     """Conecta a la base de datos"""
-    db_file = os.path.join(os.path.dirname(__file__), 'task_gamification.db')
-    if not os.path.exists(db_file):
+    if not os.path.exists(DEFAULT_DB):
         print("❌ Error: No existe task_gamification.db")
         return None
-    return sqlite3.connect(db_file)
+    return connect(DEFAULT_DB)
 
-def execute_query(conn, query):
-    """Ejecuta una query y muestra resultados"""
+def print_page(rows, headers, first_row=1):
+    """Muestra una página de resultados"""
+    print("\n" + tabulate(rows, headers=headers, tablefmt="grid"))
+    print(f"📄 Filas {first_row}-{first_row + len(rows) - 1}")
+
+def execute_query(conn, query, page_size=PAGE_SIZE, interactive=True):
+    """
+    Ejecuta una query y muestra resultados página a página.
+    En modo interactivo pregunta antes de leer la siguiente página; solo se
+    mantiene en memoria la página actual. Devuelve filas cualquier sentencia
+    con columnas de resultado (cursor.description), no se deduce del texto.
+    """
     try:
         cursor = conn.cursor()
+        changes = conn.total_changes
         cursor.execute(query)
         
-        if query.strip().upper().startswith("SELECT"):
-            results = cursor.fetchall()
-            if results:
-                headers = [description[0] for description in cursor.description]
-                print("\n" + tabulate(results, headers=headers, tablefmt="grid"))
-                print(f"\n📊 Total: {len(results)} registros")
+        if cursor.description is not None:
+            headers = [description[0] for description in cursor.description]
+            total = 0
+            while True:
+                rows = cursor.fetchmany(page_size)
+                if not rows:
+                    break
+                print_page(rows, headers, total + 1)
+                total += len(rows)
+                if len(rows) < page_size:
+                    break
+                if interactive:
+                    choice = input("\n⏎ Siguiente página, 'q' para terminar: ").strip().lower()
+                    if choice == 'q':
+                        break
+            cursor.close()
+            if total:
+                print(f"\n📊 Total mostrado: {total} registros")
             else:
                 print("\n⚠️  No se encontraron resultados")
         else:
             conn.commit()
-            print(f"\n✅ Query ejecutado. Filas afectadas: {cursor.rowcount}")
+            # rowcount es -1 si la sentencia no empieza por INSERT/UPDATE/DELETE
+            # (ej. WITH ... DELETE); changes() es el de la última sentencia
+            affected = cursor.rowcount
+            if affected < 0:
+                affected = (conn.execute("SELECT changes()").fetchone()[0]
+                            if conn.total_changes != changes else 0)
+            print(f"\n✅ Query ejecutado. Filas afectadas: {affected}")
         
         return True
     except sqlite3.Error as e:
         print(f"\n❌ Error: {e}")
         return False
 
-def show_tables(conn):
-    """Muestra todas las tablas"""
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name;")
-    tables = cursor.fetchall()
+def export_query(conn, query, path, fmt=None, batch_size=EXPORT_BATCH):
+    """
+    Exporta el resultado de una query a CSV o NDJSON leyendo por lotes,
+    sin construir el resultado completo en memoria.
+    
+    Args:
+        fmt: 'csv' o 'ndjson'; por defecto según la extensión de `path`
+    
+    Returns:
+        Número de filas exportadas
+    """
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    cursor = conn.execute(query)
+    if cursor.description is None:
+        # No devuelve filas: se deshace lo que haya escrito y no se crea el archivo
+        conn.rollback()
+        raise ValueError("La query no devuelve filas; solo se exportan consultas")
+    headers = [description[0] for description in cursor.description]
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(headers)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if fmt == 'csv':
+                writer.writerows(rows)
+            else:
+                f.writelines(json.dumps(dict(zip(headers, row)), ensure_ascii=False) + "\n"
+                             for row in rows)
+            count += len(rows)
+    return count
+
+def keyset_columns(conn, table_name, key=None):
+    """
+    Columnas de la clave de paginación: `key` (si se indica) seguida de un
+    desempate único (rowid, o la PRIMARY KEY en tablas WITHOUT ROWID).
+
+    Returns:
+        (columnas, True si `key` admite NULL)
+    """
+    columns = conn.execute(f"PRAGMA table_info({table_name})").fetchall()
+    if not columns:
+        raise ValueError(f"No existe la tabla {table_name}")
+    by_name = {col[1]: col for col in columns}
+    if key and key not in by_name:
+        raise ValueError(f"La tabla {table_name} no tiene la columna {key}")
+    without_rowid = conn.execute("SELECT sql FROM sqlite_master WHERE name = ?",
+                                 (table_name,)).fetchone()[0].upper().rstrip().rstrip(';')
+    if without_rowid.endswith("WITHOUT ROWID"):
+        unique = [col[1] for col in sorted(columns, key=lambda col: col[5]) if col[5]]
+    else:
+        unique = ["rowid"]
+    nullable = bool(key) and not by_name[key][3] and not by_name[key][5]
+    return ([key] if key else []) + [col for col in unique if col != key], nullable
+
+def _keyset_segment(conn, table_name, keys, condition, compared, bound, descending, limit):
+    """Filas que cumplen `condition` tras (o antes de) `bound` en las columnas `compared`"""
+    conditions = [condition] if condition else []
+    params = ()
+    if bound is not None:
+        conditions.append(f"({', '.join(compared)}) {'<' if descending else '>'} "
+                          f"({', '.join('?' * len(compared))})")
+        params = tuple(bound)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order = "DESC" if descending else "ASC"
+    cursor = conn.execute(f"""
+        SELECT {', '.join(keys)}, * FROM {table_name}
+        {where}
+        ORDER BY {', '.join(f"{column} {order}" for column in keys)}
+        LIMIT ?
+    """, params + (limit,))
+    return cursor.fetchall(), cursor.description
+
+def fetch_keyset_page(conn, table_name, keys, after=None, before=None, page_size=PAGE_SIZE,
+                      nullable=False):
+    """
+    Lee una página ordenada por `keys` posterior a `after` o anterior a
+    `before` (tuplas de valores de la clave) usando comparación de row values,
+    que SQLite resuelve con el índice de la clave sin recorrer las filas previas.
+
+    Con nullable=True la primera columna admite NULL, y un row value con NULL
+    nunca es mayor ni menor que otro: las filas con NULL (que van primero,
+    como en el índice) se paginan aparte por el desempate.
+    
+    Returns:
+        (filas con los valores de la clave delante, cabeceras)
+    """
+    descending = before is not None
+    bound = before if descending else after
+    if not nullable:
+        segments = [("", keys, bound)]
+    else:
+        nulls = (f"{keys[0]} IS NULL", keys[1:])
+        values = (f"{keys[0]} IS NOT NULL", keys)
+        if bound is None:
+            segments = [nulls + (None,), values + (None,)]
+        elif bound[0] is None:
+            segments = [nulls + (tuple(bound[1:]),)] + ([] if descending else [values + (None,)])
+        else:
+            segments = [values + (bound,)] + ([nulls + (None,)] if descending else [])
+
+    rows = []
+    for condition, compared, segment_bound in segments:
+        part, description = _keyset_segment(conn, table_name, keys, condition, compared,
+                                            segment_bound, descending, page_size - len(rows))
+        rows.extend(part)
+        if len(rows) >= page_size:
+            break
+    if descending:
+        rows.reverse()
+    headers = [column[0] for column in description][len(keys):]
+    return rows, headers
+
+def browse_table(conn, table_name, key=None, page_size=PAGE_SIZE):
+    """Recorre una tabla página a página (n = siguiente, p = anterior, q = salir)"""
+    try:
+        keys, nullable = keyset_columns(conn, table_name, key)
+    except ValueError as e:
+        print(f"\n❌ Error: {e}")
+        return False
+    
+    width = len(keys)
+    rows, headers = fetch_keyset_page(conn, table_name, keys, page_size=page_size,
+                                      nullable=nullable)
+    page = 1
+    while True:
+        if not rows:
+            print("\n⚠️  No hay más filas")
+        else:
+            print("\n" + tabulate([row[width:] for row in rows], headers=headers, tablefmt="grid"))
+            print(f"📄 Página {page} (orden: {', '.join(keys)})")
+        
+        choice = input("\n👉 [n] siguiente  [p] anterior  [q] salir: ").strip().lower()
+        if choice == 'q':
+            return True
+        if choice == 'p' and rows and page > 1:
+            previous, _ = fetch_keyset_page(conn, table_name, keys,
+                                            before=rows[0][:width], page_size=page_size,
+                                            nullable=nullable)
+            if previous:
+                rows, page = previous, page - 1
+        elif choice in ('n', '') and rows:
+            following, _ = fetch_keyset_page(conn, table_name, keys,
+                                             after=rows[-1][:width], page_size=page_size,
+                                             nullable=nullable)
+            if following:
+                rows, page = following, page + 1
+            else:
+                print("\nℹ️  Última página")
+
+def show_tables(catalog):
+    """
+    Muestra todas las tablas con su conteo de filas (aproximado, marcado con
+    ~, hasta que el catálogo termina el conteo exacto en segundo plano)
+    """
+    tables = catalog.tables()
     
     print("\n" + "="*80)
     print("📊 TABLAS EN LA BASE DE DATOS")
     print("="*80)
     
-    for i, table in enumerate(tables, 1):
-        cursor.execute(f"SELECT COUNT(*) FROM {table[0]}")
-        count = cursor.fetchone()[0]
-        print(f"{i:2}. {table[0]:20} ({count} registros)")
+    print_catalog(tables)
+    
+    if any(not t['exact'] for t in tables):
+        table_name = input("\n🔢 Tabla para contar exacto (vacío para volver): ").strip()
+        if table_name in {t['name'] for t in tables}:
+            print(f"   {table_name}: {catalog.exact_count(table_name):,} registros")
 
 def show_schema(conn, table_name):
     """Muestra el schema de una tabla"""
@@ -68,20 +269,22 @@ def show_schema(conn, table_name):
     
     print(tabulate(data, headers=headers, tablefmt="grid"))
 
+QUICK_QUERIES = {
+    "1": ("Ver todos los usuarios", "SELECT id, name, email, current_xp, level, current_streak, tasks_completed FROM users;"),
+    "2": ("Ver tareas pendientes", "SELECT id, title, category, priority, due_date, xp_reward FROM tasks WHERE status = 'PENDING';"),
+    "3": ("Ver tareas completadas", "SELECT id, title, category, completed_at, xp_reward FROM tasks WHERE status = 'COMPLETED';"),
+    "4": ("Ver todos los badges", "SELECT badge_key, name, description, requirement_value, xp_bonus FROM badges;"),
+    "5": ("Ver progreso de badges del usuario", "SELECT b.name, ub.progress, b.requirement_value, ub.is_unlocked FROM user_badges ub JOIN badges b ON ub.badge_id = b.id WHERE ub.user_id = 1;"),
+    "6": ("Ver sesiones de estudio", "SELECT id, subject, scheduled_date, duration_minutes, status FROM study_sessions;"),
+    "7": ("Ver estadísticas diarias", "SELECT stat_date, tasks_completed, xp_earned, study_minutes FROM daily_stats ORDER BY stat_date DESC;"),
+    "8": ("Ver actividad reciente", "SELECT activity_type, description, xp_change, created_at FROM activity_log ORDER BY created_at DESC LIMIT 10;"),
+    "9": ("Ver resumen del usuario", "SELECT * FROM v_user_summary;"),
+    "10": ("Ver tareas enriquecidas", "SELECT title, category, status, due_date, is_overdue, days_until_due FROM v_tasks_enriched;"),
+}
+
 def quick_queries(conn):
     """Ejecuta queries predefinidas útiles"""
-    queries = {
-        "1": ("Ver todos los usuarios", "SELECT id, name, email, current_xp, level, current_streak, tasks_completed FROM users;"),
-        "2": ("Ver tareas pendientes", "SELECT id, title, category, priority, due_date, xp_reward FROM tasks WHERE status = 'PENDING';"),
-        "3": ("Ver tareas completadas", "SELECT id, title, category, completed_at, xp_reward FROM tasks WHERE status = 'COMPLETED';"),
-        "4": ("Ver todos los badges", "SELECT badge_key, name, description, requirement_value, xp_bonus FROM badges;"),
-        "5": ("Ver progreso de badges del usuario", "SELECT b.name, ub.progress, b.requirement_value, ub.is_unlocked FROM user_badges ub JOIN badges b ON ub.badge_id = b.id WHERE ub.user_id = 1;"),
-        "6": ("Ver sesiones de estudio", "SELECT id, subject, scheduled_date, duration_minutes, status FROM study_sessions;"),
-        "7": ("Ver estadísticas diarias", "SELECT stat_date, tasks_completed, xp_earned, study_minutes FROM daily_stats ORDER BY stat_date DESC;"),
-        "8": ("Ver actividad reciente", "SELECT activity_type, description, xp_change, created_at FROM activity_log ORDER BY created_at DESC LIMIT 10;"),
-        "9": ("Ver resumen del usuario", "SELECT * FROM v_user_summary;"),
-        "10": ("Ver tareas enriquecidas", "SELECT title, category, status, due_date, is_overdue, days_until_due FROM v_tasks_enriched;"),
-    }
+    queries = QUICK_QUERIES
     
     print("\n" + "="*80)
     print("🔍 QUERIES RÁPIDAS")
@@ -102,11 +305,45 @@ def quick_queries(conn):
     elif choice != "0":
         print("\n⚠️  Opción inválida")
 
+def profile_query(conn):
+    """Perfila una query escrita o una de las queries rápidas"""
+    print("\n💡 Escribe una query SQL o el número de una query rápida (1-10):")
+    text = input("SQL> ").strip()
+    query = QUICK_QUERIES[text][1] if text in QUICK_QUERIES else text
+    if not query:
+        return
+    print(f"SQL: {query}")
+    try:
+        profile(conn, query.rstrip().rstrip(';'), DEFAULT_DB)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"\n❌ Error: {e}")
+
+def search_text(conn):
+    """Busca texto en tareas o sesiones (FTS5, por relevancia)"""
+    text = input("\n🔎 Texto a buscar: ").strip()
+    if not text:
+        return
+    sessions = input("📚 ¿Buscar en sesiones de estudio? (s/N): ").strip().lower() == 's'
+    user = input("👤 user_id (vacío = todos): ").strip()
+    status = input("📌 Estado (vacío = todos): ").strip().upper() or None
+    try:
+        rows = search(conn, text, 'sessions' if sessions else 'tasks',
+                      int(user) if user else None, status, PAGE_SIZE)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"\n❌ Error: {e}")
+        return
+    print(f"\n📊 {len(rows)} resultado(s)")
+    if rows:
+        print_page(rows, ['id', 'user_id', 'título', 'status', 'fragmento', 'rank'])
+
 def main():
     """Función principal"""
     conn = connect_db()
     if not conn:
         return
+    # Estadísticas de tablas cacheadas; el conteo exacto empieza en segundo plano
+    catalog = Catalog(DEFAULT_DB)
+    catalog.tables()
     
     print("\n" + "="*80)
     print("🗄️  EXPLORADOR DE BASE DE DATOS SQLite")
@@ -122,11 +359,15 @@ def main():
         print("3. Ejecutar query SQL personalizado")
         print("4. Queries rápidas predefinidas")
         print("5. Salir")
+        print("6. Navegar una tabla por páginas")
+        print("7. Exportar query a CSV/NDJSON")
+        print("8. Perfilar una query (plan, tiempos e índices sugeridos)")
+        print("9. Buscar texto en tareas y sesiones")
         
         choice = input("\n👉 Selecciona una opción: ").strip()
         
         if choice == "1":
-            show_tables(conn)
+            show_tables(catalog)
         
         elif choice == "2":
             table_name = input("\n📋 Nombre de la tabla: ").strip()
@@ -145,9 +386,32 @@ def main():
             print("\n👋 ¡Hasta luego!")
             break
         
+        elif choice == "6":
+            table_name = input("\n📋 Nombre de la tabla: ").strip()
+            key = input("🔑 Columna de orden (vacío = rowid/PK): ").strip() or None
+            browse_table(conn, table_name, key)
+        
+        elif choice == "7":
+            print("\n💡 Escribe tu query SELECT:")
+            query = input("SQL> ").strip()
+            path = input("💾 Archivo de salida (.csv o .ndjson): ").strip()
+            if query and path:
+                try:
+                    count = export_query(conn, query, path)
+                    print(f"\n✅ {count} filas exportadas a {os.path.abspath(path)}")
+                except (sqlite3.Error, OSError, ValueError) as e:
+                    print(f"\n❌ Error: {e}")
+        
+        elif choice == "8":
+            profile_query(conn)
+        
+        elif choice == "9":
+            search_text(conn)
+        
         else:
             print("\n⚠️  Opción inválida")
     
+    catalog.close()
     conn.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Verificación y reparación de los contadores desnormalizados
+Los triggers mantienen de forma incremental users.tasks_completed,
+current_xp, total_xp_earned y level y daily_stats.tasks_completed/xp_earned.
+Una edición directa (ej. la opción 3 del explorador) los desincroniza, y
+check_level_up nunca baja el nivel. Este script los recalcula desde
+activity_log (más activity_daily para lo ya archivado), que es el registro
+de lo que los triggers sumaron:
+  - tasks_completed: eventos TASK_COMPLETED
+  - total_xp_earned y current_xp: SUM(xp_change) de todos los eventos
+    (tareas, bonus de badges); nada descuenta XP
+  - level: current_xp / 100 + 1
+  - daily_stats: TASK_COMPLETED por usuario y DATE(created_at)
+
+Además cruza las tareas COMPLETED (número y SUM(xp_reward) por usuario y
+DATE(completed_at)) con los TASK_COMPLETED del registro. Una tarea que se
+vuelve a completar, se borra o cambia de xp_reward o completed_at después de
+completarse deja el registro y los contadores de acuerdo entre sí pero no
+con tasks; esas diferencias se informan y no se reparan (no se sabe cuál de
+los dos lados es el correcto).
+
+Una única lectura agregada por tabla llena tablas temporales (en disco, no
+en memoria) con los valores esperados; después se compara y repara por
+rangos de usuarios, cada uno en su propia transacción. Los eventos escritos
+después de la lectura inicial (id mayor que el de la foto) se suman al
+procesar cada rango, así que la reparación no pisa la actividad concurrente.
+
+study_minutes y streak_active no se tocan (sesiones y streak_engine.py).
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+from db_connection import connect, triggers_bypassed
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, 'task_gamification.db')
+
+CHUNK_USERS = 5000
+USER_COLUMNS = ('tasks_completed', 'current_xp', 'total_xp_earned', 'level')
+DAILY_COLUMNS = ('tasks_completed', 'xp_earned')
+
+
+def _has_table(conn, name):
+    return conn.execute("""
+        SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?
+    """, (name,)).fetchone() is not None
+
+
+def snapshot_expected(conn):
+    """
+    Llena temp.expected_users y temp.expected_daily con una pasada agregada
+    sobre activity_log y otra sobre activity_daily, y temp.task_mismatch con
+    los (usuario, día) en que las tareas COMPLETED no cuadran con el
+    registro, en una transacción de lectura (foto coherente).
+
+    Returns:
+        Último id de activity_log incluido en la foto
+    """
+    conn.execute("BEGIN")
+    try:
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM activity_log").fetchone()[0]
+        for table in ('expected_users', 'expected_daily', 'task_mismatch'):
+            conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+        conn.execute("""
+            CREATE TEMP TABLE expected_users (
+                user_id INTEGER PRIMARY KEY, tasks INTEGER NOT NULL, xp INTEGER NOT NULL)
+        """)
+        conn.execute("""
+            CREATE TEMP TABLE expected_daily (
+                user_id INTEGER NOT NULL, stat_date TEXT NOT NULL,
+                tasks INTEGER NOT NULL, xp INTEGER NOT NULL,
+                PRIMARY KEY (user_id, stat_date)
+            ) WITHOUT ROWID
+        """)
+        archived = _has_table(conn, 'activity_daily')
+        conn.execute(f"""
+            INSERT INTO temp.expected_users (user_id, tasks, xp)
+            SELECT user_id, SUM(tasks), SUM(xp)
+            FROM (
+                SELECT user_id,
+                       SUM(activity_type = 'TASK_COMPLETED') AS tasks,
+                       COALESCE(SUM(xp_change), 0) AS xp
+                FROM activity_log
+                WHERE id <= ?
+                GROUP BY user_id
+                {'''UNION ALL
+                SELECT user_id,
+                       SUM(CASE WHEN activity_type = 'TASK_COMPLETED' THEN events ELSE 0 END),
+                       SUM(xp_change)
+                FROM activity_daily
+                GROUP BY user_id''' if archived else ''}
+            )
+            GROUP BY user_id
+        """, (last_id,))
+        conn.execute(f"""
+            INSERT INTO temp.expected_daily (user_id, stat_date, tasks, xp)
+            SELECT user_id, stat_date, SUM(tasks), SUM(xp)
+            FROM (
+                SELECT user_id, DATE(created_at) AS stat_date,
+                       COUNT(*) AS tasks, COALESCE(SUM(xp_change), 0) AS xp
+                FROM activity_log
+                WHERE id <= ? AND activity_type = 'TASK_COMPLETED'
+                GROUP BY user_id, DATE(created_at)
+                {'''UNION ALL
+                SELECT user_id, activity_date, events, xp_change
+                FROM activity_daily
+                WHERE activity_type = 'TASK_COMPLETED' ''' if archived else ''}
+            )
+            GROUP BY user_id, stat_date
+        """, (last_id,))
+        conn.execute("""
+            CREATE TEMP TABLE task_mismatch AS
+            SELECT user_id, stat_date,
+                   SUM(tasks) AS tasks, SUM(xp) AS xp,
+                   SUM(logged_tasks) AS logged_tasks, SUM(logged_xp) AS logged_xp
+            FROM (
+                SELECT user_id, DATE(completed_at) AS stat_date,
+                       COUNT(*) AS tasks, SUM(xp_reward) AS xp,
+                       0 AS logged_tasks, 0 AS logged_xp
+                FROM tasks
+                WHERE status = 'COMPLETED'
+                GROUP BY user_id, DATE(completed_at)
+                UNION ALL
+                SELECT user_id, stat_date, 0, 0, tasks, xp
+                FROM temp.expected_daily
+            )
+            GROUP BY user_id, stat_date
+            HAVING (SUM(tasks), SUM(xp)) IS NOT (SUM(logged_tasks), SUM(logged_xp))
+            ORDER BY user_id, stat_date
+        """)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return last_id
+
+
+def _add_new_events(conn, last_id, low, high):
+    """Suma a los esperados del rango los eventos posteriores a la foto"""
+    conn.execute("""
+        INSERT INTO temp.expected_users (user_id, tasks, xp)
+        SELECT user_id, SUM(activity_type = 'TASK_COMPLETED'), COALESCE(SUM(xp_change), 0)
+        FROM activity_log
+        WHERE id > ? AND user_id BETWEEN ? AND ?
+        GROUP BY user_id
+        ON CONFLICT(user_id) DO UPDATE SET
+            tasks = tasks + excluded.tasks,
+            xp = xp + excluded.xp
+    """, (last_id, low, high))
+    conn.execute("""
+        INSERT INTO temp.expected_daily (user_id, stat_date, tasks, xp)
+        SELECT user_id, DATE(created_at), COUNT(*), COALESCE(SUM(xp_change), 0)
+        FROM activity_log
+        WHERE id > ? AND user_id BETWEEN ? AND ? AND activity_type = 'TASK_COMPLETED'
+        GROUP BY user_id, DATE(created_at)
+        ON CONFLICT(user_id, stat_date) DO UPDATE SET
+            tasks = tasks + excluded.tasks,
+            xp = xp + excluded.xp
+    """, (last_id, low, high))
+
+
+def _stage_mismatches(conn, low, high):
+    """temp.user_fix y temp.daily_fix: filas del rango que no cuadran"""
+    conn.execute("DELETE FROM temp.user_fix")
+    conn.execute("DELETE FROM temp.daily_fix")
+    conn.execute("""
+        INSERT INTO temp.user_fix
+        SELECT id, tasks_completed, current_xp, total_xp_earned, level,
+               tasks, xp, xp, xp / 100 + 1
+        FROM (
+            SELECT u.id, u.tasks_completed, u.current_xp, u.total_xp_earned, u.level,
+                   COALESCE(e.tasks, 0) AS tasks, COALESCE(e.xp, 0) AS xp
+            FROM users u
+            LEFT JOIN temp.expected_users e ON e.user_id = u.id
+            WHERE u.id BETWEEN ? AND ?
+        )
+        WHERE (tasks_completed, current_xp, total_xp_earned, level)
+              IS NOT (tasks, xp, xp, xp / 100 + 1)
+    """, (low, high))
+    conn.execute("""
+        INSERT INTO temp.daily_fix
+        SELECT d.user_id, d.stat_date, d.tasks_completed, d.xp_earned,
+               COALESCE(e.tasks, 0), COALESCE(e.xp, 0)
+        FROM daily_stats d
+        LEFT JOIN temp.expected_daily e
+               ON e.user_id = d.user_id AND e.stat_date = d.stat_date
+        WHERE d.user_id BETWEEN ?1 AND ?2
+          AND (d.tasks_completed, d.xp_earned) IS NOT (COALESCE(e.tasks, 0), COALESCE(e.xp, 0))
+        UNION ALL
+        SELECT e.user_id, e.stat_date, NULL, NULL, e.tasks, e.xp
+        FROM temp.expected_daily e
+        WHERE e.user_id BETWEEN ?1 AND ?2
+          AND (e.tasks, e.xp) != (0, 0)
+          AND NOT EXISTS (SELECT 1 FROM daily_stats d
+                          WHERE d.user_id = e.user_id AND d.stat_date = e.stat_date)
+          AND EXISTS (SELECT 1 FROM users u WHERE u.id = e.user_id)
+    """, (low, high))
+
+
+def _repair(conn):
+    """Aplica temp.user_fix y temp.daily_fix (dentro de la transacción del rango)"""
+    # Sin check_level_up ni update_users_timestamp: un LEVEL_UP por corregir
+    # un contador no es una subida de nivel real
+    with triggers_bypassed(conn):
+        conn.execute("""
+            UPDATE users
+            SET tasks_completed = f.expected_tasks,
+                current_xp = f.expected_current_xp,
+                total_xp_earned = f.expected_total_xp,
+                level = f.expected_level
+            FROM temp.user_fix f
+            WHERE users.id = f.user_id
+        """)
+    # Los triggers summary_daily_* mantienen user_summary.xp_last_week
+    conn.execute("""
+        INSERT INTO daily_stats (user_id, stat_date, tasks_completed, xp_earned)
+        SELECT user_id, stat_date, expected_tasks, expected_xp
+        FROM temp.daily_fix
+        WHERE true
+        ON CONFLICT(user_id, stat_date) DO UPDATE SET
+            tasks_completed = excluded.tasks_completed,
+            xp_earned = excluded.xp_earned
+    """)
+
+
+def _user_ranges(conn, chunk_users):
+    """Rangos [low, high] de ids con chunk_users usuarios cada uno (keyset)"""
+    after = None
+    while True:
+        rows = conn.execute("""
+            SELECT MIN(id), MAX(id) FROM (
+                SELECT id FROM users WHERE ?1 IS NULL OR id > ?1 ORDER BY id LIMIT ?2
+            )
+        """, (after, chunk_users)).fetchone()
+        if rows[0] is None:
+            return
+        yield rows
+        after = rows[1]
+
+
+def check_integrity(conn, repair=False, chunk_users=CHUNK_USERS, examples=10, verbose=False):
+    """
+    Compara (y con repair=True corrige) los contadores de todos los usuarios.
+    `conn` debe abrirse con isolation_level=None.
+
+    Returns:
+        dict {'users', 'user_rows', 'daily_rows', 'task_rows' (días de
+        usuario en que tasks no cuadra con activity_log, no se reparan),
+        'columns' (discrepancias por columna), 'examples' (primeras
+        discrepancias), 'repaired', 'seconds'}
+    """
+    start = time.perf_counter()
+    last_id = snapshot_expected(conn)
+    conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS user_fix (
+            user_id INTEGER PRIMARY KEY,
+            tasks_completed, current_xp, total_xp_earned, level,
+            expected_tasks, expected_current_xp, expected_total_xp, expected_level)
+    """)
+    conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS daily_fix (
+            user_id, stat_date, tasks_completed, xp_earned, expected_tasks, expected_xp)
+    """)
+    if verbose:
+        print(f"   • Valores esperados calculados ({time.perf_counter() - start:.1f}s)")
+
+    result = {'users': 0, 'user_rows': 0, 'daily_rows': 0, 'task_rows': 0, 'examples': [],
+              'repaired': repair, 'columns': {}}
+    for row in conn.execute("SELECT * FROM temp.task_mismatch"):
+        result['task_rows'] += 1
+        for column, actual, logged in (('tasks.COMPLETED', row[2], row[4]),
+                                       ('tasks.xp_reward', row[3], row[5])):
+            if actual != logged:
+                result['columns'][column] = result['columns'].get(column, 0) + 1
+                if len(result['examples']) < examples:
+                    result['examples'].append((column, f"usuario {row[0]} {row[1]}",
+                                               actual, logged))
+    for low, high in _user_ranges(conn, chunk_users):
+        conn.execute("BEGIN IMMEDIATE" if repair else "BEGIN")
+        try:
+            _add_new_events(conn, last_id, low, high)
+            _stage_mismatches(conn, low, high)
+            if repair:
+                _repair(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        result['users'] += conn.execute("""
+            SELECT COUNT(*) FROM users WHERE id BETWEEN ? AND ?
+        """, (low, high)).fetchone()[0]
+        for row in conn.execute("SELECT * FROM temp.user_fix"):
+            result['user_rows'] += 1
+            for i, column in enumerate(USER_COLUMNS):
+                if row[1 + i] != row[5 + i]:
+                    result['columns'][f"users.{column}"] = \
+                        result['columns'].get(f"users.{column}", 0) + 1
+                    if len(result['examples']) < examples:
+                        result['examples'].append(
+                            (f"users.{column}", f"usuario {row[0]}", row[1 + i], row[5 + i]))
+        for row in conn.execute("SELECT * FROM temp.daily_fix"):
+            result['daily_rows'] += 1
+            for i, column in enumerate(DAILY_COLUMNS):
+                if row[2 + i] != row[4 + i]:
+                    result['columns'][f"daily_stats.{column}"] = \
+                        result['columns'].get(f"daily_stats.{column}", 0) + 1
+                    if len(result['examples']) < examples:
+                        result['examples'].append((f"daily_stats.{column}",
+                                                   f"usuario {row[0]} {row[1]}",
+                                                   row[2 + i], row[4 + i]))
+        if verbose:
+            print(f"   • Usuarios {low}-{high} ({time.perf_counter() - start:.1f}s)")
+
+    for table in ('expected_users', 'expected_daily', 'task_mismatch', 'user_fix', 'daily_fix'):
+        conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+    result['seconds'] = round(time.perf_counter() - start, 2)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Verifica y repara los contadores de users y daily_stats")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Ruta de la base de datos")
+    parser.add_argument('--reparar', action='store_true', help="Corregir las discrepancias")
+    parser.add_argument('--lote', type=int, default=CHUNK_USERS,
+                        help="Usuarios por transacción")
+    parser.add_argument('--ejemplos', type=int, default=10,
+                        help="Discrepancias a mostrar")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ Error: No existe {args.db}")
+        return 1
+
+    # Tablas temporales en disco: memoria acotada con millones de filas
+    conn = connect(args.db, 'tuned', isolation_level=None, temp_store='FILE')
+    try:
+        print("🔍 Recalculando contadores desde activity_log...")
+        result = check_integrity(conn, args.reparar, args.lote, args.ejemplos, verbose=True)
+    except sqlite3.Error as e:
+        print(f"\n❌ Error de SQLite: {e}")
+        return 1
+    finally:
+        conn.close()
+
+    print(f"\n📊 {result['users']:,} usuarios revisados en {result['seconds']}s")
+    if not result['columns']:
+        print("✅ Todos los contadores son consistentes")
+        return 0
+    print(f"⚠️  {result['user_rows']:,} usuarios y {result['daily_rows']:,} filas de "
+          f"daily_stats con discrepancias")
+    for column, count in sorted(result['columns'].items()):
+        print(f"   • {column}: {count:,}")
+    for column, where, actual, expected in result['examples']:
+        print(f"     {column:28} {where:28} {actual} → {expected}")
+    if result['task_rows']:
+        print(f"⚠️  {result['task_rows']:,} días de usuario en que las tareas COMPLETED no "
+              f"cuadran con activity_log (tasks → registro): revísalas a mano, no se reparan")
+    if not result['repaired']:
+        if result['user_rows'] or result['daily_rows']:
+            print("💡 Usa --reparar para corregir los contadores")
+        return 1
+    if result['user_rows'] or result['daily_rows']:
+        print("🔧 Contadores reparados")
+    return 1 if result['task_rows'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
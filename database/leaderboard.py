@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Rankings de usuarios por XP
+Tres tipos de ranking, persistidos en leaderboard_scores:
+  - global: users.total_xp_earned
+  - semanal: SUM(daily_stats.xp_earned) de la semana (lunes a domingo)
+  - por categoría: SUM(tasks.xp_reward) de las tareas completadas
+
+En memoria cada ranking es un RankIndex (lista ordenada + bisect): posición
+de un usuario en O(log n), páginas top-K y ventanas "alrededor de mí" sin
+ordenar la tabla users. refresh() solo recalcula a los usuarios con actividad
+desde la última ejecución (activity_log.id como marca de agua).
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from bisect import bisect_left, insort
+from datetime import date, timedelta
+
+from db_connection import connect
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, 'task_gamification.db')
+
+WATERMARK_KEY = 'leaderboard_watermark'
+
+GLOBAL_BOARD = 'global'
+CATEGORIES = ('STUDY', 'MATHEMATICS', 'HISTORY', 'SCIENCE',
+              'EXERCISE', 'SOCIAL', 'WORK', 'PERSONAL')
+
+
+def weekly_board(day=None):
+    """Nombre del ranking de la semana que contiene `day` (por defecto hoy)"""
+    day = day or date.today()
+    return f"weekly:{(day - timedelta(days=day.weekday())).isoformat()}"
+
+
+def category_board(category):
+    return f"category:{category}"
+
+
+def current_boards(day=None):
+    """Rankings que mantiene refresh(): global, semana actual y categorías"""
+    return [GLOBAL_BOARD, weekly_board(day)] + [category_board(c) for c in CATEGORIES]
+
+
+class RankIndex:
+    """
+    Ranking ordenado en memoria. Orden: mayor puntuación primero y, a
+    igualdad, menor user_id. Las posiciones empiezan en 1.
+    """
+
+    def __init__(self, entries=()):
+        self._scores = dict(entries)
+        self._keys = sorted((-score, user_id) for user_id, score in self._scores.items())
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, user_id):
+        return user_id in self._scores
+
+    def score(self, user_id):
+        return self._scores.get(user_id)
+
+    def update(self, user_id, score):
+        """Inserta o actualiza la puntuación de un usuario"""
+        old = self._scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            del self._keys[bisect_left(self._keys, (-old, user_id))]
+        self._scores[user_id] = score
+        insort(self._keys, (-score, user_id))
+
+    def remove(self, user_id):
+        old = self._scores.pop(user_id, None)
+        if old is not None:
+            del self._keys[bisect_left(self._keys, (-old, user_id))]
+
+    def rank(self, user_id):
+        """Posición del usuario o None si no está en el ranking"""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return bisect_left(self._keys, (-score, user_id)) + 1
+
+    def page(self, start, stop):
+        """Lista de (posición, user_id, puntuación) para posiciones [start, stop)"""
+        start = max(start, 1)
+        return [(start + i, user_id, -neg)
+                for i, (neg, user_id) in enumerate(self._keys[start - 1:stop - 1])]
+
+    def top(self, k=10, offset=0):
+        return self.page(offset + 1, offset + 1 + k)
+
+    def around(self, user_id, radius=5):
+        """Usuarios a `radius` posiciones por encima y por debajo de user_id"""
+        rank = self.rank(user_id)
+        if rank is None:
+            return []
+        return self.page(rank - radius, rank + radius + 1)
+
+
+def _board_query(board, scoped):
+    """
+    SQL (user_id, score) que calcula un ranking desde las tablas de origen.
+    Con `scoped` se limita a los usuarios de temp.leaderboard_users.
+    """
+    kind, _, key = board.partition(':')
+    if kind == GLOBAL_BOARD:
+        where = "WHERE id IN (SELECT user_id FROM temp.leaderboard_users)" if scoped else ""
+        return f"SELECT id, total_xp_earned FROM users {where}", ()
+    scope = "AND user_id IN (SELECT user_id FROM temp.leaderboard_users)" if scoped else ""
+    if kind == 'weekly':
+        monday = date.fromisoformat(key)
+        return f"""
+            SELECT user_id, SUM(xp_earned)
+            FROM daily_stats
+            WHERE stat_date BETWEEN ? AND ? {scope}
+            GROUP BY user_id
+            HAVING SUM(xp_earned) > 0
+        """, (monday.isoformat(), (monday + timedelta(days=6)).isoformat())
+    if kind == 'category':
+        return f"""
+            SELECT user_id, SUM(xp_reward)
+            FROM tasks
+            WHERE status = 'COMPLETED' AND category = ? {scope}
+            GROUP BY user_id
+            HAVING SUM(xp_reward) > 0
+        """, (key,)
+    raise ValueError(f"Ranking desconocido: {board}")
+
+
+def _save_watermark(conn, watermark):
+    conn.execute("""
+        INSERT INTO app_settings (setting_key, setting_value, setting_type, description)
+        VALUES (?, ?, 'INTEGER', 'Último activity_log.id aplicado por leaderboard.py')
+        ON CONFLICT(setting_key) DO UPDATE SET
+            setting_value = excluded.setting_value,
+            updated_at = CURRENT_TIMESTAMP
+    """, (WATERMARK_KEY, str(watermark)))
+
+
+def get_watermark(conn):
+    row = conn.execute("SELECT setting_value FROM app_settings WHERE setting_key = ?",
+                       (WATERMARK_KEY,)).fetchone()
+    return int(row[0]) if row and row[0] else None
+
+
+def _rebuild_board(conn, board):
+    sql, params = _board_query(board, scoped=False)
+    conn.execute("DELETE FROM leaderboard_scores WHERE board = ?", (board,))
+    conn.execute(f"INSERT INTO leaderboard_scores (board, user_id, score) "
+                 f"SELECT ?, * FROM ({sql})", (board,) + params)
+
+
+def rebuild(conn, boards=None):
+    """
+    Recalcula desde cero los rankings indicados (por defecto current_boards()).
+
+    Returns:
+        dict {board: número de usuarios}
+    """
+    boards = boards or current_boards()
+    try:
+        watermark = conn.execute("SELECT COALESCE(MAX(id), 0) FROM activity_log").fetchone()[0]
+        for board in boards:
+            _rebuild_board(conn, board)
+        _save_watermark(conn, watermark)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {board: conn.execute("SELECT COUNT(*) FROM leaderboard_scores WHERE board = ?",
+                                (board,)).fetchone()[0] for board in boards}
+
+
+def refresh(conn, day=None):
+    """
+    Actualiza los rankings actuales solo para los usuarios con actividad nueva.
+    Un ranking semanal que aún no existe se construye completo.
+
+    Returns:
+        Lista de (board, user_id, score) cambiados; score None si el usuario
+        sale del ranking
+    """
+    watermark = get_watermark(conn)
+    if watermark is None:
+        rebuild(conn, current_boards(day))
+        return None
+
+    changes = []
+    try:
+        new_watermark = conn.execute("SELECT COALESCE(MAX(id), 0) FROM activity_log").fetchone()[0]
+        conn.execute("DROP TABLE IF EXISTS temp.leaderboard_users")
+        conn.execute("CREATE TEMP TABLE leaderboard_users (user_id INTEGER PRIMARY KEY)")
+        conn.execute("""
+            INSERT INTO temp.leaderboard_users
+            SELECT DISTINCT user_id FROM activity_log WHERE id > ?
+        """, (watermark,))
+
+        for board in current_boards(day):
+            exists = conn.execute("SELECT 1 FROM leaderboard_scores WHERE board = ? LIMIT 1",
+                                  (board,)).fetchone()
+            if not exists:
+                _rebuild_board(conn, board)
+                changes.extend((board, user_id, score) for user_id, score in conn.execute(
+                    "SELECT user_id, score FROM leaderboard_scores WHERE board = ?", (board,)))
+                continue
+            sql, params = _board_query(board, scoped=True)
+            fresh = dict(conn.execute(sql, params).fetchall())
+            stored = dict(conn.execute("""
+                SELECT user_id, score FROM leaderboard_scores
+                WHERE board = ? AND user_id IN (SELECT user_id FROM temp.leaderboard_users)
+            """, (board,)).fetchall())
+            upserts = [(board, user_id, score) for user_id, score in fresh.items()
+                       if stored.get(user_id) != score]
+            removed = [(board, user_id) for user_id in stored if user_id not in fresh]
+            conn.executemany("""
+                INSERT INTO leaderboard_scores (board, user_id, score) VALUES (?, ?, ?)
+                ON CONFLICT(board, user_id) DO UPDATE SET score = excluded.score
+            """, upserts)
+            conn.executemany("DELETE FROM leaderboard_scores WHERE board = ? AND user_id = ?",
+                             removed)
+            changes.extend(upserts)
+            changes.extend((board, user_id, None) for board, user_id in removed)
+
+        _save_watermark(conn, new_watermark)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("DROP TABLE IF EXISTS temp.leaderboard_users")
+    return changes
+
+
+class Leaderboard:
+    """
+    Rankings en memoria sobre leaderboard_scores. Cada ranking se carga la
+    primera vez que se consulta (en orden del índice idx_leaderboard_rank) y
+    sync() le aplica los cambios incrementales de refresh().
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._boards = {}
+
+    def board(self, board=GLOBAL_BOARD):
+        index = self._boards.get(board)
+        if index is None:
+            index = RankIndex(self.conn.execute(
+                "SELECT user_id, score FROM leaderboard_scores WHERE board = ?", (board,)))
+            self._boards[board] = index
+        return index
+
+    def sync(self, day=None):
+        """Aplica la actividad nueva a la BD y a los rankings ya cargados"""
+        changes = refresh(self.conn, day)
+        if changes is None:
+            self._boards.clear()
+            return 0
+        for board, user_id, score in changes:
+            index = self._boards.get(board)
+            if index is None:
+                continue
+            if score is None:
+                index.remove(user_id)
+            else:
+                index.update(user_id, score)
+        return len(changes)
+
+    def rank(self, user_id, board=GLOBAL_BOARD):
+        return self.board(board).rank(user_id)
+
+    def top(self, k=10, offset=0, board=GLOBAL_BOARD):
+        return self.board(board).top(k, offset)
+
+    def around(self, user_id, radius=5, board=GLOBAL_BOARD):
+        return self.board(board).around(user_id, radius)
+
+
+def _resolve_board(name):
+    """Acepta 'global', 'semana' o el nombre de una categoría"""
+    if name in ('global', GLOBAL_BOARD):
+        return GLOBAL_BOARD
+    if name in ('semana', 'weekly'):
+        return weekly_board()
+    if name.upper() in CATEGORIES:
+        return category_board(name.upper())
+    return name
+
+
+def print_rows(rows, names, highlight=None):
+    for rank, user_id, score in rows:
+        marker = "👉" if user_id == highlight else "  "
+        print(f"{marker} {rank:>7}. {names.get(user_id, user_id)!s:30} {score:>10} XP")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rankings de usuarios por XP")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Ruta de la base de datos")
+    parser.add_argument('--reconstruir', action='store_true',
+                        help="Recalcular los rankings desde cero")
+    parser.add_argument('--ranking', default='global',
+                        help="global, semana o una categoría (ej. MATHEMATICS)")
+    parser.add_argument('--top', type=int, default=10, help="Tamaño de la página")
+    parser.add_argument('--desde', type=int, default=0, help="Posiciones a saltar")
+    parser.add_argument('--usuario', type=int, help="Mostrar posición y vecinos del usuario")
+    parser.add_argument('--radio', type=int, default=5, help="Vecinos por encima y por debajo")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ Error: No existe {args.db}")
+        return 1
+
+    board = _resolve_board(args.ranking)
+    conn = connect(args.db, 'tuned')
+    try:
+        start = time.perf_counter()
+        if args.reconstruir:
+            counts = rebuild(conn)
+            print(f"✅ Rankings reconstruidos ({time.perf_counter() - start:.2f}s)")
+            for name, count in counts.items():
+                print(f"   • {name:25} {count:>10} usuarios")
+        leaderboard = Leaderboard(conn)
+        changes = leaderboard.sync()
+        index = leaderboard.board(board)
+        print(f"🔄 Cambios aplicados: {changes}   📥 {board}: {len(index)} usuarios "
+              f"({time.perf_counter() - start:.2f}s)")
+
+        if args.usuario is not None:
+            rows = index.around(args.usuario, args.radio)
+        else:
+            rows = index.top(args.top, args.desde)
+        ids = [row[1] for row in rows]
+        names = dict(conn.execute(
+            f"SELECT id, name FROM users WHERE id IN ({','.join('?' * len(ids))})", ids))
+
+        print(f"\n🏆 {board}")
+        if args.usuario is not None and not rows:
+            print(f"   El usuario {args.usuario} no está en este ranking")
+        print_rows(rows, names, args.usuario)
+        return 0
+    except (sqlite3.Error, ValueError) as e:
+        print(f"\n❌ Error: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Migraciones de esquema y plantilla de base de datos
+Migra una base de datos existente sin perder datos, según el valor de
+db_version en app_settings:
+  - MIGRATIONS es la lista ordenada de (versión, descripción, función); cada
+    migración pendiente se aplica en su propia transacción junto con la
+    actualización de db_version
+  - sync_with_schema() crea lo que falte de un schema (todo es IF NOT
+    EXISTS) y reconstruye por lotes las tablas cuyas columnas cambiaron,
+    copiando las columnas comunes
+  - cada migración usa el schema congelado de su versión
+    (schema_versions/schema_<versión>.sql), nunca el schema.sql actual: una
+    base 1.0 migrada a 1.1 recibe exactamente los objetos de 1.1. Un cambio
+    de esquema edita schema.sql, lo copia como schema_<nueva versión>.sql y
+    añade su entrada a MIGRATIONS (build_template() comprueba que coinciden)
+
+Las bases de datos nuevas se clonan de una plantilla ya construida
+(task_gamification_template.db) con la API de backup de sqlite3, en vez de
+volver a ejecutar schema.sql. La plantilla se regenera sola si schema.sql o
+este archivo son más recientes.
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import time
+
+from db_connection import connect, copy_database
+from search import fill_index
+from user_summary import fill_user_summary
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, 'task_gamification.db')
+SCHEMA_FILE = os.path.join(SCRIPT_DIR, 'schema.sql')
+TEMPLATE_DB = os.path.join(SCRIPT_DIR, 'task_gamification_template.db')
+SCHEMA_VERSIONS_DIR = os.path.join(SCRIPT_DIR, 'schema_versions')
+
+VERSION_KEY = 'db_version'
+REBUILD_BATCH = 10000
+
+
+def parse_version(version):
+    return tuple(int(part) for part in str(version).split('.'))
+
+
+def version_schema(version):
+    """Ruta del schema congelado de una versión"""
+    return os.path.join(SCHEMA_VERSIONS_DIR, f"schema_{version}.sql")
+
+
+def schema_statements(schema_file=SCHEMA_FILE):
+    """Sentencias de schema.sql una a una (los triggers incluyen sus ';')"""
+    with open(schema_file, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    statements = []
+    buffer = ''
+    for line in lines:
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statement = buffer.strip()
+            buffer = ''
+            if re.sub(r'--[^\n]*', '', statement).strip(' \n;'):
+                statements.append(statement)
+    return statements
+
+
+def _reference_schema(schema_file=SCHEMA_FILE):
+    """Base de datos en memoria con schema.sql para comparar columnas"""
+    ref = sqlite3.connect(':memory:')
+    with open(schema_file, 'r', encoding='utf-8') as f:
+        ref.executescript(f.read())
+    return ref
+
+
+def _columns(conn, table):
+    return [(name, col_type.upper(), notnull, default, pk)
+            for _, name, col_type, notnull, default, pk, *_ in
+            conn.execute(f'PRAGMA table_xinfo("{table}")')]
+
+
+def _table_sql(conn, table):
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                       (table,)).fetchone()
+    return row[0] if row else None
+
+
+def changed_tables(conn, schema_file=SCHEMA_FILE):
+    """
+    Tablas existentes cuyas columnas no coinciden con schema.sql.
+
+    Returns:
+        dict {tabla: CREATE TABLE de schema.sql}
+    """
+    ref = _reference_schema(schema_file)
+    try:
+        changed = {}
+        for (table,) in ref.execute("SELECT name FROM sqlite_master "
+                                    "WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"):
+            if _table_sql(conn, table) and _columns(conn, table) != _columns(ref, table):
+                changed[table] = _table_sql(ref, table)
+        return changed
+    finally:
+        ref.close()
+
+
+def rebuild_table(conn, table, create_sql, batch_size=REBUILD_BATCH, verbose=False):
+    """
+    Reconstruye `table` con la definición `create_sql` (procedimiento de
+    ALTER TABLE en 12 pasos de SQLite): crea la tabla nueva, copia las
+    columnas comunes por rangos de rowid, borra la antigua, renombra y
+    recrea sus índices y triggers.
+
+    Debe llamarse dentro de una transacción con foreign_keys desactivado
+    (ver migrate()).
+
+    Returns:
+        Filas copiadas
+    """
+    new_table = f"{table}__new"
+    old_columns = [c[0] for c in _columns(conn, table)]
+    dependents = [sql for (sql,) in conn.execute("""
+        SELECT sql FROM sqlite_master
+        WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    """, (table,))]
+
+    conn.execute(f'DROP TABLE IF EXISTS "{new_table}"')
+    conn.execute(re.sub(r'^CREATE TABLE\s+("?)' + re.escape(table) + r'\1',
+                        f'CREATE TABLE "{new_table}"', create_sql, count=1))
+    new_columns = [c[0] for c in _columns(conn, new_table)]
+    common = ", ".join(f'"{c}"' for c in new_columns if c in old_columns)
+
+    copied = 0
+    if 'WITHOUT ROWID' in create_sql.upper() or 'WITHOUT ROWID' in _table_sql(conn, table).upper():
+        copied = conn.execute(f'INSERT INTO "{new_table}" ({common}) '
+                              f'SELECT {common} FROM "{table}"').rowcount
+    else:
+        low, high = conn.execute(f'SELECT MIN(rowid), MAX(rowid) FROM "{table}"').fetchone()
+        while low is not None and low <= high:
+            copied += conn.execute(f"""
+                INSERT INTO "{new_table}" (rowid, {common})
+                SELECT rowid, {common} FROM "{table}"
+                WHERE rowid >= ? AND rowid < ?
+            """, (low, low + batch_size)).rowcount
+            low += batch_size
+            if verbose:
+                print(f"   🔁 {table}: {copied:,} filas copiadas")
+
+    # Sin legacy_alter_table, RENAME valida todo el esquema y fallaría con
+    # las vistas y triggers que apuntan a la tabla recién borrada
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        conn.execute(f'DROP TABLE "{table}"')
+        conn.execute(f'ALTER TABLE "{new_table}" RENAME TO "{table}"')
+    finally:
+        conn.execute("PRAGMA legacy_alter_table = OFF")
+    for sql in dependents:
+        conn.execute(sql)
+    return copied
+
+
+def sync_with_schema(conn, schema_file=SCHEMA_FILE, verbose=False):
+    """
+    Lleva la base de datos al esquema de schema.sql: reconstruye las tablas
+    con columnas distintas y ejecuta las sentencias de schema.sql (crean
+    solo lo que falta).
+
+    Returns:
+        Lista de tablas reconstruidas
+    """
+    rebuilt = []
+    for table, create_sql in changed_tables(conn, schema_file).items():
+        copied = rebuild_table(conn, table, create_sql, verbose=verbose)
+        rebuilt.append(table)
+        if verbose:
+            print(f"   🔁 {table} reconstruida ({copied:,} filas)")
+    for statement in schema_statements(schema_file):
+        conn.execute(statement)
+    return rebuilt
+
+
+def _migrate_1_1(conn):
+    sync_with_schema(conn, version_schema('1.1'), verbose=True)
+    fill_user_summary(conn)
+
+
+def _migrate_1_2(conn):
+    sync_with_schema(conn, version_schema('1.2'), verbose=True)
+    fill_index(conn)
+
+
+def _migrate_1_3(conn):
+    # CREATE TRIGGER IF NOT EXISTS no sustituye a los triggers sin WHEN
+    for name in ('task_completed_stats', 'check_level_up',
+                 'update_users_timestamp', 'update_tasks_timestamp'):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    sync_with_schema(conn, version_schema('1.3'), verbose=True)
+
+
+def _migrate_1_4(conn):
+    conn.execute("DROP TRIGGER IF EXISTS summary_task_update")
+    sync_with_schema(conn, version_schema('1.4'), verbose=True)
+
+
+# (versión, descripción, función) en orden; la última es la de schema.sql y
+# cada una tiene su schema_versions/schema_<versión>.sql
+MIGRATIONS = [
+    ('1.1', "user_summary, leaderboard_scores, activity_daily y columnas de "
+            "reintento de sync_queue", _migrate_1_1),
+    ('1.2', "Búsqueda de texto completo (tasks_fts, sessions_fts)", _migrate_1_2),
+    ('1.3', "Triggers desactivables por transacción (bypass_triggers)", _migrate_1_3),
+    ('1.4', "summary_task_update desactivable por transacción", _migrate_1_4),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn):
+    row = conn.execute("SELECT setting_value FROM app_settings WHERE setting_key = ?",
+                       (VERSION_KEY,)).fetchone()
+    return row[0] if row and row[0] else '1.0'
+
+
+def _set_version(conn, version):
+    conn.execute("""
+        INSERT INTO app_settings (setting_key, setting_value, setting_type, description)
+        VALUES (?, ?, 'STRING', 'Versión del esquema de base de datos')
+        ON CONFLICT(setting_key) DO UPDATE SET
+            setting_value = excluded.setting_value,
+            updated_at = CURRENT_TIMESTAMP
+    """, (VERSION_KEY, version))
+
+
+def pending_migrations(conn):
+    current = parse_version(get_version(conn))
+    return [m for m in MIGRATIONS if parse_version(m[0]) > current]
+
+
+def migrate(conn, target=SCHEMA_VERSION, verbose=False):
+    """
+    Aplica en orden las migraciones pendientes hasta `target`, cada una en
+    una transacción (BEGIN IMMEDIATE) con foreign_keys desactivado mientras
+    dura y PRAGMA foreign_key_check antes del commit.
+
+    Returns:
+        Lista de versiones aplicadas
+    """
+    if conn.in_transaction:
+        conn.commit()
+    applied = []
+    for version, description, func in pending_migrations(conn):
+        if parse_version(version) > parse_version(target):
+            break
+        if verbose:
+            print(f"⬆️  {version}: {description}")
+        conn.execute("PRAGMA foreign_keys = OFF")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            func(conn)
+            violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+            if violations:
+                raise sqlite3.IntegrityError(
+                    f"La migración {version} deja {len(violations)} claves foráneas rotas")
+            _set_version(conn, version)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute("PRAGMA foreign_keys = ON")
+        applied.append(version)
+    return applied
+
+
+def template_is_current(template=TEMPLATE_DB, schema_file=SCHEMA_FILE):
+    """La plantilla existe, tiene SCHEMA_VERSION y es posterior a schema.sql"""
+    if not os.path.exists(template):
+        return False
+    newest_source = max(os.path.getmtime(schema_file), os.path.getmtime(__file__))
+    if os.path.getmtime(template) < newest_source:
+        return False
+    conn = sqlite3.connect(f"file:{template}?mode=ro", uri=True)
+    try:
+        return get_version(conn) == SCHEMA_VERSION
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+
+
+def build_template(template=TEMPLATE_DB, schema_file=SCHEMA_FILE):
+    """
+    Construye la plantilla ejecutando schema.sql una sola vez (journal
+    DELETE y VACUUM: un único archivo compacto) y la reemplaza de forma
+    atómica. schema.sql debe coincidir con el schema congelado de
+    SCHEMA_VERSION, o las bases nuevas y las migradas serían distintas.
+    """
+    frozen = version_schema(SCHEMA_VERSION)
+    with open(schema_file, 'rb') as f, open(frozen, 'rb') as g:
+        if schema_file == SCHEMA_FILE and f.read() != g.read():
+            raise ValueError(f"schema.sql no coincide con {os.path.basename(frozen)}: "
+                             f"congela el cambio como una versión nueva en MIGRATIONS")
+    tmp = template + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = connect(tmp, 'default')
+    try:
+        with open(schema_file, 'r', encoding='utf-8') as f:
+            conn.executescript(f.read())
+        _set_version(conn, SCHEMA_VERSION)
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp, template)
+    return template
+
+
+def clone_template(db_path, template=TEMPLATE_DB):
+    """
+    Crea `db_path` (sustituyendo la existente y sus archivos WAL) como copia
+    de la plantilla con la API de backup, regenerándola si está desactualizada.
+    """
+    if not template_is_current(template):
+        build_template(template)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    return copy_database(template, db_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migraciones de esquema y plantilla")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Ruta de la base de datos")
+    parser.add_argument('--estado', action='store_true',
+                        help="Mostrar la versión y las migraciones pendientes")
+    parser.add_argument('--plantilla', action='store_true',
+                        help="Reconstruir la plantilla para bases de datos nuevas")
+    args = parser.parse_args(argv)
+
+    if args.plantilla:
+        start = time.perf_counter()
+        try:
+            build_template()
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            return 1
+        print(f"✅ Plantilla {TEMPLATE_DB} (versión {SCHEMA_VERSION}) "
+              f"en {time.perf_counter() - start:.3f}s")
+        return 0
+
+    if not os.path.exists(args.db):
+        print(f"❌ Error: No existe {args.db}")
+        return 1
+
+    conn = connect(args.db)
+    try:
+        pending = pending_migrations(conn)
+        print(f"📌 Versión actual: {get_version(conn)} (esquema: {SCHEMA_VERSION})")
+        if args.estado:
+            for version, description, _ in pending:
+                print(f"   ⏳ {version}: {description}")
+            if not pending:
+                print("   ✅ Sin migraciones pendientes")
+            return 0
+        start = time.perf_counter()
+        applied = migrate(conn, verbose=True)
+        if applied:
+            print(f"\n✅ Migrada a {applied[-1]} en {time.perf_counter() - start:.2f}s")
+        else:
+            print("✅ Sin migraciones pendientes")
+    except sqlite3.Error as e:
+        print(f"\n❌ Error de SQLite: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
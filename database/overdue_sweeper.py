@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Barrido de tareas vencidas
+Pasa a OVERDUE las tareas PENDING o IN_PROGRESS con due_date anterior a hoy,
+recorriendo rangos de idx_tasks_due_date en lotes acotados:
+  - el índice se recorre con lecturas (sin lock de escritura) y cada lote
+    se actualiza por id en su propia transacción, así que las tareas que se
+    completan en primer plano solo esperan como mucho un UPDATE de un lote
+  - la última fecha barrida se guarda en app_settings, de modo que cada
+    ejecución solo recorre las tareas que vencieron desde la anterior
+
+Las tareas creadas o reprogramadas con una fecha anterior a la ya barrida no
+entran en el barrido incremental; --completo recorre todo el índice.
+
+Los triggers de user_summary actualizan overdue_tasks con cada cambio.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from datetime import date
+
+from db_connection import connect
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, 'task_gamification.db')
+
+WATERMARK_KEY = 'overdue_swept_until'
+BATCH_SIZE = 250
+
+
+def get_watermark(conn):
+    row = conn.execute("SELECT setting_value FROM app_settings WHERE setting_key = ?",
+                       (WATERMARK_KEY,)).fetchone()
+    return row[0] if row and row[0] else None
+
+
+def _save_watermark(conn, until):
+    conn.execute("""
+        INSERT INTO app_settings (setting_key, setting_value, setting_type, description)
+        VALUES (?, ?, 'STRING', 'Tareas con due_date anterior ya barridas por overdue_sweeper.py')
+        ON CONFLICT(setting_key) DO UPDATE SET
+            setting_value = excluded.setting_value,
+            updated_at = CURRENT_TIMESTAMP
+    """, (WATERMARK_KEY, until))
+
+
+def _next_batch(conn, after, until, batch_size):
+    """
+    Siguiente lote de tareas vencidas en orden (due_date, id) posterior a
+    `after` y con due_date < `until`. Es solo una lectura: el recorrido del
+    índice no retiene el lock de escritura.
+    """
+    return conn.execute("""
+        SELECT due_date, id FROM tasks INDEXED BY idx_tasks_due_date
+        WHERE (due_date, id) > (?, ?)
+          AND due_date < ?
+          AND status IN ('PENDING', 'IN_PROGRESS')
+        ORDER BY due_date, id
+        LIMIT ?
+    """, (*after, until, batch_size)).fetchall()
+
+
+def _mark_overdue(conn, task_ids):
+    """
+    Marca las tareas como OVERDUE en una transacción corta. Vuelve a
+    comprobar el estado por si alguna se completó después de leer el lote.
+
+    Returns:
+        Tareas actualizadas
+    """
+    placeholders = ", ".join("?" * len(task_ids))
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        updated = conn.execute(f"""
+            UPDATE tasks
+            SET status = 'OVERDUE'
+            WHERE id IN ({placeholders})
+              AND status IN ('PENDING', 'IN_PROGRESS')
+        """, task_ids).rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return updated
+
+
+def sweep_overdue(conn, as_of=None, batch_size=BATCH_SIZE, pause=0.0, full=False):
+    """
+    Barre las tareas vencidas antes de `as_of` (hoy por defecto) desde la
+    última fecha barrida, o desde el principio con full=True.
+
+    Returns:
+        dict {'updated', 'batches', 'since', 'until', 'max_batch_ms'} con
+        max_batch_ms el mayor tiempo con el lock de escritura
+    """
+    until = (as_of or date.today()).isoformat()
+    since = None if full else get_watermark(conn)
+    if conn.in_transaction:
+        conn.commit()
+
+    after = (since or '', 0)
+    updated = batches = 0
+    max_batch = 0.0
+    while True:
+        rows = _next_batch(conn, after, until, batch_size)
+        if not rows:
+            break
+        start = time.perf_counter()
+        updated += _mark_overdue(conn, [task_id for _, task_id in rows])
+        max_batch = max(max_batch, time.perf_counter() - start)
+        batches += 1
+        after = rows[-1]
+        if len(rows) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    if since is None or until > since:
+        _save_watermark(conn, until)
+        conn.commit()
+    return {
+        'updated': updated,
+        'batches': batches,
+        'since': since,
+        'until': until,
+        'max_batch_ms': round(max_batch * 1000, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Marca como OVERDUE las tareas vencidas")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Ruta de la base de datos")
+    parser.add_argument('--lote', type=int, default=BATCH_SIZE, help="Tareas por transacción")
+    parser.add_argument('--pausa', type=float, default=0.0,
+                        help="Segundos de pausa entre lotes")
+    parser.add_argument('--completo', action='store_true',
+                        help="Ignorar la última fecha barrida y recorrer todo el índice")
+    parser.add_argument('--fecha', type=date.fromisoformat,
+                        help="Fecha de referencia YYYY-MM-DD (por defecto hoy)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ Error: No existe {args.db}")
+        return 1
+
+    conn = connect(args.db, 'tuned', isolation_level=None)
+    try:
+        start = time.perf_counter()
+        result = sweep_overdue(conn, args.fecha, args.lote, args.pausa, args.completo)
+        elapsed = time.perf_counter() - start
+    except sqlite3.Error as e:
+        print(f"\n❌ Error de SQLite: {e}")
+        return 1
+    finally:
+        conn.close()
+
+    desde = result['since'] or 'el principio'
+    print(f"⏰ Vencidas desde {desde} hasta {result['until']} (exclusivo)")
+    print(f"✅ {result['updated']:,} tareas marcadas como OVERDUE en {result['batches']} "
+          f"lotes ({elapsed:.2f}s, lock de escritura máx. {result['max_batch_ms']} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Perfilador de queries y asesor de índices
+Para una query:
+  - muestra el plan (EXPLAIN QUERY PLAN) y marca los pasos costosos:
+    SCAN de tabla completa, índices automáticos y B-trees temporales para
+    ORDER BY / GROUP BY / DISTINCT
+  - mide varias ejecuciones (p50 / mínimo / máximo) consumiendo todas las filas;
+    solo acepta consultas de lectura (una escritura se aplicaría una vez por
+    ejecución)
+  - sugiere índices compuestos, parciales (condiciones != o IS NOT NULL con
+    constantes) o de cobertura para las tablas recorridas enteras
+  - mide el antes/después de los índices sugeridos sobre una copia temporal
+    de la base de datos (API de backup), sin tocar el original
+
+El asesor es heurístico: analiza las cláusulas WHERE, JOIN ... ON y ORDER BY
+del texto de la query (y de las vistas que usa), no un árbol sintáctico.
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+from db_connection import DEFAULT_DB, connect, copy_database
+
+# Columnas añadidas como máximo a un índice de cobertura
+MAX_COVERING_COLUMNS = 6
+
+CLAUSE_END = r"(?=\bGROUP\s+BY\b|\bORDER\s+BY\b|\bLIMIT\b|\bHAVING\b|\bWINDOW\b|\bUNION\b|\)|;|$)"
+TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)(?:\s+(?:AS\s+)?([A-Za-z_]\w*))?",
+                       re.IGNORECASE)
+SQL_KEYWORDS = {'WHERE', 'JOIN', 'LEFT', 'INNER', 'CROSS', 'ON', 'GROUP', 'ORDER', 'LIMIT',
+                'USING', 'NATURAL', 'OUTER', 'UNION', 'HAVING', 'WINDOW', 'AS'}
+# Acciones del authorizer que puede preparar una consulta de solo lectura
+READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION,
+                sqlite3.SQLITE_RECURSIVE}
+
+
+def is_read_only(conn, sql, params=()):
+    """True si la query solo lee (acciones vistas por un authorizer al prepararla)"""
+    actions = set()
+
+    def authorizer(action, *_):
+        actions.add(action)
+        return sqlite3.SQLITE_OK
+
+    conn.set_authorizer(authorizer)
+    try:
+        conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    finally:
+        conn.set_authorizer(None)
+    return actions <= READ_ACTIONS
+
+
+def explain(conn, sql, params=()):
+    """Plan de la query como lista de (id, parent, detalle)"""
+    return [(row[0], row[1], row[3])
+            for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def find_issues(plan):
+    """
+    Pasos costosos del plan.
+
+    Returns:
+        Lista de (tipo, detalle) con tipo 'SCAN', 'SCAN_INDEX', 'TEMP_BTREE' o
+        'AUTO_INDEX'
+    """
+    issues = []
+    for _, _, detail in plan:
+        if detail.startswith('SCAN '):
+            if 'COVERING INDEX' in detail or detail.startswith('SCAN CONSTANT ROW'):
+                continue
+            issues.append(('SCAN_INDEX' if ' USING INDEX ' in detail else 'SCAN', detail))
+        elif 'TEMP B-TREE' in detail:
+            issues.append(('TEMP_BTREE', detail))
+        elif 'AUTOMATIC' in detail:
+            issues.append(('AUTO_INDEX', detail))
+    return issues
+
+
+def time_query(conn, sql, params=(), repeat=5):
+    """Ejecuta la query `repeat` veces consumiendo todas las filas"""
+    samples = []
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor = conn.execute(sql, params)
+        rows = 0
+        while True:
+            batch = cursor.fetchmany(1000)
+            if not batch:
+                break
+            rows += len(batch)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        'rows': rows,
+        'p50_ms': round(samples[len(samples) // 2] * 1000, 3),
+        'min_ms': round(samples[0] * 1000, 3),
+        'max_ms': round(samples[-1] * 1000, 3),
+    }
+
+
+def _strip_literals(sql):
+    """Sustituye los literales de texto por marcadores para no confundirlos con columnas"""
+    literals = []
+
+    def keep(match):
+        literals.append(match.group(0))
+        return f"__lit{len(literals) - 1}__"
+
+    return re.sub(r"'(?:[^']|'')*'", keep, sql), literals
+
+
+def _restore_literals(text, literals):
+    return re.sub(r"__lit(\d+)__", lambda m: literals[int(m.group(1))], text)
+
+
+def _query_sources(conn, sql):
+    """Texto de la query más el de las vistas que usa (recursivamente)"""
+    sources = [sql]
+    seen = set()
+    pending = [sql]
+    while pending:
+        text = pending.pop()
+        for name, _ in TABLE_REF.findall(text):
+            if name in seen:
+                continue
+            seen.add(name)
+            row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = ?",
+                               (name,)).fetchone()
+            if row:
+                sources.append(row[0])
+                pending.append(row[0])
+    return sources
+
+
+def _table_columns(conn, table):
+    """Columnas de la tabla; la INTEGER PRIMARY KEY ya va en todo índice como rowid"""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")
+            if not (row[5] and row[2].upper() == 'INTEGER')]
+
+
+def _clause(pattern, text):
+    return [m.group(1) for m in re.finditer(pattern + r"(.*?)" + CLAUSE_END, text,
+                                            re.IGNORECASE | re.DOTALL)]
+
+
+def _column_refs(expression, alias, columns):
+    """Columnas de la tabla (por alias o sin prefijo) que aparecen en la expresión"""
+    found = []
+    for prefix, column in re.findall(r"(?:\b(\w+)\.)?\b(\w+)\b", expression):
+        if column in columns and (not prefix or prefix == alias) and column not in found:
+            found.append(column)
+    return found
+
+
+def suggest_indexes(conn, sql):
+    """
+    Sugiere un CREATE INDEX por cada tabla que el plan recorre entera o que
+    necesita un B-tree temporal para ordenar.
+
+    Returns:
+        Lista de sentencias CREATE INDEX IF NOT EXISTS
+    """
+    plan = explain(conn, sql)
+    issues = find_issues(plan)
+    needs_order = any(kind == 'TEMP_BTREE' and 'ORDER BY' in detail
+                      for kind, detail in issues)
+    # Tablas recorridas enteras; si hay que ordenar, también las buscadas
+    scanned = [detail.split()[1] for kind, detail in issues if kind in ('SCAN', 'SCAN_INDEX')]
+    if needs_order:
+        scanned += [detail.split()[1] for _, _, detail in plan
+                    if detail.startswith('SEARCH ') and detail.split()[1] not in scanned]
+
+    suggestions = []
+    for source in _query_sources(conn, sql):
+        text, literals = _strip_literals(source)
+        aliases = {}
+        for table, alias in TABLE_REF.findall(text):
+            if alias and alias.upper() not in SQL_KEYWORDS:
+                aliases[alias] = table
+            aliases.setdefault(table, table)
+
+        for name in scanned:
+            table = aliases.get(name)
+            if table is None:
+                continue
+            columns = _table_columns(conn, table)
+            if not columns:
+                continue
+            alias = name
+            equality, ranges, partial = [], [], []
+            conditions = _clause(r"\bWHERE\b", text) + _clause(r"\bON\b", text)
+            for condition in re.split(r"\bAND\b", " AND ".join(conditions), flags=re.IGNORECASE):
+                condition = condition.strip()
+                refs = _column_refs(condition, alias, columns)
+                if not refs:
+                    continue
+                column = refs[0]
+                constant = re.search(r"(__lit\d+__|\b\d+\b|\bNULL\b)", condition, re.IGNORECASE)
+                if re.search(r"!=|<>|\bIS\s+NOT\b", condition, re.IGNORECASE) and constant:
+                    partial.append(_restore_literals(
+                        re.sub(r"\b\w+\.(?=\w)", "", condition), literals))
+                elif re.search(r"(?<![<>!])=|\bIN\b|\bIS\b", condition, re.IGNORECASE):
+                    equality.append(column)
+                elif re.search(r"<|>|\bBETWEEN\b|\bLIKE\b", condition, re.IGNORECASE):
+                    ranges.append(column)
+
+            order = []
+            for clause in _clause(r"\bORDER\s+BY\b", text):
+                order.extend(_column_refs(clause, alias, columns))
+
+            key = list(dict.fromkeys(equality))
+            if ranges:
+                key += [c for c in ranges[:1] if c not in key]
+            elif order and (needs_order or not key):
+                key += [c for c in order if c not in key]
+            if not key:
+                continue
+
+            select_cols = []
+            head = re.match(r"\s*SELECT\s+(.*?)\s+FROM\b", text, re.IGNORECASE | re.DOTALL)
+            if head and '*' not in head.group(1):
+                select_cols = [c for c in _column_refs(head.group(1), alias, columns)
+                               if c not in key]
+            if select_cols and len(select_cols) <= MAX_COVERING_COLUMNS:
+                key += select_cols
+
+            where = f" WHERE {' AND '.join(dict.fromkeys(partial))}" if partial else ""
+            index_name = "idx_auto_" + table + "_" + "_".join(key[:3])
+            statement = (f"CREATE INDEX IF NOT EXISTS {index_name} "
+                         f"ON {table}({', '.join(key)}){where}")
+            if statement not in suggestions:
+                suggestions.append(statement)
+    return suggestions
+
+
+def compare_with_indexes(db_path, sql, index_statements, repeat=5):
+    """
+    Mide la query en una copia temporal antes y después de crear los índices.
+
+    Returns:
+        dict {'before': {...}, 'after': {...}} con 'plan', 'issues' y tiempos
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = connect(copy_database(db_path, os.path.join(tmp, 'scratch.db')), 'tuned')
+        try:
+            before = {'plan': explain(conn, sql), **time_query(conn, sql, repeat=repeat)}
+            before['issues'] = find_issues(before['plan'])
+            start = time.perf_counter()
+            for statement in index_statements:
+                conn.execute(statement)
+                name = re.search(r"INDEX\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", statement,
+                                 re.IGNORECASE).group(1)
+                conn.execute(f"ANALYZE {name}")
+            conn.commit()
+            build_seconds = time.perf_counter() - start
+            after = {'plan': explain(conn, sql), **time_query(conn, sql, repeat=repeat)}
+            after['issues'] = find_issues(after['plan'])
+        finally:
+            conn.close()
+    return {'before': before, 'after': after, 'index_build_seconds': round(build_seconds, 3)}
+
+
+ISSUE_LABELS = {
+    'SCAN': "🔴 Recorrido completo de tabla",
+    'SCAN_INDEX': "🟠 Recorrido completo por índice",
+    'TEMP_BTREE': "🟠 B-tree temporal",
+    'AUTO_INDEX': "🟠 Índice automático (temporal)",
+}
+
+
+def print_plan(plan):
+    depth = {0: -1}
+    for node_id, parent, detail in plan:
+        depth[node_id] = depth.get(parent, -1) + 1
+        print(f"   {'  ' * depth[node_id]}• {detail}")
+
+
+def profile(conn, sql, db_path=None, repeat=5, compare=True):
+    """Perfil completo de una query con salida por pantalla (ValueError si no es de lectura)"""
+    if not is_read_only(conn, sql):
+        raise ValueError("solo se pueden perfilar consultas de lectura (SELECT)")
+    plan = explain(conn, sql)
+    print("\n🧭 Plan de ejecución:")
+    print_plan(plan)
+
+    issues = find_issues(plan)
+    if issues:
+        print("\n⚠️  Pasos costosos:")
+        for kind, detail in issues:
+            print(f"   {ISSUE_LABELS[kind]}: {detail}")
+    else:
+        print("\n✅ Sin recorridos completos ni B-trees temporales")
+
+    timing = time_query(conn, sql, repeat=repeat)
+    print(f"\n⏱️  {repeat} ejecuciones, {timing['rows']} filas: p50 {timing['p50_ms']:.3f} ms "
+          f"(mín {timing['min_ms']:.3f}, máx {timing['max_ms']:.3f})")
+
+    suggestions = suggest_indexes(conn, sql) if issues else []
+    if not suggestions:
+        return {'plan': plan, 'issues': issues, 'timing': timing, 'suggestions': []}
+    print("\n💡 Índices sugeridos:")
+    for statement in suggestions:
+        print(f"   {statement};")
+
+    result = {'plan': plan, 'issues': issues, 'timing': timing, 'suggestions': suggestions}
+    if compare and db_path:
+        print("\n🧪 Midiendo en una copia temporal...")
+        comparison = compare_with_indexes(db_path, sql, suggestions, repeat)
+        before, after = comparison['before'], comparison['after']
+        speedup = before['p50_ms'] / after['p50_ms'] if after['p50_ms'] else 0.0
+        print(f"   Antes:   p50 {before['p50_ms']:.3f} ms, {len(before['issues'])} pasos costosos")
+        print(f"   Después: p50 {after['p50_ms']:.3f} ms, {len(after['issues'])} pasos costosos "
+              f"(x{speedup:.1f}; índices creados en {comparison['index_build_seconds']:.2f}s)")
+        print_plan(after['plan'])
+        result['comparison'] = comparison
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perfilador de queries y asesor de índices")
+    parser.add_argument('sql', help="Query a perfilar")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Ruta de la base de datos")
+    parser.add_argument('--repeticiones', type=int, default=5, help="Ejecuciones cronometradas")
+    parser.add_argument('--sin-comparar', action='store_true',
+                        help="No medir los índices sugeridos en una copia")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ Error: No existe {args.db}")
+        return 1
+
+    conn = connect(args.db, 'readonly', readonly=True)
+    try:
+        profile(conn, args.sql, args.db, args.repeticiones, not args.sin_comparar)
+    except sqlite3.Error as e:
+        print(f"\n❌ Error de SQLite: {e}")
+        return 1
+    except ValueError as e:
+        print(f"\n❌ Error: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
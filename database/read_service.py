@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Servicio asíncrono de lecturas para dashboards
+ReadService expone como corrutinas el resumen, las tareas, el progreso de
+badges y las estadísticas de un usuario:
+  - las consultas se ejecutan en un pool de hilos acotado, cada uno con su
+    conexión de lectura (ConnectionManager de db_connection.py)
+  - las peticiones idénticas simultáneas se agrupan en una sola consulta
+  - los resultados se cachean (LRU) hasta que la base de datos cambia:
+    PRAGMA data_version detecta los commits de cualquier otra conexión o
+    proceso y vacía la caché; las escrituras hechas con write() solo
+    invalidan las entradas de su usuario
+  - serve() los publica como JSON por HTTP (GET /users/<id>/<recurso>)
+
+Incluye un benchmark de peticiones de dashboard por segundo frente a las
+consultas directas sin caché.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from db_connection import ConnectionManager, connect
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, 'task_gamification.db')
+
+DEFAULT_PORT = 8766
+CACHE_SIZE = 10000
+
+QUERIES = {
+    'summary': "SELECT * FROM v_user_summary_fast WHERE id = ?",
+    'tasks': """
+        SELECT id, title, category, priority, status, due_date, xp_reward
+        FROM tasks
+        WHERE user_id = ?1 AND (?2 IS NULL OR status = ?2)
+        ORDER BY due_date, id
+        LIMIT ?3
+    """,
+    'badges': """
+        SELECT badge_key, name, requirement_type, requirement_value, progress,
+               is_unlocked, unlocked_at, progress_percentage
+        FROM v_badge_progress WHERE user_id = ?
+        ORDER BY is_unlocked DESC, progress_percentage DESC
+    """,
+    'stats': """
+        SELECT stat_date, tasks_completed, xp_earned, study_minutes, streak_active
+        FROM daily_stats
+        WHERE user_id = ? AND stat_date >= DATE('now', ?)
+        ORDER BY stat_date
+    """,
+}
+
+# Consultas de los dashboards actuales: vistas calculadas en cada petición
+DIRECT_QUERIES = {
+    'summary': "SELECT * FROM v_user_summary WHERE id = ?",
+    'tasks': QUERIES['tasks'],
+    'badges': "SELECT * FROM v_badge_progress WHERE user_id = ?",
+    'stats': QUERIES['stats'],
+}
+
+
+def _rows(cursor):
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+class ReadService:
+    """
+    Lecturas asíncronas con agrupación de peticiones y caché.
+
+    Uso (dentro de un bucle asyncio):
+        service = ReadService(db_path)
+        dashboard = await service.dashboard(user_id)
+        await service.write(user_id, lambda conn: conn.execute("UPDATE ..."))
+        service.close()
+    """
+
+    def __init__(self, db_path=DEFAULT_DB, workers=4, cache_size=CACHE_SIZE):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self._manager = ConnectionManager(db_path, 'tuned', readers=workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='lectura')
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._generation = 0
+        self._user_generation = {}
+        # data_version de una conexión solo cambia con los commits de OTRAS
+        # conexiones: usando la de escritura, las escrituras propias no
+        # vacían la caché (ya invalidan las entradas de su usuario)
+        self._writer = connect(db_path, 'tuned', check_same_thread=False, isolation_level=None)
+        self._write_lock = threading.Lock()
+        self._data_version = self._read_data_version()
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'flushes': 0}
+
+    def _read_data_version(self):
+        return self._writer.execute("PRAGMA data_version").fetchone()[0]
+
+    def _check_data_version(self):
+        """
+        Vacía la caché si otra conexión ha hecho commit. Devuelve False si
+        hay una escritura propia en curso (la caché no es fiable hasta que
+        termine).
+        """
+        if not self._write_lock.acquire(blocking=False):
+            return False
+        try:
+            version = self._read_data_version()
+        finally:
+            self._write_lock.release()
+        if version != self._data_version:
+            self._data_version = version
+            self.invalidate()
+        return True
+
+    def invalidate(self, user_id=None):
+        """Hook de escritura: descarta la caché de un usuario (o toda)"""
+        if user_id is None:
+            self._cache.clear()
+            self._generation += 1
+            self.stats['flushes'] += 1
+            return
+        self._user_generation[user_id] = self._user_generation.get(user_id, 0) + 1
+        for key in [key for key in self._cache if key[1] == user_id]:
+            del self._cache[key]
+
+    def _run_query(self, sql, params):
+        with self._manager.reader() as conn:
+            return _rows(conn.execute(sql, params))
+
+    async def _query(self, kind, user_id, *params):
+        key = (kind, user_id, *params)
+        cacheable = self.cache_size > 0 and self._check_data_version()
+        if cacheable and key in self._cache:
+            self._cache.move_to_end(key)
+            self.stats['hits'] += 1
+            return self._cache[key]
+        if key in self._inflight:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(self._inflight[key])
+
+        self.stats['misses'] += 1
+        generation = (self._generation, self._user_generation.get(user_id, 0))
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._run_query,
+                                      QUERIES[kind], (user_id, *params))
+        self._inflight[key] = future
+        try:
+            result = await future
+        finally:
+            del self._inflight[key]
+        # No guardar resultados leídos antes de una invalidación
+        if cacheable and generation == (self._generation, self._user_generation.get(user_id, 0)):
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    async def user_summary(self, user_id):
+        rows = await self._query('summary', user_id)
+        return rows[0] if rows else None
+
+    async def tasks(self, user_id, status=None, limit=50):
+        return await self._query('tasks', user_id, status, limit)
+
+    async def badge_progress(self, user_id):
+        return await self._query('badges', user_id)
+
+    async def stats_history(self, user_id, days=7):
+        return await self._query('stats', user_id, f"-{days} days")
+
+    async def dashboard(self, user_id):
+        """Las cuatro lecturas de un dashboard en paralelo"""
+        summary, tasks, badges, stats = await asyncio.gather(
+            self.user_summary(user_id), self.tasks(user_id, 'PENDING', 10),
+            self.badge_progress(user_id), self.stats_history(user_id))
+        return {'summary': summary, 'tasks': tasks, 'badges': badges, 'stats': stats}
+
+    def _run_write(self, func):
+        with self._write_lock:
+            self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self._writer)
+                self._writer.execute("COMMIT")
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+        return result
+
+    async def write(self, user_id, func):
+        """
+        Ejecuta func(conn) en una transacción de escritura e invalida la
+        caché del usuario. Devuelve el resultado de func.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, self._run_write, func)
+        finally:
+            self.invalidate(user_id)
+
+    def close(self):
+        self._executor.shutdown()
+        self._manager.close()
+        self._writer.close()
+
+
+ROUTES = {
+    'summary': lambda service, user_id, query: service.user_summary(user_id),
+    'tasks': lambda service, user_id, query: service.tasks(
+        user_id, query.get('status'), int(query.get('limit', 50))),
+    'badges': lambda service, user_id, query: service.badge_progress(user_id),
+    'stats': lambda service, user_id, query: service.stats_history(
+        user_id, int(query.get('days', 7))),
+    'dashboard': lambda service, user_id, query: service.dashboard(user_id),
+}
+
+
+async def _handle_request(service, method, target):
+    """(código HTTP, cuerpo) de GET /users/<id>/<recurso>?param=valor"""
+    url = urlsplit(target)
+    parts = url.path.strip('/').split('/')
+    if method != 'GET':
+        return 405, {'error': 'Solo GET'}
+    if len(parts) != 3 or parts[0] != 'users' or not parts[1].isdigit() or parts[2] not in ROUTES:
+        return 404, {'error': 'Ruta no encontrada', 'routes': sorted(ROUTES)}
+    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    try:
+        result = await ROUTES[parts[2]](service, int(parts[1]), query)
+    except ValueError as e:
+        return 400, {'error': str(e)}
+    except sqlite3.Error as e:
+        # BD bloqueada, esquema antiguo, disco lleno...: la conexión sigue viva
+        return 500, {'error': f"Error de SQLite: {e}"}
+    if result is None:
+        return 404, {'error': 'Usuario no encontrado'}
+    return 200, result
+
+
+async def _handle_connection(service, reader, writer):
+    """HTTP/1.1 mínimo con keep-alive"""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            keep_alive = True
+            while True:
+                header = await reader.readline()
+                if header in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = header.decode('latin-1').partition(':')
+                if name.strip().lower() == 'connection' and value.strip().lower() == 'close':
+                    keep_alive = False
+            try:
+                method, target, _ = request_line.decode('latin-1').split()
+                status, body = await _handle_request(service, method, target)
+            except ValueError:
+                status, body = 400, {'error': 'Petición mal formada'}
+            payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            writer.write(
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1')
+                + payload)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service, host='127.0.0.1', port=DEFAULT_PORT):
+    """Arranca el servidor HTTP; devuelve el asyncio.Server"""
+    return await asyncio.start_server(
+        lambda reader, writer: _handle_connection(service, reader, writer), host, port)
+
+
+def _direct_dashboard(db_path, user_id):
+    """Un dashboard como hoy: conexión propia y vistas sin caché"""
+    conn = connect(db_path, 'readonly', readonly=True)
+    try:
+        return {
+            'summary': _rows(conn.execute(DIRECT_QUERIES['summary'], (user_id,))),
+            'tasks': _rows(conn.execute(DIRECT_QUERIES['tasks'], (user_id, 'PENDING', 10))),
+            'badges': _rows(conn.execute(DIRECT_QUERIES['badges'], (user_id,))),
+            'stats': _rows(conn.execute(DIRECT_QUERIES['stats'], (user_id, '-7 days'))),
+        }
+    finally:
+        conn.close()
+
+
+async def _load(handler, user_ids, requests, concurrency, seed):
+    """Lanza `requests` dashboards con `concurrency` clientes; devuelve peticiones/s"""
+    rng = random.Random(seed)
+    targets = [rng.choice(user_ids) for _ in range(requests)]
+    position = 0
+
+    async def client():
+        nonlocal position
+        while position < len(targets):
+            user_id = targets[position]
+            position += 1
+            await handler(user_id)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - start)
+
+
+async def _benchmark(db_path, requests, concurrency, hot_users, workers, writes_per_s, seed):
+    conn = connect(db_path, 'readonly', readonly=True)
+    user_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM users ORDER BY id LIMIT ?", (hot_users,))]
+    conn.close()
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    loop = asyncio.get_running_loop()
+    direct = await _load(
+        lambda user_id: loop.run_in_executor(executor, _direct_dashboard, db_path, user_id),
+        user_ids, requests, concurrency, seed)
+    executor.shutdown()
+
+    results = {'direct_rps': round(direct)}
+    for name, cache_size in (('uncached_rps', 0), ('cached_rps', CACHE_SIZE)):
+        service = ReadService(db_path, workers, cache_size)
+        stop = asyncio.Event()
+
+        async def writer():
+            # Escrituras concurrentes de otra conexión: fuerzan vaciados por data_version
+            other = connect(db_path, 'tuned', isolation_level=None)
+            rng = random.Random(seed)
+            try:
+                while not stop.is_set():
+                    other.execute("UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?",
+                                  (rng.choice(user_ids),))
+                    await asyncio.sleep(1 / writes_per_s)
+            finally:
+                other.close()
+
+        background = asyncio.create_task(writer()) if writes_per_s else None
+        results[name] = round(await _load(service.dashboard, user_ids, requests,
+                                          concurrency, seed))
+        stop.set()
+        if background:
+            await background
+        if cache_size:
+            results['stats'] = dict(service.stats)
+        service.close()
+    results['speedup'] = round(results['cached_rps'] / results['direct_rps'], 1)
+    return results
+
+
+def benchmark(db_path, requests=5000, concurrency=50, hot_users=200, workers=4,
+              writes_per_s=0, seed=42):
+    """
+    Dashboards por segundo con `concurrency` clientes simultáneos sobre
+    `hot_users` usuarios: consultas directas (conexión y vistas por
+    petición), ReadService sin caché y con caché. Con writes_per_s, otra
+    conexión escribe en paralelo y la caché se vacía con cada commit.
+
+    Returns:
+        dict {'direct_rps', 'uncached_rps', 'cached_rps', 'speedup', 'stats'}
+    """
+    return asyncio.run(_benchmark(db_path, requests, concurrency, hot_users, workers,
+                                  writes_per_s, seed))
+
+
+async def _serve_forever(db_path, host, port, workers):
+    service = ReadService(db_path, workers)
+    server = await serve(service, host, port)
+    print(f"🌐 Sirviendo en http://{host}:{port}/users/<id>/"
+          f"{{{','.join(sorted(ROUTES))}}} (Ctrl+C para salir)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio asíncrono de lecturas con caché")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Ruta de la base de datos")
+    parser.add_argument('--host', default='127.0.0.1', help="Dirección del servidor HTTP")
+    parser.add_argument('--puerto', type=int, default=DEFAULT_PORT, help="Puerto del servidor HTTP")
+    parser.add_argument('--hilos', type=int, default=4, help="Hilos (y conexiones) de lectura")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="Dashboards por segundo: directo vs servicio")
+    parser.add_argument('--peticiones', type=int, default=5000, help="Peticiones del benchmark")
+    parser.add_argument('--clientes', type=int, default=50, help="Clientes simultáneos")
+    parser.add_argument('--escrituras', type=float, default=0,
+                        help="Escrituras por segundo de otra conexión durante el benchmark")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ Error: No existe {args.db}")
+        return 1
+
+    try:
+        if args.benchmark:
+            print(f"🏁 Dashboards por segundo ({args.clientes} clientes, {args.peticiones:,} "
+                  f"peticiones, {args.hilos} hilos, {args.escrituras:g} escrituras/s)")
+            r = benchmark(args.db, args.peticiones, args.clientes, workers=args.hilos,
+                          writes_per_s=args.escrituras)
+            print(f"   • Directo (vistas sin caché): {r['direct_rps']:>8,}/s")
+            print(f"   • Servicio sin caché:         {r['uncached_rps']:>8,}/s")
+            print(f"   • Servicio con caché:         {r['cached_rps']:>8,}/s  (x{r['speedup']})")
+            s = r['stats']
+            print(f"   Caché: {s['hits']:,} aciertos, {s['misses']:,} consultas, "
+                  f"{s['coalesced']:,} agrupadas, {s['flushes']:,} vaciados")
+        else:
+            asyncio.run(_serve_forever(args.db, args.host, args.puerto, args.hilos))
+    except KeyboardInterrupt:
+        pass
+    except sqlite3.Error as e:
+        print(f"\n❌ Error de SQLite: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -176,6 +176,7 @@ CREATE TABLE IF NOT EXISTS daily_stats (
 -- Índices para daily_stats
 CREATE INDEX IF NOT EXISTS idx_daily_stats_user ON daily_stats(user_id);
 CREATE INDEX IF NOT EXISTS idx_daily_stats_date ON daily_stats(user_id, stat_date DESC);
+CREATE INDEX IF NOT EXISTS idx_daily_stats_day ON daily_stats(stat_date);
 
 -- ============================================
 -- TABLA: activity_log
@@ -205,6 +206,25 @@ CREATE INDEX IF NOT EXISTS idx_activity_user ON activity_log(user_id);
 CREATE INDEX IF NOT EXISTS idx_activity_type ON activity_log(activity_type);
 CREATE INDEX IF NOT EXISTS idx_activity_date ON activity_log(user_id, created_at DESC);
 
+-- ============================================
+-- TABLA: activity_daily
+-- Resumen por usuario/día/tipo de las actividades ya archivadas. Las filas
+-- originales se mueven a la BD de archivo (activity_archive.py) para que
+-- activity_log solo contenga el historial reciente.
+-- ============================================
+CREATE TABLE IF NOT EXISTS activity_daily (
+    user_id INTEGER NOT NULL,
+    activity_date DATE NOT NULL,
+    activity_type TEXT NOT NULL,
+    events INTEGER NOT NULL DEFAULT 0,
+    xp_change INTEGER NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (user_id, activity_date, activity_type),
+
+    -- Relación con usuario
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
 -- ============================================
 -- TABLA: app_settings
 -- Configuración global de la aplicación
@@ -239,6 +259,8 @@ CREATE TABLE IF NOT EXISTS sync_queue (
     error_message TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     synced_at TIMESTAMP,
+    claimed_at TIMESTAMP, -- Inicio del envío en curso (IN_PROGRESS)
+    next_attempt_at TIMESTAMP, -- No reintentar antes de esta hora (backoff)
     
     -- Relación con usuario
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
@@ -249,14 +271,82 @@ CREATE INDEX IF NOT EXISTS idx_sync_user ON sync_queue(user_id);
 CREATE INDEX IF NOT EXISTS idx_sync_status ON sync_queue(sync_status);
 CREATE INDEX IF NOT EXISTS idx_sync_pending ON sync_queue(user_id, sync_status, created_at);
 
+-- ============================================
+-- TABLA: user_summary
+-- Resumen materializado por usuario (reemplaza las subconsultas
+-- correlacionadas de v_user_summary). Se mantiene con deltas desde los
+-- triggers de tasks, user_badges y daily_stats.
+-- ============================================
+CREATE TABLE IF NOT EXISTS user_summary (
+    user_id INTEGER PRIMARY KEY,
+    pending_tasks INTEGER NOT NULL DEFAULT 0,
+    overdue_tasks INTEGER NOT NULL DEFAULT 0,
+    badges_unlocked INTEGER NOT NULL DEFAULT 0,
+    xp_last_week INTEGER NOT NULL DEFAULT 0,
+    xp_window_date DATE, -- Día para el que xp_last_week es válido
+    
+    -- Relación con usuario
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- ============================================
+-- TABLA: leaderboard_scores
+-- Puntuaciones persistidas de los rankings (global, semanal y por
+-- categoría). La mantiene leaderboard.py; board identifica el ranking
+-- ('global', 'weekly:YYYY-MM-DD' con el lunes de la semana, 'category:STUDY')
+-- ============================================
+CREATE TABLE IF NOT EXISTS leaderboard_scores (
+    board TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    score INTEGER NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (board, user_id),
+
+    -- Relación con usuario
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+-- Orden del ranking: carga en orden sin ordenar en memoria
+CREATE INDEX IF NOT EXISTS idx_leaderboard_rank ON leaderboard_scores(board, score DESC, user_id);
+
+-- ============================================
+-- TABLAS FTS5: Búsqueda de texto completo (search.py)
+-- Índices de contenido externo: el texto vive en tasks/study_sessions y
+-- los triggers de abajo mantienen el índice. Sin tildes ni mayúsculas
+-- (remove_diacritics) y con índices de prefijo de 2 y 3 caracteres.
+-- ============================================
+CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+    title,
+    description,
+    content='tasks',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS sessions_fts USING fts5(
+    subject,
+    description,
+    notes,
+    content='study_sessions',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
 -- ============================================
 -- TRIGGERS: Actualizar timestamps automáticamente
 -- ============================================
+-- Los triggers con WHEN NOT EXISTS (... 'bypass_triggers') no se disparan
+-- mientras existe esa fila de app_settings: triggers_bypassed() de
+-- db_connection.py la escribe y la borra dentro de una misma transacción
+-- (bulk_tasks.py, integrity.py), así que ninguna otra conexión la ve
 
 -- Trigger para users
 CREATE TRIGGER IF NOT EXISTS update_users_timestamp 
 AFTER UPDATE ON users
 FOR EACH ROW
+WHEN NOT EXISTS (SELECT 1 FROM app_settings WHERE setting_key = 'bypass_triggers')
 BEGIN
     UPDATE users SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
 END;
@@ -265,6 +355,7 @@ END;
 CREATE TRIGGER IF NOT EXISTS update_tasks_timestamp 
 AFTER UPDATE ON tasks
 FOR EACH ROW
+WHEN NOT EXISTS (SELECT 1 FROM app_settings WHERE setting_key = 'bypass_triggers')
 BEGIN
     UPDATE tasks SET updated_at = CURRENT_TIMESTAMP WHERE id = OLD.id;
 END;
@@ -286,6 +377,7 @@ CREATE TRIGGER IF NOT EXISTS task_completed_stats
 AFTER UPDATE ON tasks
 FOR EACH ROW
 WHEN NEW.status = 'COMPLETED' AND OLD.status != 'COMPLETED'
+    AND NOT EXISTS (SELECT 1 FROM app_settings WHERE setting_key = 'bypass_triggers')
 BEGIN
     -- Actualizar contador de usuario
     UPDATE users 
@@ -319,6 +411,7 @@ CREATE TRIGGER IF NOT EXISTS check_level_up
 AFTER UPDATE ON users
 FOR EACH ROW
 WHEN NEW.current_xp != OLD.current_xp
+    AND NOT EXISTS (SELECT 1 FROM app_settings WHERE setting_key = 'bypass_triggers')
 BEGIN
     -- Calcular nuevo nivel (100 XP por nivel)
     UPDATE users
@@ -335,6 +428,191 @@ BEGIN
     WHERE (NEW.current_xp / 100) + 1 > OLD.level;
 END;
 
+-- ============================================
+-- TRIGGERS: Mantenimiento incremental de user_summary
+-- ============================================
+
+CREATE TRIGGER IF NOT EXISTS summary_user_insert
+AFTER INSERT ON users
+FOR EACH ROW
+BEGIN
+    INSERT OR IGNORE INTO user_summary (user_id) VALUES (NEW.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS summary_user_delete
+AFTER DELETE ON users
+FOR EACH ROW
+BEGIN
+    DELETE FROM user_summary WHERE user_id = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS summary_task_insert
+AFTER INSERT ON tasks
+FOR EACH ROW
+WHEN NEW.status IN ('PENDING', 'OVERDUE')
+BEGIN
+    INSERT INTO user_summary (user_id, pending_tasks, overdue_tasks)
+    VALUES (NEW.user_id, NEW.status = 'PENDING', NEW.status = 'OVERDUE')
+    ON CONFLICT(user_id) DO UPDATE SET
+        pending_tasks = pending_tasks + excluded.pending_tasks,
+        overdue_tasks = overdue_tasks + excluded.overdue_tasks;
+END;
+
+CREATE TRIGGER IF NOT EXISTS summary_task_update
+AFTER UPDATE OF status, user_id ON tasks
+FOR EACH ROW
+WHEN (OLD.status != NEW.status OR OLD.user_id != NEW.user_id)
+    AND NOT EXISTS (SELECT 1 FROM app_settings WHERE setting_key = 'bypass_triggers')
+BEGIN
+    UPDATE user_summary
+    SET pending_tasks = pending_tasks - (OLD.status = 'PENDING'),
+        overdue_tasks = overdue_tasks - (OLD.status = 'OVERDUE')
+    WHERE user_id = OLD.user_id;
+    
+    INSERT INTO user_summary (user_id, pending_tasks, overdue_tasks)
+    VALUES (NEW.user_id, NEW.status = 'PENDING', NEW.status = 'OVERDUE')
+    ON CONFLICT(user_id) DO UPDATE SET
+        pending_tasks = pending_tasks + excluded.pending_tasks,
+        overdue_tasks = overdue_tasks + excluded.overdue_tasks;
+END;
+
+CREATE TRIGGER IF NOT EXISTS summary_task_delete
+AFTER DELETE ON tasks
+FOR EACH ROW
+WHEN OLD.status IN ('PENDING', 'OVERDUE')
+BEGIN
+    UPDATE user_summary
+    SET pending_tasks = pending_tasks - (OLD.status = 'PENDING'),
+        overdue_tasks = overdue_tasks - (OLD.status = 'OVERDUE')
+    WHERE user_id = OLD.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS summary_badge_insert
+AFTER INSERT ON user_badges
+FOR EACH ROW
+WHEN NEW.is_unlocked = 1
+BEGIN
+    INSERT INTO user_summary (user_id, badges_unlocked)
+    VALUES (NEW.user_id, 1)
+    ON CONFLICT(user_id) DO UPDATE SET
+        badges_unlocked = badges_unlocked + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS summary_badge_update
+AFTER UPDATE OF is_unlocked, user_id ON user_badges
+FOR EACH ROW
+WHEN OLD.is_unlocked != NEW.is_unlocked OR OLD.user_id != NEW.user_id
+BEGIN
+    UPDATE user_summary
+    SET badges_unlocked = badges_unlocked - OLD.is_unlocked
+    WHERE user_id = OLD.user_id;
+    
+    INSERT INTO user_summary (user_id, badges_unlocked)
+    VALUES (NEW.user_id, NEW.is_unlocked)
+    ON CONFLICT(user_id) DO UPDATE SET
+        badges_unlocked = badges_unlocked + excluded.badges_unlocked;
+END;
+
+CREATE TRIGGER IF NOT EXISTS summary_badge_delete
+AFTER DELETE ON user_badges
+FOR EACH ROW
+WHEN OLD.is_unlocked = 1
+BEGIN
+    UPDATE user_summary
+    SET badges_unlocked = badges_unlocked - 1
+    WHERE user_id = OLD.user_id;
+END;
+
+-- La ventana de 7 días solo se ajusta si el valor guardado corresponde a
+-- hoy; si no, queda obsoleta y v_user_summary_fast la recalcula al leer
+CREATE TRIGGER IF NOT EXISTS summary_daily_insert
+AFTER INSERT ON daily_stats
+FOR EACH ROW
+WHEN NEW.stat_date >= DATE('now', '-7 days')
+BEGIN
+    UPDATE user_summary
+    SET xp_last_week = xp_last_week + NEW.xp_earned
+    WHERE user_id = NEW.user_id AND xp_window_date = DATE('now');
+END;
+
+CREATE TRIGGER IF NOT EXISTS summary_daily_update
+AFTER UPDATE OF xp_earned, stat_date ON daily_stats
+FOR EACH ROW
+BEGIN
+    UPDATE user_summary
+    SET xp_last_week = xp_last_week
+        - CASE WHEN OLD.stat_date >= DATE('now', '-7 days') THEN OLD.xp_earned ELSE 0 END
+        + CASE WHEN NEW.stat_date >= DATE('now', '-7 days') THEN NEW.xp_earned ELSE 0 END
+    WHERE user_id = NEW.user_id AND xp_window_date = DATE('now');
+END;
+
+CREATE TRIGGER IF NOT EXISTS summary_daily_delete
+AFTER DELETE ON daily_stats
+FOR EACH ROW
+WHEN OLD.stat_date >= DATE('now', '-7 days')
+BEGIN
+    UPDATE user_summary
+    SET xp_last_week = xp_last_week - OLD.xp_earned
+    WHERE user_id = OLD.user_id AND xp_window_date = DATE('now');
+END;
+
+-- ============================================
+-- TRIGGERS: Índices de texto completo (tasks_fts, sessions_fts)
+-- Solo se disparan si cambia el texto indexado
+-- ============================================
+
+CREATE TRIGGER IF NOT EXISTS tasks_fts_insert
+AFTER INSERT ON tasks
+FOR EACH ROW
+BEGIN
+    INSERT INTO tasks_fts (rowid, title, description)
+    VALUES (NEW.id, NEW.title, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tasks_fts_delete
+AFTER DELETE ON tasks
+FOR EACH ROW
+BEGIN
+    INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+    VALUES ('delete', OLD.id, OLD.title, OLD.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tasks_fts_update
+AFTER UPDATE OF title, description ON tasks
+FOR EACH ROW
+BEGIN
+    INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+    VALUES ('delete', OLD.id, OLD.title, OLD.description);
+    INSERT INTO tasks_fts (rowid, title, description)
+    VALUES (NEW.id, NEW.title, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS sessions_fts_insert
+AFTER INSERT ON study_sessions
+FOR EACH ROW
+BEGIN
+    INSERT INTO sessions_fts (rowid, subject, description, notes)
+    VALUES (NEW.id, NEW.subject, NEW.description, NEW.notes);
+END;
+
+CREATE TRIGGER IF NOT EXISTS sessions_fts_delete
+AFTER DELETE ON study_sessions
+FOR EACH ROW
+BEGIN
+    INSERT INTO sessions_fts (sessions_fts, rowid, subject, description, notes)
+    VALUES ('delete', OLD.id, OLD.subject, OLD.description, OLD.notes);
+END;
+
+CREATE TRIGGER IF NOT EXISTS sessions_fts_update
+AFTER UPDATE OF subject, description, notes ON study_sessions
+FOR EACH ROW
+BEGIN
+    INSERT INTO sessions_fts (sessions_fts, rowid, subject, description, notes)
+    VALUES ('delete', OLD.id, OLD.subject, OLD.description, OLD.notes);
+    INSERT INTO sessions_fts (rowid, subject, description, notes)
+    VALUES (NEW.id, NEW.subject, NEW.description, NEW.notes);
+END;
+
 -- ============================================
 -- DATOS INICIALES: Badges predefinidos
 -- ============================================
@@ -365,7 +643,7 @@ INSERT OR IGNORE INTO badges (badge_key, name, description, icon_name, requireme
 -- ============================================
 
 INSERT OR IGNORE INTO app_settings (setting_key, setting_value, setting_type, description) VALUES
-('db_version', '1.0', 'STRING', 'Versión del esquema de base de datos'),
+('db_version', '1.4', 'STRING', 'Versión del esquema de base de datos'),
 ('xp_per_level', '100', 'INTEGER', 'XP necesarios para subir de nivel'),
 ('default_task_xp', '10', 'INTEGER', 'XP por defecto para tareas nuevas'),
 ('streak_reset_hours', '24', 'INTEGER', 'Horas sin actividad antes de perder racha'),
@@ -373,7 +651,8 @@ INSERT OR IGNORE INTO app_settings (setting_key, setting_value, setting_type, de
 ('enable_calendar_sync', 'true', 'BOOLEAN', 'Sincronización con calendario habilitada'),
 ('theme_mode', 'auto', 'STRING', 'Modo de tema: light, dark, auto'),
 ('last_backup', '', 'STRING', 'Última fecha de backup'),
-('sync_enabled', 'false', 'BOOLEAN', 'Sincronización cloud habilitada');
+('sync_enabled', 'false', 'BOOLEAN', 'Sincronización cloud habilitada'),
+('activity_retention_days', '90', 'INTEGER', 'Días de activity_log antes de archivarse');
 
 -- ============================================
 -- VIEWS: Consultas frecuentes optimizadas
@@ -401,6 +680,32 @@ FROM users u
 LEFT JOIN user_badges ub ON u.id = ub.user_id AND ub.is_unlocked = 1
 GROUP BY u.id;
 
+-- Vista: Resumen del usuario desde user_summary (lectura O(1) por usuario)
+-- Mismas columnas que v_user_summary; si la ventana de XP no es de hoy se
+-- recalcula sobre como máximo 8 filas de daily_stats
+CREATE VIEW IF NOT EXISTS v_user_summary_fast AS
+SELECT 
+    u.id,
+    u.uuid,
+    u.name,
+    u.email,
+    u.current_xp,
+    u.level,
+    u.current_streak,
+    u.longest_streak,
+    u.tasks_completed,
+    COALESCE(s.badges_unlocked, 0) as badges_unlocked,
+    COALESCE(s.pending_tasks, 0) as pending_tasks,
+    COALESCE(s.overdue_tasks, 0) as overdue_tasks,
+    CASE 
+        WHEN s.xp_window_date = DATE('now') THEN s.xp_last_week
+        ELSE (SELECT SUM(xp_earned) FROM daily_stats ds WHERE ds.user_id = u.id AND ds.stat_date >= DATE('now', '-7 days'))
+    END as xp_last_week,
+    u.created_at,
+    u.last_login
+FROM users u
+LEFT JOIN user_summary s ON s.user_id = u.id;
+
 -- Vista: Tareas con información enriquecida
 CREATE VIEW IF NOT EXISTS v_tasks_enriched AS
 SELECT 
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Búsqueda de texto completo en tareas y sesiones de estudio
+Usa las tablas FTS5 de contenido externo tasks_fts y sessions_fts
+(schema.sql), que los triggers mantienen al insertar, editar o borrar:
+  - resultados ordenados por bm25 (el título/asunto pesa más que el resto)
+  - búsqueda por prefijo de cada palabra ("ejerc" encuentra "ejercicios")
+  - filtros por usuario y estado y fragmento con los términos resaltados
+
+También reconstruye los índices en bloque (tras cargas masivas sin
+triggers) y compara la búsqueda FTS5 con el LIKE '%texto%' equivalente.
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import time
+
+from db_connection import DEFAULT_DB, connect
+
+DEFAULT_LIMIT = 20
+
+# (tabla FTS, tabla de contenido, columnas indexadas, pesos bm25)
+INDEXES = {
+    'tasks': ('tasks_fts', 'tasks', ('title', 'description'), (5.0, 1.0)),
+    'sessions': ('sessions_fts', 'study_sessions', ('subject', 'description', 'notes'),
+                 (5.0, 1.0, 1.0)),
+}
+
+BENCHMARK_TERMS = ('habitación', 'present', 'ensayo hist', 'generada 987654', 'astronomía')
+
+
+def match_expression(text, prefix=True):
+    """
+    Convierte el texto del usuario en una expresión MATCH segura: cada
+    palabra entre comillas (sin sintaxis FTS5) y, con prefix, con '*'.
+    """
+    words = re.findall(r'\w+', text)
+    suffix = '*' if prefix else ''
+    return " ".join(f'"{word}"{suffix}' for word in words)
+
+
+def search(conn, text, scope='tasks', user_id=None, status=None, limit=DEFAULT_LIMIT,
+           prefix=True):
+    """
+    Busca `text` en tareas (scope='tasks') o sesiones (scope='sessions').
+
+    Returns:
+        Lista de tuplas (id, user_id, título/asunto, status, fragmento, rank),
+        más relevantes primero (rank de bm25: menor es mejor)
+    """
+    fts, content, columns, weights = INDEXES[scope]
+    expression = match_expression(text, prefix)
+    if not expression:
+        return []
+    bm25 = f"bm25({fts}, {', '.join(str(w) for w in weights)})"
+    return conn.execute(f"""
+        SELECT c.id, c.user_id, c.{columns[0]}, c.status,
+               snippet({fts}, -1, '[', ']', '…', 12), {bm25} AS rank
+        FROM {fts}
+        JOIN {content} c ON c.id = {fts}.rowid
+        WHERE {fts} MATCH ?
+          AND (?2 IS NULL OR c.user_id = ?2)
+          AND (?3 IS NULL OR c.status = ?3)
+        ORDER BY rank
+        LIMIT ?4
+    """, (expression, user_id, status, limit)).fetchall()
+
+
+def like_search(conn, text, scope='tasks', user_id=None, status=None, limit=DEFAULT_LIMIT):
+    """Búsqueda equivalente con LIKE '%palabra%' (recorre toda la tabla)"""
+    _, content, columns, _ = INDEXES[scope]
+    conditions = []
+    params = []
+    for word in re.findall(r'\w+', text):
+        conditions.append("(" + " OR ".join(f"{c} LIKE ?" for c in columns) + ")")
+        params += [f"%{word}%"] * len(columns)
+    if not conditions:
+        return []
+    return conn.execute(f"""
+        SELECT id, user_id, {columns[0]}, status
+        FROM {content}
+        WHERE {' AND '.join(conditions)}
+          AND (? IS NULL OR user_id = ?)
+          AND (? IS NULL OR status = ?)
+        LIMIT ?
+    """, params + [user_id, user_id, status, status, limit]).fetchall()
+
+
+def index_rows(conn, first_task_id=1, first_session_id=1):
+    """
+    Indexa las tareas y sesiones con id >= los indicados (filas insertadas
+    con los triggers desactivados, ej. seed_database.py). No hace commit.
+    """
+    for scope, first_id in (('tasks', first_task_id), ('sessions', first_session_id)):
+        fts, content, columns, _ = INDEXES[scope]
+        names = ", ".join(columns)
+        conn.execute(f"""
+            INSERT INTO {fts} (rowid, {names})
+            SELECT id, {names} FROM {content} WHERE id >= ?
+        """, (first_id,))
+
+
+def fill_index(conn):
+    """
+    Reconstruye ambos índices desde sus tablas de contenido y los optimiza
+    (fusiona los segmentos b-tree en uno), sin commit.
+
+    Returns:
+        dict {tabla FTS: filas indexadas}
+    """
+    counts = {}
+    for fts, content, _, _ in INDEXES.values():
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('optimize')")
+        counts[fts] = conn.execute(f"SELECT COUNT(*) FROM {content}").fetchone()[0]
+    return counts
+
+
+def rebuild_index(conn):
+    """Reconstruye los índices de texto completo en una transacción"""
+    try:
+        counts = fill_index(conn)
+        conn.commit()
+        return counts
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _timed(func, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000, result
+
+
+def benchmark(conn, terms=BENCHMARK_TERMS, repeat=5, limit=DEFAULT_LIMIT):
+    """
+    Compara FTS5 (con ranking) con LIKE para cada término.
+
+    Returns:
+        Lista de dicts {'term', 'fts_ms', 'like_ms', 'fts_rows', 'like_rows', 'speedup'}
+    """
+    results = []
+    for term in terms:
+        fts_ms, fts_rows = _timed(lambda: search(conn, term, limit=limit), repeat)
+        like_ms, like_rows = _timed(lambda: like_search(conn, term, limit=limit), repeat)
+        results.append({
+            'term': term,
+            'fts_ms': round(fts_ms, 2),
+            'like_ms': round(like_ms, 2),
+            'fts_rows': len(fts_rows),
+            'like_rows': len(like_rows),
+            'speedup': round(like_ms / fts_ms, 1) if fts_ms else None,
+        })
+    return results
+
+
+def print_results(rows):
+    if not rows:
+        print("   (sin resultados)")
+    for row_id, user_id, title, status, snippet, rank in rows:
+        print(f"   #{row_id:<8} usuario {user_id:<7} {status:11} {rank:8.2f}  {title}")
+        print(f"              {snippet}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Búsqueda de texto completo (FTS5)")
+    parser.add_argument('texto', nargs='?', help="Texto a buscar")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Ruta de la base de datos")
+    parser.add_argument('--sesiones', action='store_true',
+                        help="Buscar en sesiones de estudio en vez de tareas")
+    parser.add_argument('--usuario', type=int, help="Filtrar por user_id")
+    parser.add_argument('--estado', help="Filtrar por status (ej. PENDING)")
+    parser.add_argument('--limite', type=int, default=DEFAULT_LIMIT, help="Máximo de resultados")
+    parser.add_argument('--exacto', action='store_true', help="Sin búsqueda por prefijo")
+    parser.add_argument('--reconstruir', action='store_true',
+                        help="Reconstruir los índices de texto completo")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="Comparar FTS5 con LIKE '%%texto%%'")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ Error: No existe {args.db}")
+        return 1
+    if not (args.texto or args.reconstruir or args.benchmark):
+        parser.error("indica un texto, --reconstruir o --benchmark")
+
+    conn = connect(args.db)
+    try:
+        if args.reconstruir:
+            start = time.perf_counter()
+            counts = rebuild_index(conn)
+            print(f"🔨 Índices reconstruidos en {time.perf_counter() - start:.2f}s")
+            for fts, count in counts.items():
+                print(f"   • {fts}: {count:,} filas")
+
+        if args.benchmark:
+            print(f"\n🏁 FTS5 vs LIKE (p50 de 5 ejecuciones, límite {args.limite})")
+            print(f"   {'Término':22} {'FTS5 ms':>9} {'LIKE ms':>9} {'filas':>11} {'x':>7}")
+            terms = [args.texto] if args.texto else BENCHMARK_TERMS
+            for r in benchmark(conn, terms, limit=args.limite):
+                rows = f"{r['fts_rows']}/{r['like_rows']}"
+                print(f"   {r['term']:22} {r['fts_ms']:>9.2f} {r['like_ms']:>9.2f} "
+                      f"{rows:>11} {r['speedup']:>7}")
+        elif args.texto:
+            scope = 'sessions' if args.sesiones else 'tasks'
+            start = time.perf_counter()
+            rows = search(conn, args.texto, scope, args.usuario, args.estado,
+                          args.limite, prefix=not args.exacto)
+            elapsed = time.perf_counter() - start
+            print(f"🔎 {match_expression(args.texto, not args.exacto)} "
+                  f"({len(rows)} resultados, {elapsed * 1000:.1f} ms)")
+            print_results(rows)
+    except sqlite3.Error as e:
+        print(f"\n❌ Error de SQLite: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Generador de datos sintéticos a escala para task_gamification.db
+Amplía la inicialización de test_initializer.initialize_database() a N usuarios
+con M tareas cada uno, historial de tareas completadas, daily_stats,
+activity_log, study_sessions y user_badges.
+
+Las filas se generan de forma perezosa (generadores) y se insertan con
+executemany dentro de transacciones grandes; los datos derivados
+(daily_stats, activity_log, user_badges) se calculan en SQL a partir de las
+tareas ya insertadas (los triggers se desactivan durante la carga y
+user_summary se reconstruye al final). Con la misma semilla y la misma fecha
+base el resultado es idéntico en cada ejecución.
+
+Sobre una base de datos existente toda la carga (retirada de índices y
+triggers, inserciones y reconstrucción) es una única transacción con el
+journal habitual: si se interrumpe, la base queda como estaba. Solo una base
+recién creada desde la plantilla se carga sin journal y por bloques; si
+falla, se elimina.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+from db_connection import connect, pragma_statements
+from migrations import clone_template
+from search import index_rows
+from user_summary import fill_user_summary
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, 'task_gamification.db')
+SCHEMA_FILE = os.path.join(SCRIPT_DIR, 'schema.sql')
+
+# PRAGMAs para carga masiva: caché grande y temporales en memoria
+BULK_PRAGMAS = (
+    "PRAGMA foreign_keys = OFF",
+    "PRAGMA cache_size = -262144",
+    "PRAGMA temp_store = MEMORY",
+)
+# Solo para bases recién creadas (desechables si la carga falla): sin
+# journal ni fsync. Al terminar se aplica el perfil tuned (WAL)
+SCRATCH_PRAGMAS = BULK_PRAGMAS + (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA locking_mode = EXCLUSIVE",
+)
+RESTORE_PRAGMAS = ("PRAGMA locking_mode = NORMAL",
+                   "PRAGMA foreign_keys = ON") + pragma_statements('tuned')
+
+# Tablas cuyos índices secundarios y triggers se eliminan durante la carga y
+# se reconstruyen al final (mucho más rápido que mantenerlos fila a fila)
+SEEDED_TABLES = ('users', 'tasks', 'study_sessions', 'daily_stats',
+                 'activity_log', 'user_badges')
+
+CATEGORIES = ('STUDY', 'MATHEMATICS', 'HISTORY', 'SCIENCE',
+              'EXERCISE', 'SOCIAL', 'WORK', 'PERSONAL')
+PRIORITIES = ('LOW', 'MEDIUM', 'HIGH')
+PRIORITY_XP = {'LOW': 10, 'MEDIUM': 15, 'HIGH': 25}
+TITLES = {
+    'STUDY': ("Repasar apuntes", "Resumen de lectura", "Preparar examen"),
+    'MATHEMATICS': ("Ejercicios de álgebra", "Problemas de cálculo", "Repasar geometría"),
+    'HISTORY': ("Leer capítulo de historia", "Línea del tiempo", "Ensayo histórico"),
+    'SCIENCE': ("Informe de laboratorio", "Experimento de química", "Estudiar biología"),
+    'EXERCISE': ("Cardio 30 minutos", "Rutina de fuerza", "Salir a correr"),
+    'SOCIAL': ("Llamar a un amigo", "Reunión de grupo", "Voluntariado"),
+    'WORK': ("Revisar correos", "Preparar presentación", "Informe semanal"),
+    'PERSONAL': ("Ordenar habitación", "Meditar", "Planificar la semana"),
+}
+TASK_COLUMNS = ("id, uuid, user_id, title, description, category, priority, status, "
+                "due_date, xp_reward, created_at, updated_at, completed_at")
+SUBJECTS = ("Matemáticas", "Historia", "Ciencias", "Inglés", "Programación")
+
+
+def _uuid(seed, kind, row_id):
+    """UUID determinista (formato v4) a partir de semilla, tipo de fila e id"""
+    return '%08x-%04x-4000-8000-%012x' % (seed & 0xFFFFFFFF, kind, row_id)
+
+
+def _apply_pragmas(conn, pragmas):
+    for pragma in pragmas:
+        conn.execute(pragma)
+
+
+def _drop_schema_objects(conn, object_type, tables):
+    """Elimina los índices explícitos o triggers de las tablas y devuelve su SQL"""
+    placeholders = ", ".join("?" for _ in tables)
+    rows = conn.execute(f"""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = ? AND sql IS NOT NULL AND tbl_name IN ({placeholders})
+    """, (object_type, *tables)).fetchall()
+    for name, _ in rows:
+        conn.execute(f"DROP {object_type.upper()} {name}")
+    return [sql for _, sql in rows]
+
+
+def _max_id(conn, table):
+    return conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+
+
+def _task_rows(rng, seed, first_task_id, user_ids, tasks_per_user, days,
+               history_days, completion_rate, totals):
+    """
+    Genera las tareas de un bloque de usuarios.
+    Las tareas completadas de cada usuario se emiten en orden cronológico
+    (ids crecientes en el tiempo) seguidas de las pendientes. Acumula en
+    `totals` (user_id -> [completadas, xp]) los contadores que los triggers
+    habrían mantenido.
+    """
+    rand = rng.random
+    kinds = [(category, title) for category in CATEGORIES for title in TITLES[category]]
+    rewards = [(priority, PRIORITY_XP[priority] + bonus)
+               for priority in PRIORITIES for bonus in (0, 5, 10)]
+    clock = ["%02d:%02d" % (m, s) for m in range(60) for s in range(60)]
+    n_kinds, n_rewards, last_day = len(kinds), len(rewards), len(days) - 1
+    task_id = first_task_id
+    for user_id in user_ids:
+        # Cada usuario tiene su propio ritmo: antigüedad, constancia y horario
+        span = max(1, int(history_days * (0.2 + 0.8 * rand())))
+        rate = completion_rate * (0.5 + rand())
+        early = rand() < 0.15
+        night = rand() < 0.15
+        done, pending = [], []
+        for _ in range(tasks_per_user):
+            category, title = kinds[int(rand() * n_kinds)]
+            priority, reward = rewards[int(rand() * n_rewards)]
+            if rand() < rate:
+                day = history_days - 1 - int((rand() ** 1.5) * span)
+                if early and rand() < 0.3:
+                    hour = 5 + int(rand() * 3)
+                elif night and rand() < 0.3:
+                    hour = 22 + int(rand() * 2)
+                else:
+                    hour = 8 + int(rand() * 14)
+                done.append(("%s %02d:%s" % (days[day], hour, clock[int(rand() * 3600)]),
+                             days[max(0, day - int(rand() * 5))] + " 08:00:00",
+                             days[min(last_day, day + int(rand() * 4))],
+                             category, title, priority, reward))
+            else:
+                day = history_days - int(rand() * 10)
+                status = 'IN_PROGRESS' if rand() < 0.2 else 'PENDING'
+                pending.append((days[day] + " 08:00:00", days[day + int(rand() * 14)],
+                                category, title, priority, reward, status))
+        done.sort()
+        xp = 0
+        for completed_at, created_at, due_date, category, title, priority, reward in done:
+            xp += reward
+            yield (task_id, _uuid(seed, 2, task_id), user_id, title,
+                   f"Tarea generada #{task_id}", category, priority, 'COMPLETED',
+                   due_date, reward, created_at, completed_at, completed_at)
+            task_id += 1
+        for created_at, due_date, category, title, priority, reward, status in pending:
+            yield (task_id, _uuid(seed, 2, task_id), user_id, title,
+                   f"Tarea generada #{task_id}", category, priority, status,
+                   due_date, reward, created_at, created_at, None)
+            task_id += 1
+        totals[user_id] = [len(done), xp]
+
+
+def _user_rows(seed, user_ids, totals, created_at):
+    for user_id in user_ids:
+        completed, xp = totals[user_id]
+        yield (user_id, _uuid(seed, 1, user_id), f"Usuario {user_id}",
+               f"usuario{user_id}@seed.example.com", xp, xp // 100 + 1,
+               completed, xp, created_at, created_at, created_at)
+
+
+def _session_rows(rng, seed, first_session_id, user_ids, sessions_per_user,
+                  days, history_days):
+    session_id = first_session_id
+    for user_id in user_ids:
+        for _ in range(sessions_per_user):
+            day = int(rng.random() * (history_days + 7))
+            duration = 30 * (1 + int(rng.random() * 4))
+            scheduled = "%s %02d:00:00" % (days[day], 9 + int(rng.random() * 10))
+            if day < history_days and rng.random() < 0.8:
+                status, actual, completed_at = 'COMPLETED', duration, scheduled
+            elif day < history_days:
+                status, actual, completed_at = 'MISSED', None, None
+            else:
+                status, actual, completed_at = 'SCHEDULED', None, None
+            yield (session_id, _uuid(seed, 3, session_id), user_id,
+                   SUBJECTS[int(rng.random() * len(SUBJECTS))], scheduled,
+                   duration, status, actual, scheduled, completed_at)
+            session_id += 1
+
+
+def _derive_history(conn, first_task, last_task, first_session, last_session):
+    """Deriva daily_stats y activity_log de las tareas recién insertadas"""
+    conn.execute("""
+        INSERT INTO daily_stats (user_id, stat_date, tasks_completed, xp_earned,
+                                 study_minutes, created_at)
+        SELECT user_id, stat_date, SUM(n), SUM(xp), SUM(minutes), MIN(ts)
+        FROM (
+            SELECT user_id, DATE(completed_at) AS stat_date, 1 AS n,
+                   xp_reward AS xp, 0 AS minutes, completed_at AS ts
+            FROM tasks
+            WHERE id BETWEEN ? AND ? AND status = 'COMPLETED'
+            UNION ALL
+            SELECT user_id, DATE(completed_at), 0, 0, actual_duration_minutes, completed_at
+            FROM study_sessions
+            WHERE id BETWEEN ? AND ? AND status = 'COMPLETED'
+        )
+        GROUP BY user_id, stat_date
+    """, (first_task, last_task, first_session, last_session))
+
+    # Mismo contenido que escriben task_completed_stats y check_level_up,
+    # en orden cronológico (LEVEL_UP antes de su TASK_COMPLETED)
+    conn.execute("""
+        WITH completed AS (
+            SELECT user_id, id, title, xp_reward, completed_at,
+                   SUM(xp_reward) OVER (
+                       PARTITION BY user_id ORDER BY id
+                   ) AS running_xp
+            FROM tasks
+            WHERE id BETWEEN ? AND ? AND status = 'COMPLETED'
+        ),
+        events AS (
+            SELECT user_id, id AS task_id, 0 AS kind, 'LEVEL_UP' AS activity_type,
+                   'user' AS entity_type, NULL AS entity_id,
+                   '¡Subiste al nivel ' || (running_xp / 100 + 1) || '!' AS description,
+                   0 AS xp_change, completed_at
+            FROM completed
+            WHERE running_xp / 100 > (running_xp - xp_reward) / 100
+            UNION ALL
+            SELECT user_id, id, 1, 'TASK_COMPLETED', 'task', id,
+                   'Completaste: ' || title, xp_reward, completed_at
+            FROM completed
+        )
+        INSERT INTO activity_log (user_id, activity_type, entity_type, entity_id,
+                                  description, xp_change, created_at)
+        SELECT user_id, activity_type, entity_type, entity_id, description,
+               xp_change, completed_at
+        FROM events
+        ORDER BY task_id, kind
+    """, (first_task, last_task))
+
+
+def seed_database(db_path=DEFAULT_DB, users=1000, tasks_per_user=100, seed=42,
+                  history_days=90, completion_rate=0.6, sessions_per_user=3,
+                  anchor=None, fresh=False, chunk_users=5000, verbose=True):
+    """
+    Llena la base de datos con datos sintéticos deterministas.
+
+    Args:
+        db_path: Ruta de la base de datos (se crea desde schema.sql si no existe
+            o si fresh=True)
+        users: Número de usuarios a generar
+        tasks_per_user: Tareas por usuario
+        seed: Semilla del generador aleatorio
+        history_days: Días de historial hacia atrás desde `anchor`
+        completion_rate: Proporción media de tareas completadas
+        sessions_per_user: Sesiones de estudio por usuario
+        anchor: Fecha base (date); por defecto hoy
+        fresh: Recrear la base de datos desde la plantilla de schema.sql antes de sembrar
+        chunk_users: Usuarios por bloque (por transacción en una base nueva)
+
+    Returns:
+        dict con el número de filas insertadas por tabla y el tiempo total
+    """
+    anchor = anchor or date.today()
+    scratch = fresh or not os.path.exists(db_path)
+    if scratch:
+        # Copia de la plantilla de schema.sql (migrations.py)
+        clone_template(db_path)
+
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    # Días desde (anchor - history_days) hasta (anchor + 30)
+    first_day = anchor - timedelta(days=history_days)
+    days = [(first_day + timedelta(days=i)).isoformat() for i in range(history_days + 31)]
+    user_created = "%s 08:00:00" % days[0]
+
+    conn = connect(db_path, 'tuned', isolation_level=None)
+    try:
+        _apply_pragmas(conn, SCRATCH_PRAGMAS if scratch else BULK_PRAGMAS)
+
+        conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS seed_tasks ({TASK_COLUMNS})")
+        conn.execute("BEGIN")
+        index_sql = _drop_schema_objects(conn, 'index', SEEDED_TABLES)
+        trigger_sql = _drop_schema_objects(conn, 'trigger', SEEDED_TABLES)
+        first_user = _max_id(conn, 'users') + 1
+        first_task_all = next_task = _max_id(conn, 'tasks') + 1
+        first_session_all = next_session = _max_id(conn, 'study_sessions') + 1
+
+        for lo in range(first_user, first_user + users, chunk_users):
+            user_ids = range(lo, min(lo + chunk_users, first_user + users))
+            totals = {}
+            # executemany sobre una tabla temporal sin AUTOINCREMENT ni
+            # restricciones y un único INSERT ... SELECT hacia tasks
+            conn.executemany("""
+                INSERT INTO temp.seed_tasks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, _task_rows(rng, seed, next_task, user_ids, tasks_per_user, days,
+                            history_days, completion_rate, totals))
+            conn.execute(f"INSERT INTO tasks ({TASK_COLUMNS}) SELECT * FROM temp.seed_tasks")
+            conn.execute("DELETE FROM temp.seed_tasks")
+            conn.executemany("""
+                INSERT INTO users (id, uuid, name, email, current_xp, level,
+                                   tasks_completed, total_xp_earned, created_at,
+                                   updated_at, last_login)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, _user_rows(seed, user_ids, totals, user_created))
+            conn.executemany("""
+                INSERT INTO study_sessions (id, uuid, user_id, subject, scheduled_date,
+                                            duration_minutes, status,
+                                            actual_duration_minutes, created_at,
+                                            completed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, _session_rows(rng, seed, next_session, user_ids, sessions_per_user,
+                               days, history_days))
+            last_task = next_task + len(user_ids) * tasks_per_user - 1
+            last_session = next_session + len(user_ids) * sessions_per_user - 1
+            _derive_history(conn, next_task, last_task, next_session, last_session)
+            conn.execute("""
+                INSERT OR IGNORE INTO user_badges (user_id, badge_id, progress, is_unlocked)
+                SELECT u.id, b.id, 0, 0
+                FROM users u CROSS JOIN badges b
+                WHERE u.id BETWEEN ? AND ? AND b.is_active = 1
+            """, (user_ids[0], user_ids[-1]))
+            if scratch:
+                conn.execute("COMMIT")
+                conn.execute("BEGIN")
+            next_task = last_task + 1
+            next_session = last_session + 1
+            if verbose:
+                print(f"   • Usuarios {user_ids[0]}-{user_ids[-1]} "
+                      f"({time.perf_counter() - start:.1f}s)")
+
+        if verbose:
+            print("🔨 Reconstruyendo índices...")
+        for sql in index_sql + trigger_sql:
+            conn.execute(sql)
+        # Los triggers de tasks_fts/sessions_fts tampoco: indexar las filas nuevas
+        if conn.execute("""
+            SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'
+        """).fetchone():
+            index_rows(conn, first_task_all, first_session_all)
+        # Los triggers de user_summary no se dispararon durante la carga
+        if conn.execute("""
+            SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_summary'
+        """).fetchone():
+            fill_user_summary(conn)
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+        if scratch:
+            _apply_pragmas(conn, RESTORE_PRAGMAS)
+
+        return {
+            'users': users,
+            'tasks': next_task - first_task_all,
+            'study_sessions': users * sessions_per_user,
+            'seconds': time.perf_counter() - start,
+        }
+    except BaseException:
+        if scratch:
+            # Sin journal no hay rollback posible: se descarta la base nueva
+            conn.close()
+            for suffix in ('', '-journal', '-wal', '-shm'):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+        elif conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Genera datos sintéticos deterministas en task_gamification.db")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Ruta de la base de datos")
+    parser.add_argument('--usuarios', type=int, default=1000, help="Número de usuarios")
+    parser.add_argument('--tareas', type=int, default=100, help="Tareas por usuario")
+    parser.add_argument('--semilla', type=int, default=42, help="Semilla aleatoria")
+    parser.add_argument('--dias', type=int, default=90, help="Días de historial")
+    parser.add_argument('--sesiones', type=int, default=3, help="Sesiones de estudio por usuario")
+    parser.add_argument('--fecha-base', type=date.fromisoformat, default=None,
+                        help="Fecha base YYYY-MM-DD (por defecto hoy)")
+    parser.add_argument('--nueva', action='store_true',
+                        help="Recrear la base de datos desde schema.sql")
+    args = parser.parse_args(argv)
+
+    print("=" * 80)
+    print("🌱 GENERANDO DATOS SINTÉTICOS")
+    print("=" * 80)
+    print(f"📍 Base de datos: {args.db}")
+    print(f"👤 Usuarios: {args.usuarios}  📋 Tareas/usuario: {args.tareas}  "
+          f"🎲 Semilla: {args.semilla}")
+
+    try:
+        result = seed_database(args.db, users=args.usuarios, tasks_per_user=args.tareas,
+                               seed=args.semilla, history_days=args.dias,
+                               sessions_per_user=args.sesiones, anchor=args.fecha_base,
+                               fresh=args.nueva)
+    except sqlite3.Error as e:
+        print(f"\n❌ Error de SQLite: {e}")
+        return 1
+
+    rate = result['tasks'] / result['seconds'] if result['seconds'] else 0
+    print(f"\n✅ {result['tasks']} tareas en {result['seconds']:.2f}s "
+          f"({rate:,.0f} tareas/s)")
+    print(f"📦 Tamaño: {os.path.getsize(args.db) / 1024 / 1024:.2f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+Almacenamiento particionado por usuario (shards)
+Reparte los usuarios en N archivos shard_NN.db (copias de la plantilla de
+schema.sql) según un hash estable de users.uuid, para que las escrituras de
+usuarios distintos no compitan por el único lock de escritura de SQLite:
+  - ShardRouter envía cada lectura y escritura de un usuario a su shard
+  - las consultas globales (contadores, ranking, estadísticas de badges) se
+    ejecutan en paralelo, un proceso por shard, y se combinan los parciales
+  - split_database() reparte una base de datos existente conservando los ids
+
+Los ids siguen siendo únicos entre shards: los repartidos conservan los de
+origen (deben ser menores que ID_BLOCK = 2^32) y los nuevos del shard k
+están en [(k + 1) * 2^32, (k + 2) * 2^32). Son ids dispersos: quien indexe
+arrays por id debe compactarlos (ej. analytics.py). Las restricciones
+UNIQUE (ej. users.email) solo se comprueban dentro de cada shard. badges y
+app_settings se copian en todos los shards.
+"""
+
+import argparse
+import glob
+import hashlib
+import heapq
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from db_connection import connect, copy_database
+from migrations import build_template, clone_template, template_is_current
+from search import index_rows
+from seed_database import BULK_PRAGMAS, RESTORE_PRAGMAS, _apply_pragmas, _drop_schema_objects
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, 'task_gamification.db')
+DEFAULT_SHARD_DIR = os.path.join(SCRIPT_DIR, 'shards')
+
+ID_BLOCK = 1 << 32
+
+
+def shard_of(user_uuid, shards):
+    """Shard de un usuario: hash estable (no el hash() de Python, que varía por proceso)"""
+    digest = hashlib.blake2b(user_uuid.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % shards
+
+
+def shard_path(shard_dir, index):
+    return os.path.join(shard_dir, f"shard_{index:02d}.db")
+
+
+def shard_paths(shard_dir=DEFAULT_SHARD_DIR):
+    """Archivos de shard del directorio, comprobando que no falte ninguno"""
+    paths = sorted(glob.glob(os.path.join(shard_dir, 'shard_*.db')))
+    expected = [shard_path(shard_dir, i) for i in range(len(paths))]
+    if not paths or paths != expected:
+        raise FileNotFoundError(f"Shards incompletos en {shard_dir}")
+    return paths
+
+
+def _user_tables(conn):
+    """(tablas con user_id o users, resto de tablas normales) del esquema principal"""
+    per_user, shared = [], []
+    for row in conn.execute("PRAGMA main.table_list"):
+        name = row[1]
+        if row[2] != 'table' or name.startswith('sqlite_'):
+            continue
+        columns = {c[1] for c in conn.execute(f'PRAGMA main.table_info("{name}")')}
+        (per_user if name == 'users' or 'user_id' in columns else shared).append(name)
+    return per_user, shared
+
+
+def _copy_table(conn, table, where=""):
+    """Copia `table` desde src.* con las columnas comunes a ambos esquemas"""
+    source = {c[1] for c in conn.execute(f'PRAGMA src.table_info("{table}")')}
+    columns = ", ".join(f'"{c[1]}"' for c in conn.execute(f'PRAGMA main.table_info("{table}")')
+                        if c[1] in source)
+    conn.execute(f'INSERT INTO main."{table}" ({columns}) SELECT {columns} FROM src."{table}" {where}')
+
+
+def _reserve_ids(conn, index):
+    """Los ids AUTOINCREMENT nuevos del shard empiezan en (index + 1) * ID_BLOCK"""
+    base = (index + 1) * ID_BLOCK
+    conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?)", (base,))
+    conn.execute("""
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT name, ? FROM sqlite_master
+        WHERE type = 'table' AND sql LIKE '%AUTOINCREMENT%'
+          AND name NOT IN (SELECT name FROM sqlite_sequence)
+    """, (base,))
+
+
+def create_shard(path, index, shards, source=None):
+    """
+    Crea un shard desde la plantilla y, con `source`, copia los usuarios
+    que le corresponden con todas sus filas (triggers desactivados: los
+    contadores y user_summary se copian tal cual) y las tablas compartidas.
+
+    Returns:
+        Usuarios copiados
+    """
+    clone_template(path)
+    conn = connect(path, 'tuned', isolation_level=None)
+    try:
+        _apply_pragmas(conn, BULK_PRAGMAS)
+        users = 0
+        conn.execute("BEGIN")
+        if source:
+            conn.create_function('shard_of', 2, shard_of, deterministic=True)
+            conn.execute("ATTACH DATABASE ? AS src", (source,))
+            per_user, shared = _user_tables(conn)
+            trigger_sql = _drop_schema_objects(conn, 'trigger', per_user + shared)
+            conn.execute("""
+                CREATE TEMP TABLE shard_users AS
+                SELECT id FROM src.users WHERE shard_of(uuid, ?) = ?
+            """, (shards, index))
+            users = conn.execute("SELECT COUNT(*) FROM temp.shard_users").fetchone()[0]
+            for table in shared:
+                conn.execute(f'DELETE FROM main."{table}"')
+                _copy_table(conn, table)
+            for table in per_user:
+                key = 'id' if table == 'users' else 'user_id'
+                _copy_table(conn, table, f"WHERE {key} IN (SELECT id FROM temp.shard_users)")
+            for sql in trigger_sql:
+                conn.execute(sql)
+            if conn.execute("""
+                SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'
+            """).fetchone():
+                index_rows(conn)
+        conn.execute("""
+            INSERT INTO app_settings (setting_key, setting_value, setting_type, description)
+            VALUES ('shard_index', ?, 'INTEGER', 'Shard de sharding.py'),
+                   ('shard_count', ?, 'INTEGER', 'Número de shards de sharding.py')
+            ON CONFLICT(setting_key) DO UPDATE SET setting_value = excluded.setting_value
+        """, (str(index), str(shards)))
+        _reserve_ids(conn, index)
+        conn.execute("COMMIT")
+        if source:
+            conn.execute("DETACH DATABASE src")
+            conn.execute("ANALYZE")
+        _apply_pragmas(conn, RESTORE_PRAGMAS)
+        return users
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def split_database(source, shard_dir=DEFAULT_SHARD_DIR, shards=4, workers=None):
+    """
+    Reparte `source` en `shards` archivos (uno por proceso en paralelo).
+    Sin `source` crea shards vacíos. Sustituye los shards existentes.
+
+    Returns:
+        Lista con los usuarios de cada shard
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(shard_dir, 'shard_*.db*')):
+        os.remove(path)
+    # La plantilla se construye aquí una sola vez: los procesos solo la copian
+    if not template_is_current():
+        build_template()
+    with ProcessPoolExecutor(max_workers=workers or min(shards, os.cpu_count() or 1)) as pool:
+        futures = [pool.submit(create_shard, shard_path(shard_dir, i), i, shards, source)
+                   for i in range(shards)]
+        return [future.result() for future in futures]
+
+
+# Consultas parciales por shard (funciones de módulo para el ProcessPoolExecutor)
+
+def _shard_counts(path):
+    conn = connect(path, 'readonly', readonly=True)
+    try:
+        users, xp = conn.execute("""
+            SELECT COUNT(*), COALESCE(SUM(total_xp_earned), 0) FROM users
+        """).fetchone()
+        counts = {'users': users, 'total_xp': xp}
+        for status, count in conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status"):
+            counts[f"tasks_{status.lower()}"] = count
+        return counts
+    finally:
+        conn.close()
+
+
+def _shard_leaderboard(path, limit):
+    conn = connect(path, 'readonly', readonly=True)
+    try:
+        return conn.execute("""
+            SELECT total_xp_earned, uuid, name, level FROM users
+            ORDER BY total_xp_earned DESC, uuid
+            LIMIT ?
+        """, (limit,)).fetchall()
+    finally:
+        conn.close()
+
+
+def _shard_badge_stats(path):
+    conn = connect(path, 'readonly', readonly=True)
+    try:
+        users = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        holders = conn.execute("""
+            SELECT b.badge_key, b.name, COUNT(ub.id)
+            FROM badges b
+            LEFT JOIN user_badges ub ON ub.badge_id = b.id AND ub.is_unlocked = 1
+            GROUP BY b.id
+        """).fetchall()
+        return users, holders
+    finally:
+        conn.close()
+
+
+class ShardRouter:
+    """
+    Acceso a los shards de un directorio.
+
+    Uso:
+        router = ShardRouter(shard_dir)
+        router.create_task(user_uuid, "Repasar apuntes", 'STUDY', '2026-06-01')
+        router.leaderboard(10)      # en paralelo en todos los shards
+        router.close()
+    """
+
+    def __init__(self, shard_dir=DEFAULT_SHARD_DIR, workers=None):
+        self.paths = shard_paths(shard_dir)
+        self.workers = workers or min(len(self.paths), os.cpu_count() or 1)
+        self._conns = {}
+        self._user_ids = {}
+        self._pool = None
+
+    def shard_index(self, user_uuid):
+        return shard_of(user_uuid, len(self.paths))
+
+    def connection(self, user_uuid):
+        """Conexión (abierta una vez) al shard del usuario"""
+        index = self.shard_index(user_uuid)
+        if index not in self._conns:
+            self._conns[index] = connect(self.paths[index], 'tuned', isolation_level=None)
+        return self._conns[index]
+
+    @contextmanager
+    def writer(self, user_uuid):
+        """Transacción de escritura en el shard del usuario (commit al salir)"""
+        conn = self.connection(user_uuid)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def user_id(self, user_uuid):
+        """Id del usuario en su shard (cacheado), o None si no existe"""
+        if user_uuid not in self._user_ids:
+            row = self.connection(user_uuid).execute(
+                "SELECT id FROM users WHERE uuid = ?", (user_uuid,)).fetchone()
+            if row is None:
+                return None
+            self._user_ids[user_uuid] = row[0]
+        return self._user_ids[user_uuid]
+
+    def _require_user(self, user_uuid):
+        user_id = self.user_id(user_uuid)
+        if user_id is None:
+            raise KeyError(f"Usuario no encontrado: {user_uuid}")
+        return user_id
+
+    def create_user(self, user_uuid, name, email=None):
+        with self.writer(user_uuid) as conn:
+            user_id = conn.execute("INSERT INTO users (uuid, name, email) VALUES (?, ?, ?)",
+                                   (user_uuid, name, email)).lastrowid
+        self._user_ids[user_uuid] = user_id
+        return user_id
+
+    def get_user(self, user_uuid):
+        """(id, name, level, current_xp, total_xp_earned, tasks_completed) o None"""
+        return self.connection(user_uuid).execute("""
+            SELECT id, name, level, current_xp, total_xp_earned, tasks_completed
+            FROM users WHERE uuid = ?
+        """, (user_uuid,)).fetchone()
+
+    def user_tasks(self, user_uuid, status=None, limit=50):
+        return self.connection(user_uuid).execute("""
+            SELECT id, title, category, status, due_date, xp_reward FROM tasks
+            WHERE user_id = ? AND (? IS NULL OR status = ?)
+            ORDER BY due_date, id
+            LIMIT ?
+        """, (self._require_user(user_uuid), status, status, limit)).fetchall()
+
+    def create_task(self, user_uuid, title, category, due_date, xp_reward=10,
+                    priority='MEDIUM', task_uuid=None):
+        user_id = self._require_user(user_uuid)
+        task_uuid = task_uuid or f"{user_uuid}-{time.time_ns()}"
+        with self.writer(user_uuid) as conn:
+            return conn.execute("""
+                INSERT INTO tasks (uuid, user_id, title, category, priority, due_date, xp_reward)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (task_uuid, user_id, title, category, priority, due_date, xp_reward)).lastrowid
+
+    def complete_task(self, user_uuid, task_id):
+        """Completa una tarea del usuario; False si no existe o ya estaba completada"""
+        user_id = self._require_user(user_uuid)
+        with self.writer(user_uuid) as conn:
+            return conn.execute("""
+                UPDATE tasks SET status = 'COMPLETED', completed_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND user_id = ? AND status != 'COMPLETED'
+            """, (task_id, user_id)).rowcount == 1
+
+    def _map(self, func, *args):
+        """Ejecuta func(path, *args) en todos los shards en paralelo"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return list(self._pool.map(func, self.paths, *([arg] * len(self.paths) for arg in args)))
+
+    def global_counts(self):
+        """Usuarios, XP total y tareas por estado de todos los shards"""
+        totals = {}
+        for counts in self._map(_shard_counts):
+            for key, value in counts.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def leaderboard(self, limit=10):
+        """Top global por total_xp_earned: (posición, total_xp, uuid, name, level)"""
+        partials = self._map(_shard_leaderboard, limit)
+        merged = heapq.merge(*partials, key=lambda row: (-row[0], row[1]))
+        return [(rank, *row) for rank, row in zip(range(1, limit + 1), merged)]
+
+    def badge_stats(self):
+        """Por badge: (badge_key, name, usuarios que lo tienen, % de usuarios)"""
+        users = 0
+        holders = {}
+        for shard_users, rows in self._map(_shard_badge_stats):
+            users += shard_users
+            for key, name, count in rows:
+                holders[key] = (name, holders.get(key, (name, 0))[1] + count)
+        return sorted(((key, name, count, round(count / users * 100, 1) if users else 0.0)
+                       for key, (name, count) in holders.items()),
+                      key=lambda row: -row[2])
+
+    def close(self):
+        for conn in self._conns.values():
+            conn.close()
+        self._conns.clear()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def _bench_worker(shard_dir, work):
+    """Completa las tareas de `work` [(user_uuid, task_id)] y devuelve (inicio, fin)"""
+    router = ShardRouter(shard_dir, workers=1)
+    try:
+        for user_uuid, _ in work:
+            router.user_id(user_uuid)
+        start = time.time()
+        for user_uuid, task_id in work:
+            router.complete_task(user_uuid, task_id)
+        return start, time.time()
+    finally:
+        router.close()
+
+
+def benchmark(source, process_counts=(1, 2, 4), per_process=300, seed=42):
+    """
+    Escrituras por segundo (tareas completadas) con P procesos concurrentes
+    sobre un único archivo y sobre P shards, ambos en copias temporales.
+
+    Returns:
+        Lista de dicts {'processes', 'single_ops_s', 'sharded_ops_s', 'speedup'}
+    """
+    conn = connect(source, 'readonly', readonly=True)
+    pending = conn.execute("""
+        SELECT u.uuid, t.id FROM tasks t JOIN users u ON u.id = t.user_id
+        WHERE t.status = 'PENDING'
+    """).fetchall()
+    conn.close()
+    rng = random.Random(seed)
+
+    def run(shard_dir, processes):
+        work = rng.sample(pending, min(len(pending), processes * per_process))
+        chunks = [work[i::processes] for i in range(processes)]
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            spans = list(pool.map(_bench_worker, [shard_dir] * processes, chunks))
+        return len(work) / (max(end for _, end in spans) - min(start for start, _ in spans))
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for processes in process_counts:
+            single_dir = os.path.join(tmp, f"single_{processes}")
+            os.makedirs(single_dir)
+            copy_database(source, shard_path(single_dir, 0))
+            sharded_dir = os.path.join(tmp, f"sharded_{processes}")
+            split_database(source, sharded_dir, processes)
+            single = run(single_dir, processes)
+            sharded = run(sharded_dir, processes)
+            results.append({
+                'processes': processes,
+                'single_ops_s': round(single),
+                'sharded_ops_s': round(sharded),
+                'speedup': round(sharded / single, 2),
+            })
+            shutil.rmtree(single_dir)
+            shutil.rmtree(sharded_dir)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shards de usuarios por hash de uuid")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Base de datos de origen")
+    parser.add_argument('--dir', default=DEFAULT_SHARD_DIR, help="Directorio de los shards")
+    parser.add_argument('--repartir', type=int, metavar='N',
+                        help="Repartir --db en N shards (sustituye los existentes)")
+    parser.add_argument('--top', type=int, default=10, help="Tamaño del ranking global")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="Escrituras por segundo: un archivo vs shards")
+    parser.add_argument('--procesos', default='1,2,4',
+                        help="Procesos del benchmark separados por comas")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.benchmark:
+            if not os.path.exists(args.db):
+                print(f"❌ Error: No existe {args.db}")
+                return 1
+            counts = [int(p) for p in args.procesos.split(',')]
+            print(f"🏁 Tareas completadas por segundo ({os.cpu_count()} CPU)")
+            print(f"   {'Procesos':>8} {'1 archivo':>10} {'shards':>10} {'x':>6}")
+            for r in benchmark(args.db, counts):
+                print(f"   {r['processes']:>8} {r['single_ops_s']:>10,} "
+                      f"{r['sharded_ops_s']:>10,} {r['speedup']:>6}")
+            return 0
+
+        if args.repartir:
+            if not os.path.exists(args.db):
+                print(f"❌ Error: No existe {args.db}")
+                return 1
+            start = time.perf_counter()
+            users = split_database(args.db, args.dir, args.repartir)
+            print(f"🔀 {sum(users):,} usuarios repartidos en {len(users)} shards "
+                  f"({time.perf_counter() - start:.1f}s)")
+            for i, count in enumerate(users):
+                print(f"   • {os.path.basename(shard_path(args.dir, i))}: {count:,} usuarios")
+
+        router = ShardRouter(args.dir)
+        try:
+            start = time.perf_counter()
+            counts = router.global_counts()
+            print(f"\n📊 {len(router.paths)} shards ({time.perf_counter() - start:.2f}s)")
+            for key, value in sorted(counts.items()):
+                print(f"   • {key}: {value:,}")
+            print(f"\n🏆 Top {args.top}")
+            for rank, xp, user_uuid, name, level in router.leaderboard(args.top):
+                print(f"   {rank:>3}. {name:25} nivel {level:<3} {xp:>8,} XP")
+            print("\n🎖️  Badges")
+            for key, name, count, pct in router.badge_stats():
+                print(f"   {name:25} {count:>9,} usuarios ({pct}%)")
+        finally:
+            router.close()
+    except FileNotFoundError as e:
+        print(f"❌ Error: {e}")
+        return 1
+    except sqlite3.Error as e:
+        print(f"\n❌ Error de SQLite: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
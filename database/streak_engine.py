@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Motor de rachas (current_streak / longest_streak)
+Un día cuenta como activo si daily_stats.tasks_completed > 0. La racha actual
+sigue viva mientras el último día activo no sea anterior a
+`fecha - streak_reset_hours / 24` (app_settings).
+
+Modos:
+  - completo: carga los días activos de todos los usuarios como arrays de
+    NumPy y calcula ambas rachas en una sola pasada vectorizada (detección de
+    huecos entre días consecutivos)
+  - incremental: procesa solo los días posteriores a la última fecha
+    procesada, extendiendo o reiniciando la racha a partir del estado del
+    día anterior
+
+Ambos modos marcan daily_stats.streak_active, registran STREAK_MILESTONE al
+alcanzar los umbrales de los badges STREAK y guardan la fecha procesada en
+app_settings.
+
+Requiere: pip install numpy
+"""
+
+import argparse
+import itertools
+import os
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from db_connection import connect
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, 'task_gamification.db')
+
+LAST_DATE_KEY = 'streak_last_date'
+
+
+def compute_streaks(users, days, as_of, grace_days=1):
+    """
+    Calcula las rachas a partir de pares (usuario, día) ordenados.
+
+    Args:
+        users: array int64 de user_id, ordenado
+        days: array int64 de días (número de día) ordenado dentro de cada usuario,
+            sin duplicados
+        as_of: día de referencia (mismo sistema que `days`)
+        grace_days: días sin actividad tolerados antes de perder la racha
+
+    Returns:
+        (user_ids, current, longest) como arrays alineados
+    """
+    n = users.size
+    if n == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+
+    # Un tramo nuevo empieza al cambiar de usuario o si hay un hueco de días
+    new_run = np.ones(n, dtype=bool)
+    new_run[1:] = (users[1:] != users[:-1]) | (days[1:] - days[:-1] != 1)
+    run_starts = np.flatnonzero(new_run)
+    run_ends = np.append(run_starts[1:], n) - 1
+    run_lengths = run_ends - run_starts + 1
+    run_users = users[run_starts]
+
+    first_run = np.flatnonzero(np.r_[True, run_users[1:] != run_users[:-1]])
+    last_run = np.append(first_run[1:], run_users.size) - 1
+
+    longest = np.maximum.reduceat(run_lengths, first_run)
+    alive = days[run_ends[last_run]] >= as_of - grace_days
+    current = np.where(alive, run_lengths[last_run], 0)
+    return run_users[first_run], current, longest
+
+
+def _day_number(value):
+    """Número de día compatible con CAST(julianday(fecha) AS INTEGER)"""
+    return value.toordinal() + 1721424
+
+
+def _grace_days(conn):
+    row = conn.execute("SELECT setting_value FROM app_settings "
+                       "WHERE setting_key = 'streak_reset_hours'").fetchone()
+    hours = int(row[0]) if row and row[0] else 24
+    return max(1, hours // 24)
+
+
+def _load_active_days(conn, as_of):
+    """
+    Lee (user_id, día) de los días activos hasta `as_of`, en orden del índice
+    único (user_id, stat_date), directamente a un array sin listas intermedias.
+    """
+    cursor = conn.execute("""
+        SELECT user_id, CAST(julianday(stat_date) AS INTEGER)
+        FROM daily_stats
+        WHERE tasks_completed > 0 AND stat_date <= ?
+        ORDER BY user_id, stat_date
+    """, (as_of.isoformat(),))
+    flat = np.fromiter(itertools.chain.from_iterable(cursor), dtype=np.int64)
+    pairs = flat.reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def _log_milestones(conn):
+    """STREAK_MILESTONE para cada umbral STREAK superado respecto a users"""
+    conn.execute("""
+        INSERT INTO activity_log (user_id, activity_type, entity_type, description)
+        SELECT s.user_id, 'STREAK_MILESTONE', 'user',
+               '¡Racha de ' || m.days || ' días!'
+        FROM temp.streaks s
+        JOIN users u ON u.id = s.user_id
+        JOIN (
+            SELECT DISTINCT requirement_value AS days
+            FROM badges
+            WHERE requirement_type = 'STREAK' AND is_active = 1
+        ) m ON s.current >= m.days AND u.current_streak < m.days
+        ORDER BY s.user_id, m.days
+    """)
+
+
+def _apply_streaks(conn):
+    """Escribe temp.streaks en users (solo filas que cambian)"""
+    _log_milestones(conn)
+    return conn.execute("""
+        UPDATE users
+        SET current_streak = s.current,
+            longest_streak = MAX(users.longest_streak, s.longest)
+        FROM temp.streaks s
+        WHERE users.id = s.user_id
+          AND (users.current_streak != s.current OR users.longest_streak < s.longest)
+    """).rowcount
+
+
+def _save_last_date(conn, as_of):
+    conn.execute("""
+        INSERT INTO app_settings (setting_key, setting_value, setting_type, description)
+        VALUES (?, ?, 'STRING', 'Último día procesado por streak_engine.py')
+        ON CONFLICT(setting_key) DO UPDATE SET
+            setting_value = excluded.setting_value,
+            updated_at = CURRENT_TIMESTAMP
+    """, (LAST_DATE_KEY, as_of.isoformat()))
+
+
+def get_last_date(conn):
+    row = conn.execute("SELECT setting_value FROM app_settings WHERE setting_key = ?",
+                       (LAST_DATE_KEY,)).fetchone()
+    return date.fromisoformat(row[0]) if row and row[0] else None
+
+
+def recompute_all(conn, as_of=None):
+    """
+    Recalcula las rachas de todos los usuarios en una pasada vectorizada.
+
+    Args:
+        as_of: último día (completo) a considerar; por defecto ayer
+
+    Returns:
+        dict con usuarios con actividad y usuarios actualizados
+    """
+    as_of = as_of or date.today() - timedelta(days=1)
+    grace = _grace_days(conn)
+    try:
+        users, days = _load_active_days(conn, as_of)
+        user_ids, current, longest = compute_streaks(users, days, _day_number(as_of), grace)
+
+        conn.execute("DROP TABLE IF EXISTS temp.streaks")
+        conn.execute("CREATE TEMP TABLE streaks (user_id INTEGER PRIMARY KEY, "
+                     "current INTEGER, longest INTEGER)")
+        conn.executemany("INSERT INTO temp.streaks VALUES (?, ?, ?)",
+                         zip(user_ids.tolist(), current.tolist(), longest.tolist()))
+        updated = _apply_streaks(conn)
+        # Usuarios sin ningún día activo
+        updated += conn.execute("""
+            UPDATE users SET current_streak = 0
+            WHERE current_streak != 0 AND id NOT IN (SELECT user_id FROM temp.streaks)
+        """).rowcount
+        conn.execute("""
+            UPDATE daily_stats SET streak_active = (tasks_completed > 0)
+            WHERE streak_active != (tasks_completed > 0) AND stat_date <= ?
+        """, (as_of.isoformat(),))
+        _save_last_date(conn, as_of)
+        conn.commit()
+        return {'users': int(user_ids.size), 'updated': updated, 'as_of': as_of.isoformat()}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("DROP TABLE IF EXISTS temp.streaks")
+
+
+def _advance_day(conn, day, grace):
+    """Extiende o reinicia las rachas con la actividad de `day`"""
+    previous = (day - timedelta(days=1)).isoformat()
+    conn.execute("DELETE FROM temp.streaks")
+    conn.execute("""
+        INSERT INTO temp.streaks (user_id, current, longest)
+        SELECT u.id,
+               CASE WHEN p.user_id IS NOT NULL THEN u.current_streak + 1 ELSE 1 END,
+               MAX(u.longest_streak,
+                   CASE WHEN p.user_id IS NOT NULL THEN u.current_streak + 1 ELSE 1 END)
+        FROM daily_stats d
+        JOIN users u ON u.id = d.user_id
+        LEFT JOIN daily_stats p
+               ON p.user_id = d.user_id AND p.stat_date = ? AND p.tasks_completed > 0
+        WHERE d.stat_date = ? AND d.tasks_completed > 0
+    """, (previous, day.isoformat()))
+    updated = _apply_streaks(conn)
+    # Rachas sin actividad dentro del margen de gracia
+    updated += conn.execute("""
+        UPDATE users SET current_streak = 0
+        WHERE current_streak != 0
+          AND id NOT IN (
+              SELECT user_id FROM daily_stats
+              WHERE stat_date BETWEEN ? AND ? AND tasks_completed > 0
+          )
+    """, ((day - timedelta(days=grace)).isoformat(), day.isoformat())).rowcount
+    conn.execute("""
+        UPDATE daily_stats SET streak_active = (tasks_completed > 0)
+        WHERE stat_date = ? AND streak_active != (tasks_completed > 0)
+    """, (day.isoformat(),))
+    return updated
+
+
+def advance(conn, as_of=None):
+    """
+    Modo incremental: procesa cada día posterior al último procesado hasta
+    `as_of` (por defecto ayer). Sin fecha previa hace un recálculo completo.
+    """
+    as_of = as_of or date.today() - timedelta(days=1)
+    last = get_last_date(conn)
+    if last is None:
+        return recompute_all(conn, as_of)
+
+    grace = _grace_days(conn)
+    updated = days = 0
+    try:
+        conn.execute("DROP TABLE IF EXISTS temp.streaks")
+        conn.execute("CREATE TEMP TABLE streaks (user_id INTEGER PRIMARY KEY, "
+                     "current INTEGER, longest INTEGER)")
+        day = last + timedelta(days=1)
+        while day <= as_of:
+            updated += _advance_day(conn, day, grace)
+            days += 1
+            day += timedelta(days=1)
+        if days:
+            _save_last_date(conn, as_of)
+        conn.commit()
+        return {'days': days, 'updated': updated, 'as_of': as_of.isoformat()}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("DROP TABLE IF EXISTS temp.streaks")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calcula las rachas de los usuarios")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Ruta de la base de datos")
+    parser.add_argument('--completo', action='store_true',
+                        help="Recalcular todo el historial (por defecto: incremental)")
+    parser.add_argument('--fecha', type=date.fromisoformat, default=None,
+                        help="Último día a procesar YYYY-MM-DD (por defecto ayer)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ Error: No existe {args.db}")
+        return 1
+
+    print("=" * 80)
+    print("🔥 CÁLCULO DE RACHAS")
+    print("=" * 80)
+    conn = connect(args.db, 'tuned')
+    try:
+        start = time.perf_counter()
+        if args.completo:
+            result = recompute_all(conn, args.fecha)
+        else:
+            result = advance(conn, args.fecha)
+        elapsed = time.perf_counter() - start
+    except sqlite3.Error as e:
+        print(f"\n❌ Error de SQLite: {e}")
+        return 1
+    finally:
+        conn.close()
+
+    print(f"📅 Procesado hasta: {result['as_of']}")
+    if 'days' in result:
+        print(f"🗓️  Días procesados: {result['days']}")
+    else:
+        print(f"👤 Usuarios con actividad: {result['users']}")
+    print(f"✏️  Usuarios actualizados: {result['updated']}")
+    print(f"⏱️  Tiempo: {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Worker de sincronización de sync_queue
+Vacía la cola hacia un endpoint HTTP:
+  - reclama lotes de forma atómica (PENDING → IN_PROGRESS con claimed_at)
+  - fusiona varias operaciones sobre la misma entidad en una sola
+  - envía las peticiones en paralelo con una ventana de peticiones en vuelo
+  - los fallos vuelven a PENDING con backoff exponencial (next_attempt_at) y
+    pasan a FAILED al agotar los reintentos
+  - las operaciones de una entidad se envían en orden: no se reclaman filas
+    de una entidad con otra en vuelo (IN_PROGRESS) o esperando su backoff
+  - los IN_PROGRESS abandonados (worker caído) se recuperan al arrancar
+
+Incluye un servidor HTTP local que hace de endpoint de pruebas y un benchmark
+de filas/segundo y retraso de la cola.
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from db_connection import connect
+from migrations import SCHEMA_VERSION, clone_template, get_version, pending_migrations
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, 'task_gamification.db')
+
+DEFAULT_URL = 'http://127.0.0.1:8765/sync'
+
+def enqueue(conn, user_id, entity_type, entity_id, operation, data):
+    """Encola una operación (sin commit, para agruparla con el cambio que la origina)"""
+    conn.execute("""
+        INSERT INTO sync_queue (user_id, entity_type, entity_id, operation, data_json)
+        VALUES (?, ?, ?, ?, ?)
+    """, (user_id, entity_type, entity_id, operation, json.dumps(data)))
+
+
+def reclaim_stale(conn, stale_after=300):
+    """
+    Devuelve a PENDING los IN_PROGRESS reclamados hace más de `stale_after`
+    segundos (el worker que los tenía se cayó antes de marcarlos).
+    """
+    cursor = conn.execute("""
+        UPDATE sync_queue
+        SET sync_status = 'PENDING', claimed_at = NULL
+        WHERE sync_status = 'IN_PROGRESS'
+          AND (claimed_at IS NULL OR claimed_at < datetime('now', ?))
+    """, (f"-{int(stale_after)} seconds",))
+    conn.commit()
+    return cursor.rowcount
+
+
+def claim_batch(conn, limit):
+    """
+    Reclama hasta `limit` filas PENDING listas para enviar en una sola
+    sentencia UPDATE ... RETURNING, de modo que dos workers nunca reclaman la
+    misma fila. Se saltan las entidades con una fila en vuelo o en backoff:
+    sus operaciones posteriores esperan a que esa se complete.
+    """
+    try:
+        rows = conn.execute("""
+            UPDATE sync_queue
+            SET sync_status = 'IN_PROGRESS', claimed_at = datetime('now')
+            WHERE id IN (
+                SELECT id FROM sync_queue
+                WHERE sync_status = 'PENDING'
+                  AND (next_attempt_at IS NULL OR next_attempt_at <= datetime('now'))
+                  AND (entity_type, entity_id) NOT IN (
+                      SELECT entity_type, entity_id FROM sync_queue
+                      WHERE sync_status = 'IN_PROGRESS'
+                         OR (sync_status = 'PENDING' AND next_attempt_at > datetime('now'))
+                  )
+                ORDER BY id
+                LIMIT ?
+            )
+            RETURNING id, user_id, entity_type, entity_id, operation, data_json,
+                      retry_count, created_at
+        """, (limit,)).fetchall()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    rows.sort()
+    return rows
+
+
+def coalesce(rows):
+    """
+    Fusiona las filas de una misma entidad, en orden de id:
+      - UPDATE + UPDATE → un UPDATE con los datos combinados
+      - CREATE + UPDATE → un CREATE con los datos combinados
+      - DELETE + CREATE → el CREATE (trae la entidad completa)
+      - ... + DELETE → DELETE (CREATE + ... + DELETE no envía nada)
+    Un UPDATE después de un DELETE no se fusiona (sus datos son parciales):
+    esa fila y las siguientes de la entidad se aplazan a un lote posterior.
+
+    Returns:
+        (operaciones, ids anulados, ids aplazados); cada operación es un dict
+        {'ids', 'user_id', 'entity_type', 'entity_id', 'operation', 'data',
+        'retry_count', 'created_at'}, en orden de la primera fila de su entidad
+    """
+    ops = {}
+    cancelled = []
+    deferred = []
+    deferred_keys = set()
+    for (row_id, user_id, entity_type, entity_id, operation, data_json,
+         retry_count, created_at) in rows:
+        key = (entity_type, entity_id)
+        if key in deferred_keys:
+            deferred.append(row_id)
+            continue
+        data = json.loads(data_json)
+        op = ops.get(key)
+        if op is None:
+            ops[key] = {'ids': [row_id], 'user_id': user_id, 'entity_type': entity_type,
+                        'entity_id': entity_id, 'operation': operation, 'data': data,
+                        'retry_count': retry_count or 0, 'created_at': created_at}
+            continue
+        if op['operation'] == 'DELETE' and operation == 'UPDATE':
+            deferred_keys.add(key)
+            deferred.append(row_id)
+            continue
+        op['ids'].append(row_id)
+        op['retry_count'] = max(op['retry_count'], retry_count or 0)
+        op['created_at'] = min(op['created_at'], created_at)
+        if operation == 'DELETE':
+            if op['operation'] == 'CREATE':
+                cancelled.extend(op.pop('ids'))
+                del ops[key]
+            else:
+                op.update(operation='DELETE', data=data)
+        elif op['operation'] == 'DELETE':
+            # Recreada después de borrarse: el CREATE sustituye al DELETE
+            op.update(operation='CREATE', data=data)
+        else:
+            op['data'].update(data)
+    return list(ops.values()), cancelled, deferred
+
+
+class HttpSender:
+    """Envía una lista de operaciones como un POST JSON"""
+
+    def __init__(self, url=DEFAULT_URL, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, operations):
+        body = json.dumps({'operations': [
+            {key: op[key] for key in ('entity_type', 'entity_id', 'operation', 'data')}
+            for op in operations
+        ]}).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, method='POST',
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def _parse_timestamp(value):
+    """CURRENT_TIMESTAMP de SQLite (UTC) como datetime con zona horaria"""
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+
+
+def _mark_completed(conn, ids):
+    conn.executemany("""
+        UPDATE sync_queue
+        SET sync_status = 'COMPLETED', synced_at = CURRENT_TIMESTAMP,
+            claimed_at = NULL, error_message = NULL
+        WHERE id = ?
+    """, [(row_id,) for row_id in ids])
+
+
+def _release(conn, ids):
+    """Devuelve a PENDING filas reclamadas que no se envían en este lote"""
+    conn.executemany("""
+        UPDATE sync_queue
+        SET sync_status = 'PENDING', claimed_at = NULL
+        WHERE id = ?
+    """, [(row_id,) for row_id in ids])
+
+
+def _mark_failed(conn, operations, error, max_retries, backoff_base, backoff_max):
+    """
+    PENDING con backoff exponencial (con jitter) o FAILED si no quedan
+    reintentos. Mientras dure el backoff claim_batch() retiene las
+    operaciones posteriores de la entidad.
+    """
+    message = str(error)[:500]
+    for op in operations:
+        retries = op['retry_count'] + 1
+        if retries >= max_retries:
+            status, delay = 'FAILED', 0
+        else:
+            status = 'PENDING'
+            delay = min(backoff_max, backoff_base * 2 ** op['retry_count'])
+            delay *= random.uniform(0.5, 1.0)
+        conn.executemany("""
+            UPDATE sync_queue
+            SET sync_status = ?, retry_count = ?, error_message = ?, claimed_at = NULL,
+                next_attempt_at = datetime('now', ?)
+            WHERE id = ?
+        """, [(status, retries, message, f"+{delay:.0f} seconds", row_id)
+              for row_id in op['ids']])
+
+
+def drain(conn, sender, batch_size=500, request_size=50, concurrency=8, max_retries=5,
+          backoff_base=2, backoff_max=300, stale_after=300):
+    """
+    Vacía la cola hasta que no queden filas listas para enviar. Cada entidad
+    tiene como mucho una operación en vuelo; sus filas retenidas se reclaman
+    cuando esa termina.
+
+    Args:
+        sender: callable que recibe una lista de operaciones y lanza una
+            excepción si el envío falla (HttpSender)
+        batch_size: filas reclamadas por lote
+        request_size: operaciones (ya fusionadas) por petición
+        concurrency: peticiones en vuelo como máximo
+
+    Returns:
+        dict con filas, operaciones y peticiones enviadas, fallos, tiempo,
+        filas/segundo y retraso de la cola (segundos desde created_at)
+    """
+    stats = {'reclaimed': reclaim_stale(conn, stale_after), 'rows': 0, 'operations': 0,
+             'requests': 0, 'failed_requests': 0, 'cancelled': 0}
+    lags = []
+    pending = deque()
+    in_flight = {}
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        exhausted = False
+        while True:
+            while len(in_flight) < concurrency:
+                if not pending and not exhausted:
+                    rows = claim_batch(conn, batch_size)
+                    if not rows:
+                        exhausted = True
+                        continue
+                    operations, cancelled, deferred = coalesce(rows)
+                    if cancelled or deferred:
+                        _mark_completed(conn, cancelled)
+                        _release(conn, deferred)
+                        conn.commit()
+                        stats['cancelled'] += len(cancelled)
+                        stats['rows'] += len(cancelled)
+                    for i in range(0, len(operations), request_size):
+                        pending.append(operations[i:i + request_size])
+                    continue
+                if not pending:
+                    break
+                chunk = pending.popleft()
+                in_flight[pool.submit(sender, chunk)] = chunk
+
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            now = datetime.now(timezone.utc)
+            # Las entidades de estas peticiones dejan de estar en vuelo: sus
+            # filas retenidas ya se pueden reclamar
+            exhausted = False
+            for future in done:
+                chunk = in_flight.pop(future)
+                ids = [row_id for op in chunk for row_id in op['ids']]
+                stats['requests'] += 1
+                try:
+                    future.result()
+                except Exception as e:
+                    stats['failed_requests'] += 1
+                    _mark_failed(conn, chunk, e, max_retries, backoff_base, backoff_max)
+                else:
+                    _mark_completed(conn, ids)
+                    stats['rows'] += len(ids)
+                    stats['operations'] += len(chunk)
+                    lags.extend((now - _parse_timestamp(op['created_at'])).total_seconds()
+                                for op in chunk)
+                conn.commit()
+
+    elapsed = time.perf_counter() - start
+    lags.sort()
+    stats.update(
+        seconds=round(elapsed, 3),
+        rows_per_sec=round(stats['rows'] / elapsed, 1) if elapsed else 0.0,
+        lag_p50_s=lags[len(lags) // 2] if lags else 0.0,
+        lag_max_s=lags[-1] if lags else 0.0,
+    )
+    return stats
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Endpoint de pruebas: acepta POST /sync con latencia y fallos simulados"""
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if server.latency:
+            time.sleep(server.latency)
+        if random.random() < server.failure_rate:
+            self.send_response(503)
+            self.end_headers()
+            return
+        operations = json.loads(body)['operations']
+        with server.lock:
+            server.received += len(operations)
+            for op in operations:
+                server.entities[(op['entity_type'], op['entity_id'])] = op
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps({'accepted': len(operations)}).encode('utf-8'))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stand_in_server(port=0, latency=0.0, failure_rate=0.0):
+    """
+    Arranca el servidor de pruebas en un hilo.
+
+    Returns:
+        (servidor, url); server.shutdown() lo detiene
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StandInHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.failure_rate = failure_rate
+    server.received = 0
+    server.entities = {}
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/sync"
+
+
+def _fill_queue(conn, rows, entities, seed):
+    """Encola `rows` operaciones sobre `entities` tareas (varias por entidad)"""
+    rng = random.Random(seed)
+    conn.execute("DELETE FROM sync_queue")
+    conn.executemany("""
+        INSERT INTO sync_queue (user_id, entity_type, entity_id, operation, data_json)
+        VALUES (1, 'task', ?, ?, ?)
+    """, ((rng.randrange(entities), 'UPDATE',
+           json.dumps({'status': rng.choice(('PENDING', 'COMPLETED')), 'seq': i}))
+          for i in range(rows)))
+    conn.commit()
+
+
+def benchmark(rows=20000, entities=5000, concurrency_levels=(1, 4, 8, 16), latency=0.005,
+              seed=42):
+    """
+    Llena la cola de una BD temporal y la vacía contra el servidor de pruebas
+    con distintas concurrencias.
+    """
+    results = []
+    server, url = start_stand_in_server(latency=latency)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = connect(clone_template(os.path.join(tmp, 'sync_bench.db')), 'tuned')
+            conn.execute("INSERT INTO users (uuid, name) VALUES ('bench', 'Benchmark')")
+            conn.commit()
+            for concurrency in concurrency_levels:
+                _fill_queue(conn, rows, entities, seed)
+                stats = drain(conn, HttpSender(url), concurrency=concurrency)
+                stats['concurrency'] = concurrency
+                results.append(stats)
+            conn.close()
+    finally:
+        server.shutdown()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Worker de sincronización de sync_queue")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Ruta de la base de datos")
+    parser.add_argument('--url', default=DEFAULT_URL, help="Endpoint de sincronización")
+    parser.add_argument('--lote', type=int, default=500, help="Filas reclamadas por lote")
+    parser.add_argument('--peticion', type=int, default=50, help="Operaciones por petición")
+    parser.add_argument('--concurrencia', type=int, default=8,
+                        help="Peticiones en vuelo como máximo")
+    parser.add_argument('--reintentos', type=int, default=5,
+                        help="Intentos antes de marcar FAILED")
+    parser.add_argument('--servidor', action='store_true',
+                        help="Solo arrancar el servidor de pruebas en --puerto")
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--benchmark', action='store_true',
+                        help="Medir filas/segundo contra el servidor de pruebas")
+    parser.add_argument('--filas', type=int, default=20000, help="Filas del benchmark")
+    args = parser.parse_args(argv)
+
+    if args.servidor:
+        server, url = start_stand_in_server(args.puerto)
+        print(f"🌐 Servidor de pruebas escuchando en {url} (Ctrl+C para salir)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.shutdown()
+        return 0
+
+    if args.benchmark:
+        print("=" * 80)
+        print("🏁 BENCHMARK DE SINCRONIZACIÓN")
+        print("=" * 80)
+        print(f"   {'Concurrencia':>12} {'filas/s':>10} {'peticiones':>11} "
+              f"{'operaciones':>12} {'retraso p50':>12} {'máx':>8}")
+        for r in benchmark(rows=args.filas, entities=max(1, args.filas // 4)):
+            print(f"   {r['concurrency']:>12} {r['rows_per_sec']:>10.1f} {r['requests']:>11} "
+                  f"{r['operations']:>12} {r['lag_p50_s']:>11.1f}s {r['lag_max_s']:>7.1f}s")
+        return 0
+
+    if not os.path.exists(args.db):
+        print(f"❌ Error: No existe {args.db}")
+        return 1
+
+    conn = connect(args.db, 'tuned')
+    try:
+        # claimed_at y next_attempt_at llegan con la migración 1.1
+        if pending_migrations(conn):
+            print(f"❌ Esquema {get_version(conn)} desactualizado (se necesita "
+                  f"{SCHEMA_VERSION}); ejecuta migrations.py")
+            return 1
+        stats = drain(conn, HttpSender(args.url), args.lote, args.peticion,
+                      args.concurrencia, args.reintentos)
+    except sqlite3.Error as e:
+        print(f"\n❌ Error de SQLite: {e}")
+        return 1
+    finally:
+        conn.close()
+
+    print(f"🔁 Reclamadas de nuevo: {stats['reclaimed']}")
+    print(f"✅ Filas sincronizadas: {stats['rows']} "
+          f"({stats['operations']} operaciones, {stats['cancelled']} anuladas)")
+    print(f"📨 Peticiones: {stats['requests']} ({stats['failed_requests']} fallidas)")
+    print(f"⏱️  {stats['seconds']:.2f}s — {stats['rows_per_sec']:.1f} filas/s, "
+          f"retraso p50 {stats['lag_p50_s']:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
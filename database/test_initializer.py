@@ -6,16 +6,17 @@ similar a lo que hace DatabaseInitializer.kt
 
 """
 
-import sqlite3
+import os
 import uuid
 from datetime import datetime, timedelta
 
-def initialize_database():
+from db_connection import DEFAULT_DB, connect
+
+def initialize_database(db_path=DEFAULT_DB):
     """Inicializa la base de datos con datos de prueba"""
     
     # Conectar a la base de datos
-    db_path = "task_gamification.db"
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
     
     print("=" * 80)
@@ -163,7 +164,6 @@ def initialize_database():
         print("=" * 80)
         
         # Mostrar ubicación del archivo
-        import os
         db_size = os.path.getsize(db_path)
         db_size_kb = db_size / 1024
         
@@ -182,15 +182,14 @@ def initialize_database():
         conn.close()
 
 
-def test_triggers():
+def test_triggers(db_path=DEFAULT_DB):
     """Prueba los triggers de la base de datos"""
     
     print("\n" + "=" * 80)
     print("🧪 PROBANDO TRIGGERS AUTOMÁTICOS")
     print("=" * 80)
     
-    db_path = "task_gamification.db"
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
     
     try:
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Mantenimiento de la tabla materializada user_summary
+La tabla y sus triggers de deltas están definidos en schema.sql (las bases
+de datos anteriores los reciben con migrations.py); este script permite
+reconstruir la tabla desde cero, refrescar la ventana de XP de 7 días y
+verificar que coincide con v_user_summary.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+from db_connection import connect
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(SCRIPT_DIR, 'task_gamification.db')
+
+SUMMARY_COLUMNS = ('badges_unlocked', 'pending_tasks', 'overdue_tasks', 'xp_last_week')
+
+
+def fill_user_summary(conn):
+    """
+    Rellena user_summary con una pasada agregada por tabla, sin commit (para
+    usarla dentro de otra transacción, ej. una migración).
+
+    Returns:
+        Número de usuarios en la tabla reconstruida
+    """
+    conn.execute("DELETE FROM user_summary")
+    conn.execute("""
+        INSERT INTO user_summary (user_id, pending_tasks, overdue_tasks,
+                                  badges_unlocked, xp_last_week, xp_window_date)
+        SELECT u.id,
+               COALESCE(t.pending, 0),
+               COALESCE(t.overdue, 0),
+               COALESCE(b.unlocked, 0),
+               COALESCE(d.xp, 0),
+               DATE('now')
+        FROM users u
+        LEFT JOIN (
+            SELECT user_id,
+                   SUM(status = 'PENDING') AS pending,
+                   SUM(status = 'OVERDUE') AS overdue
+            FROM tasks
+            WHERE status IN ('PENDING', 'OVERDUE')
+            GROUP BY user_id
+        ) t ON t.user_id = u.id
+        LEFT JOIN (
+            SELECT user_id, COUNT(*) AS unlocked
+            FROM user_badges
+            WHERE is_unlocked = 1
+            GROUP BY user_id
+        ) b ON b.user_id = u.id
+        LEFT JOIN (
+            SELECT user_id, SUM(xp_earned) AS xp
+            FROM daily_stats
+            WHERE stat_date >= DATE('now', '-7 days')
+            GROUP BY user_id
+        ) d ON d.user_id = u.id
+    """)
+    return conn.execute("SELECT COUNT(*) FROM user_summary").fetchone()[0]
+
+
+def rebuild_user_summary(conn):
+    """
+    Reconstruye user_summary con una pasada agregada por tabla.
+
+    Returns:
+        Número de usuarios en la tabla reconstruida
+    """
+    try:
+        count = fill_user_summary(conn)
+        conn.commit()
+        return count
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def refresh_xp_window(conn):
+    """
+    Recalcula xp_last_week de las filas cuya ventana no es la de hoy.
+    Pensado para ejecutarse una vez al día; las lecturas de
+    v_user_summary_fast son correctas aunque no se ejecute.
+
+    Returns:
+        Número de filas refrescadas
+    """
+    try:
+        cursor = conn.execute("""
+            UPDATE user_summary
+            SET xp_last_week = COALESCE((
+                    SELECT SUM(xp_earned) FROM daily_stats ds
+                    WHERE ds.user_id = user_summary.user_id
+                      AND ds.stat_date >= DATE('now', '-7 days')
+                ), 0),
+                xp_window_date = DATE('now')
+            WHERE xp_window_date IS NULL OR xp_window_date != DATE('now')
+        """)
+        conn.commit()
+        return cursor.rowcount
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def get_user_summary(conn, user_id):
+    """Lee el resumen de un usuario (mismas columnas que v_user_summary)"""
+    cursor = conn.execute("SELECT * FROM v_user_summary_fast WHERE id = ?", (user_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip([d[0] for d in cursor.description], row))
+
+
+def check_consistency(conn):
+    """
+    Compara v_user_summary_fast con v_user_summary para todos los usuarios.
+
+    Returns:
+        Lista de (user_id, columna, valor_vista, valor_materializado)
+    """
+    columns = ", ".join(f"COALESCE(v.{c}, 0), COALESCE(f.{c}, 0)" for c in SUMMARY_COLUMNS)
+    mismatches = []
+    for row in conn.execute(f"""
+        SELECT v.id, {columns}
+        FROM v_user_summary v
+        JOIN v_user_summary_fast f ON f.id = v.id
+    """):
+        for i, column in enumerate(SUMMARY_COLUMNS):
+            expected, actual = row[1 + 2 * i], row[2 + 2 * i]
+            if expected != actual:
+                mismatches.append((row[0], column, expected, actual))
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mantenimiento de user_summary")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Ruta de la base de datos")
+    parser.add_argument('--reconstruir', action='store_true',
+                        help="Reconstruir user_summary desde cero")
+    parser.add_argument('--refrescar', action='store_true',
+                        help="Refrescar la ventana de XP de 7 días")
+    parser.add_argument('--verificar', action='store_true',
+                        help="Comparar con v_user_summary")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ Error: No existe {args.db}")
+        return 1
+
+    conn = connect(args.db)
+    try:
+        if args.reconstruir:
+            start = time.perf_counter()
+            count = rebuild_user_summary(conn)
+            print(f"✅ user_summary reconstruida: {count} usuarios "
+                  f"({time.perf_counter() - start:.2f}s)")
+        if args.refrescar:
+            print(f"🔄 Ventanas de XP refrescadas: {refresh_xp_window(conn)}")
+        if args.verificar:
+            mismatches = check_consistency(conn)
+            if mismatches:
+                print(f"❌ {len(mismatches)} diferencias con v_user_summary:")
+                for user_id, column, expected, actual in mismatches[:20]:
+                    print(f"   • usuario {user_id}: {column} = {actual} (esperado {expected})")
+                return 1
+            print("✅ user_summary coincide con v_user_summary")
+        return 0
+    except sqlite3.Error as e:
+        print(f"\n❌ Error de SQLite: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
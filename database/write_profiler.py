@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+Instrumentación de la amplificación de escrituras
+Con los triggers anidados de schema.sql una operación lógica (completar una
+tarea) se convierte en muchas escrituras físicas. WriteProfiler atribuye a
+cada operación lógica, con los callbacks de sqlite3:
+  - programas ejecutados (set_trace_callback: la sentencia y cada disparo de
+    trigger generan un evento; los eventos repetidos con el mismo SQL son
+    triggers, y las sentencias incluyen las internas de FTS5)
+  - pasos de la VM (set_progress_handler cada `progress_steps` instrucciones)
+  - filas escritas (total_changes, incluye las de los triggers) y, con
+    tables=True, filas por tabla y operación (triggers TEMP propios de la
+    conexión que llaman a una función Python; sus eventos de traza, pasos y
+    tiempo se descuentan con el coste por disparo de counter_cost())
+  - páginas escritas (frames añadidos al WAL por el commit)
+  - tiempo
+
+Para producción, sample_every=N instrumenta solo 1 de cada N operaciones:
+las demás no tienen callbacks instalados y los triggers de conteo no llaman
+a Python (su WHEN lee un indicador TEMP que solo se activa al instrumentar).
+
+trigger_costs() atribuye el coste a cada trigger por ablación en una copia
+temporal: mide la operación con todos los triggers y sin cada uno de ellos
+(coste inclusivo, con los triggers que ese dispara a su vez). Los pasos y
+las filas son exactos; el tiempo es la mediana de varias rondas pareadas y
+se acota a 0, porque por debajo del ruido la diferencia puede ser negativa.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import struct
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from db_connection import DEFAULT_DB, connect, copy_database
+
+PROGRESS_STEPS = 100
+WAL_HEADER_SIZE = 32
+WAL_FRAME_HEADER_SIZE = 24
+METRICS = ('ms', 'statements', 'triggers', 'steps', 'rows', 'pages')
+
+COUNTER_STATE = "CREATE TEMP TABLE IF NOT EXISTS _write_profiler_state (active INTEGER NOT NULL)"
+COUNTER_TRIGGER = """
+    CREATE TEMP TRIGGER IF NOT EXISTS "_write_profiler_{table}_{event}"
+    AFTER {event} ON main."{table}"
+    WHEN (SELECT active FROM temp._write_profiler_state)
+    BEGIN
+        SELECT _write_profiler_row('{table}', '{event}');
+    END
+"""
+_counter_cost = None
+
+
+def counter_cost(rows=2000):
+    """
+    Coste de un disparo de un trigger de conteo: (eventos de traza, pasos de
+    la VM, segundos). Se mide una vez por proceso insertando `rows` filas en
+    una base en memoria con y sin el trigger.
+    """
+    global _counter_cost
+    if _counter_cost is not None:
+        return _counter_cost
+
+    def run(with_counter):
+        conn = sqlite3.connect(':memory:', isolation_level=None)
+        try:
+            conn.execute("CREATE TABLE probe (x)")
+            if with_counter:
+                conn.create_function('_write_profiler_row', 2, lambda table, event: None)
+                conn.execute(COUNTER_STATE)
+                conn.execute("INSERT INTO temp._write_profiler_state VALUES (1)")
+                conn.execute(COUNTER_TRIGGER.format(table='probe', event='INSERT'))
+            events = []
+            steps = [0]
+
+            def progress():
+                steps[0] += 1
+                return 0
+
+            conn.set_trace_callback(events.append)
+            conn.set_progress_handler(progress, 1)
+            start = time.perf_counter()
+            for i in range(rows):
+                conn.execute("INSERT INTO probe VALUES (?)", (i,))
+            elapsed = time.perf_counter() - start
+            return len(events), steps[0], elapsed
+        finally:
+            conn.close()
+
+    plain = [run(False) for _ in range(3)]
+    counted = [run(True) for _ in range(3)]
+    _counter_cost = (
+        (counted[0][0] - plain[0][0]) / rows,
+        (counted[0][1] - plain[0][1]) / rows,
+        max(0.0, (min(r[2] for r in counted) - min(r[2] for r in plain)) / rows),
+    )
+    return _counter_cost
+
+
+def wal_position(conn):
+    """
+    (salt, frames válidos) del WAL de la base principal, o None si no está
+    en modo WAL. Los frames válidos son un prefijo del archivo (los que
+    llevan el salt de la cabecera), así que se localizan con búsqueda binaria
+    leyendo solo cabeceras de frame.
+    """
+    path = next((row[2] for row in conn.execute("PRAGMA database_list")
+                 if row[1] == 'main'), None)
+    if not path or not os.path.exists(path + '-wal'):
+        return None
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    frame_size = WAL_FRAME_HEADER_SIZE + page_size
+    with open(path + '-wal', 'rb') as f:
+        header = f.read(WAL_HEADER_SIZE)
+        if len(header) < WAL_HEADER_SIZE:
+            return None
+        salt = header[16:24]
+        total = (os.fstat(f.fileno()).st_size - WAL_HEADER_SIZE) // frame_size
+        low, high = 0, total
+        while low < high:
+            middle = (low + high + 1) // 2
+            f.seek(WAL_HEADER_SIZE + (middle - 1) * frame_size + 8)
+            if f.read(8) == salt:
+                low = middle
+            else:
+                high = middle - 1
+    return struct.unpack('>II', salt), low
+
+
+def frames_written(before, after):
+    """Frames añadidos entre dos posiciones (si el WAL se reinició, desde 0)"""
+    if before is None or after is None:
+        return None
+    if before[0] != after[0]:
+        return after[1]
+    return after[1] - before[1]
+
+
+class WriteProfiler:
+    """
+    Métricas de escritura por operación lógica.
+
+    Uso:
+        profiler = WriteProfiler(conn)                 # o sample_every=100
+        with profiler.operation('completar_tarea'):    # commit al salir
+            conn.execute("UPDATE tasks SET status = 'COMPLETED' ...")
+        print_report(profiler.report())
+    """
+
+    def __init__(self, conn, sample_every=1, progress_steps=PROGRESS_STEPS, tables=False,
+                 autocommit=True):
+        self.conn = conn
+        self.autocommit = autocommit
+        self.sample_every = max(1, sample_every)
+        self.progress_steps = progress_steps
+        self.tables = tables
+        self._calls = {}
+        self._totals = {}
+        self._current = None
+        self._last_sql = None
+        if tables:
+            counter_cost()
+            self._install_table_counters()
+
+    def _install_table_counters(self):
+        """Triggers TEMP (solo esta conexión) que cuentan filas por tabla, inactivos"""
+        self.conn.create_function('_write_profiler_row', 2, self._on_row)
+        self.conn.execute(COUNTER_STATE)
+        tables = [row[1] for row in self.conn.execute("PRAGMA main.table_list")
+                  if row[2] == 'table' and not row[1].startswith('sqlite_')]
+        for table in tables:
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                self.conn.execute(COUNTER_TRIGGER.format(table=table, event=event))
+        self._set_counters(False)
+
+    def _set_counters(self, active):
+        """Activa o desactiva los triggers de conteo (solo toca la base TEMP)"""
+        in_transaction = self.conn.in_transaction
+        self.conn.execute("DELETE FROM temp._write_profiler_state")
+        self.conn.execute("INSERT INTO temp._write_profiler_state VALUES (?)", (int(active),))
+        if not in_transaction:
+            self.conn.commit()
+
+    def _on_row(self, table, event):
+        if self._current is not None:
+            key = f"{table}.{event}"
+            self._current['writes'][key] = self._current['writes'].get(key, 0) + 1
+
+    def _on_trace(self, sql):
+        if sql == self._last_sql:
+            self._current['triggers'] += 1
+        else:
+            self._current['statements'] += 1
+            self._last_sql = sql
+
+    def _on_progress(self):
+        self._current['steps'] += self.progress_steps
+        return 0
+
+    @contextmanager
+    def operation(self, name):
+        """
+        Ejecuta el bloque como una operación lógica y, con autocommit, hace
+        commit al salir (rollback si falla). Solo se instrumenta 1 de cada
+        sample_every.
+        """
+        calls = self._calls[name] = self._calls.get(name, 0) + 1
+        if (calls - 1) % self.sample_every:
+            with self._transaction():
+                yield
+            return
+
+        sample = {'statements': 0, 'triggers': 0, 'steps': 0, 'writes': {}}
+        if self.tables:
+            self._set_counters(True)
+        wal_before = wal_position(self.conn)
+        changes_before = self.conn.total_changes
+        self._current = sample
+        self._last_sql = None
+        self.conn.set_trace_callback(self._on_trace)
+        self.conn.set_progress_handler(self._on_progress, self.progress_steps)
+        start = time.perf_counter()
+        try:
+            with self._transaction():
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.conn.set_trace_callback(None)
+            self.conn.set_progress_handler(None, 0)
+            self._current = None
+            changes = self.conn.total_changes - changes_before
+            if self.tables:
+                self._set_counters(False)
+        if self.tables:
+            # Descuenta los disparos de los triggers de conteo (uno por fila)
+            firings = sum(sample['writes'].values())
+            events, steps, seconds = counter_cost()
+            sample['triggers'] = max(0, sample['triggers'] - round(firings * events))
+            sample['steps'] = max(0, sample['steps'] - firings * steps)
+            elapsed = max(0.0, elapsed - firings * seconds)
+        # Las métricas excluyen el propio cálculo de la posición del WAL
+        sample['ms'] = elapsed * 1000
+        sample['rows'] = changes
+        # Sin commit las páginas siguen en la caché y no llegan al WAL
+        sample['pages'] = (frames_written(wal_before, wal_position(self.conn))
+                           if self.autocommit else None)
+        self._accumulate(name, sample)
+
+    @contextmanager
+    def _transaction(self):
+        if not self.autocommit:
+            yield
+            return
+        try:
+            yield
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+
+    def _accumulate(self, name, sample):
+        totals = self._totals.setdefault(name, {'samples': 0, 'writes': {},
+                                                **{metric: 0 for metric in METRICS}})
+        totals['samples'] += 1
+        for metric in METRICS:
+            if sample[metric] is None or totals[metric] is None:
+                totals[metric] = None
+            else:
+                totals[metric] += sample[metric]
+        for key, count in sample['writes'].items():
+            totals['writes'][key] = totals['writes'].get(key, 0) + count
+
+    def report(self):
+        """
+        Media por operación de las muestras instrumentadas.
+
+        Returns:
+            Lista de dicts {'operation', 'calls', 'samples', 'ms', 'statements',
+            'triggers', 'steps', 'rows', 'pages', 'writes'} (writes: filas por
+            'tabla.OPERACIÓN')
+        """
+        result = []
+        for name, totals in self._totals.items():
+            n = totals['samples']
+            row = {'operation': name, 'calls': self._calls[name], 'samples': n}
+            for metric in METRICS:
+                row[metric] = None if totals[metric] is None else round(totals[metric] / n, 2)
+            row['writes'] = {key: round(count / n, 2)
+                             for key, count in sorted(totals['writes'].items())}
+            result.append(row)
+        return result
+
+    def reset(self):
+        self._calls.clear()
+        self._totals.clear()
+
+    def close(self):
+        """Elimina los triggers TEMP de conteo por tabla"""
+        if self.tables:
+            for (name,) in self.conn.execute("""
+                SELECT name FROM sqlite_temp_master
+                WHERE type = 'trigger' AND name LIKE '\\_write\\_profiler\\_%' ESCAPE '\\'
+            """).fetchall():
+                self.conn.execute(f'DROP TRIGGER temp."{name}"')
+            self.conn.execute("DROP TABLE IF EXISTS temp._write_profiler_state")
+
+
+def _random_id(conn, rng, table, where):
+    """Id aleatorio que cumple `where` (salto a un id al azar y siguiente fila)"""
+    high = conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0
+    row = conn.execute(f"SELECT id FROM {table} WHERE id >= ? AND {where} ORDER BY id LIMIT 1",
+                       (rng.randint(1, max(high, 1)),)).fetchone()
+    return row[0] if row else None
+
+
+def op_complete_task(conn, rng):
+    task_id = _random_id(conn, rng, 'tasks', "status != 'COMPLETED'")
+    conn.execute("""
+        UPDATE tasks SET status = 'COMPLETED', completed_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    """, (task_id,))
+
+
+def op_create_task(conn, rng):
+    user_id = _random_id(conn, rng, 'users', "1")
+    conn.execute("""
+        INSERT INTO tasks (uuid, user_id, title, description, category, due_date, xp_reward)
+        VALUES (?, ?, 'Tarea instrumentada', 'Creada por write_profiler.py', 'STUDY',
+                DATE('now', '+3 days'), 15)
+    """, (f"profiler-{time.time_ns()}-{rng.random()}", user_id))
+
+
+def op_edit_task(conn, rng):
+    task_id = _random_id(conn, rng, 'tasks', "1")
+    conn.execute("UPDATE tasks SET title = title || ' (editada)' WHERE id = ?", (task_id,))
+
+
+def op_delete_task(conn, rng):
+    task_id = _random_id(conn, rng, 'tasks', "status = 'PENDING'")
+    conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+
+def op_unlock_badge(conn, rng):
+    row_id = _random_id(conn, rng, 'user_badges', "is_unlocked = 0")
+    conn.execute("""
+        UPDATE user_badges SET is_unlocked = 1, unlocked_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    """, (row_id,))
+
+
+OPERATIONS = {
+    'completar_tarea': op_complete_task,
+    'crear_tarea': op_create_task,
+    'editar_tarea': op_edit_task,
+    'borrar_tarea': op_delete_task,
+    'desbloquear_badge': op_unlock_badge,
+}
+
+
+@contextmanager
+def scratch_copy(db_path):
+    """Copia temporal de la base de datos (API de backup) para medir sin tocarla"""
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = connect(copy_database(db_path, os.path.join(tmp, 'scratch.db'), 'WAL'), 'tuned')
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+def measure(conn, operations, repeat=20, seed=42, **profiler_options):
+    """Ejecuta cada operación `repeat` veces instrumentada y devuelve report()"""
+    profiler = WriteProfiler(conn, **profiler_options)
+    rng = random.Random(seed)
+    try:
+        for name, func in operations.items():
+            for _ in range(repeat):
+                with profiler.operation(name):
+                    func(conn, rng)
+        return profiler.report()
+    finally:
+        profiler.close()
+
+
+def trigger_costs(conn, name, func, repeat=20, seed=42, rounds=5):
+    """
+    Coste inclusivo de cada trigger en una operación, por ablación: la
+    diferencia entre medir con todos los triggers y sin ese trigger (incluye
+    los triggers que ese dispara a su vez). Cada medición se deshace con
+    ROLLBACK TO, así que todas parten del mismo estado y, con la misma
+    semilla, modifican las mismas filas; el DROP TRIGGER también se deshace.
+    Sin commit no se miden páginas.
+
+    Las métricas de conteo son deterministas. El tiempo de un trigger barato
+    queda por debajo del ruido entre dos mediciones, así que se repite el par
+    (con todos, sin el trigger) `rounds` veces y se toma la mediana de las
+    diferencias, acotada a 0.
+
+    Returns:
+        (métricas con todos los triggers, lista de dicts {'trigger', métricas})
+    """
+    def run(dropped=None):
+        conn.execute("ROLLBACK TO write_profiler_ablation")
+        if dropped:
+            conn.execute(f'DROP TRIGGER main."{dropped}"')
+        return measure(conn, {name: func}, repeat, seed, progress_steps=1,
+                       tables=True, autocommit=False)[0]
+
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("SAVEPOINT write_profiler_ablation")
+    try:
+        baselines = [run() for _ in range(rounds)]
+        baseline = dict(baselines[-1], ms=round(statistics.median(b['ms'] for b in baselines), 3))
+        written = {key.split('.')[0] for key in baseline['writes']}
+        triggers = [trigger for trigger, table in conn.execute("""
+            SELECT name, tbl_name FROM main.sqlite_master WHERE type = 'trigger'
+            ORDER BY name
+        """) if table in written]
+
+        costs = []
+        for trigger in triggers:
+            elapsed = []
+            for _ in range(rounds):
+                with_all = run()
+                without = run(trigger)
+                elapsed.append(with_all['ms'] - without['ms'])
+            cost = {'trigger': trigger}
+            for metric in METRICS:
+                if baseline[metric] is None or without[metric] is None:
+                    cost[metric] = None
+                elif metric == 'ms':
+                    cost[metric] = round(max(0.0, statistics.median(elapsed)), 3)
+                else:
+                    cost[metric] = round(baseline[metric] - without[metric], 2)
+            costs.append(cost)
+    finally:
+        conn.execute("ROLLBACK TO write_profiler_ablation")
+        conn.execute("RELEASE write_profiler_ablation")
+    return baseline, costs
+
+
+def overhead(conn, func, iterations=1000, sample_every=100, rounds=3, seed=42):
+    """
+    Tiempo por operación sin instrumentar y con muestreo 1/sample_every,
+    alternando ambas variantes `rounds` veces y
+    quedándose con la mejor de cada una.
+
+    Returns:
+        dict {'plain_ms', 'sampled_ms', 'overhead_pct'}
+    """
+    def run(profiler, rng):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            if profiler is None:
+                func(conn, rng)
+                conn.commit()
+            else:
+                with profiler.operation('op'):
+                    func(conn, rng)
+        return (time.perf_counter() - start) / iterations * 1000
+
+    rng = random.Random(seed)
+    profiler = WriteProfiler(conn, sample_every=sample_every)
+    plain = sampled = float('inf')
+    for _ in range(rounds):
+        plain = min(plain, run(None, rng))
+        sampled = min(sampled, run(profiler, rng))
+    profiler.close()
+    return {
+        'plain_ms': round(plain, 4),
+        'sampled_ms': round(sampled, 4),
+        'overhead_pct': round((sampled - plain) / plain * 100, 1),
+    }
+
+
+def _fmt(value):
+    return "n/d" if value is None else f"{value:,.1f}"
+
+
+def print_report(report):
+    print(f"   {'Operación':20} {'ms':>8} {'sentencias':>11} {'triggers':>9} "
+          f"{'pasos VM':>10} {'filas':>7} {'páginas':>8}")
+    for row in report:
+        print(f"   {row['operation']:20} {row['ms']:>8.3f} {_fmt(row['statements']):>11} "
+              f"{_fmt(row['triggers']):>9} {_fmt(row['steps']):>10} {_fmt(row['rows']):>7} "
+              f"{_fmt(row['pages']):>8}")
+        if row['writes']:
+            writes = ", ".join(f"{key} ×{count:g}" for key, count in row['writes'].items())
+            print(f"      ↳ {writes}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Amplificación de escrituras por operación y por trigger")
+    parser.add_argument('--db', default=DEFAULT_DB, help="Base de datos de origen (se copia)")
+    parser.add_argument('--repeticiones', type=int, default=20,
+                        help="Ejecuciones de cada operación")
+    parser.add_argument('--triggers', action='store_true',
+                        help="Desglose del coste por trigger (ablación)")
+    parser.add_argument('--rondas', type=int, default=5,
+                        help="Rondas de la ablación (mediana del tiempo por trigger)")
+    parser.add_argument('--muestreo', type=int, metavar='N',
+                        help="Medir el coste del modo muestreo 1/N")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ Error: No existe {args.db}")
+        return 1
+
+    print("=" * 80)
+    print("🔬 AMPLIFICACIÓN DE ESCRITURAS")
+    print("=" * 80)
+    try:
+        with scratch_copy(args.db) as conn:
+            print(f"\n📊 Media por operación ({args.repeticiones} ejecuciones, pasos VM "
+                  f"aproximados a {PROGRESS_STEPS})")
+            print_report(measure(conn, OPERATIONS, args.repeticiones, tables=True))
+
+            if args.triggers:
+                for name, func in OPERATIONS.items():
+                    baseline, costs = trigger_costs(conn, name, func, args.repeticiones,
+                                                   rounds=args.rondas)
+                    print(f"\n⚡ {name}: {baseline['steps']:,.0f} pasos, "
+                          f"{baseline['rows']:g} filas, {baseline['ms']:.3f} ms")
+                    for cost in sorted(costs, key=lambda c: -(c['steps'] or 0)):
+                        if cost['steps'] or cost['rows']:
+                            print(f"   {cost['trigger']:28} {_fmt(cost['steps']):>10} pasos "
+                                  f"{_fmt(cost['rows']):>6} filas {cost['ms']:>8.3f} ms")
+
+            if args.muestreo:
+                result = overhead(conn, op_complete_task, sample_every=args.muestreo)
+                print(f"\n⏱️  Muestreo 1/{args.muestreo} en completar_tarea: "
+                      f"{result['plain_ms']} ms → {result['sampled_ms']} ms "
+                      f"({result['overhead_pct']:+.1f}%)")
+    except sqlite3.Error as e:
+        print(f"\n❌ Error de SQLite: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())